@@ -0,0 +1,104 @@
+"""
+Activité de saisie des notes
+
+Chaque écriture de note incrémente un compteur par (jour, classe) dans
+ActiviteNotesJour. Les séries hebdomadaires ou mensuelles sont agrégées depuis
+ces compartiments avec TruncWeek / TruncMonth : leur coût dépend du nombre de
+jours et de classes, pas du nombre de notes.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncWeek, TruncMonth
+from django.utils import timezone
+from .models import Cours, ActiviteNotesJour
+
+
+PERIODES = {
+    'semaine': TruncWeek,
+    'mois': TruncMonth,
+}
+
+# Durée couverte par défaut par une série d'activité
+DUREE_SERIE = timedelta(days=365)
+
+
+def enregistrer_activite(saisies=None, modifications=None, jour=None):
+    """
+    Incrémente l'activité du jour.
+
+    `saisies` et `modifications` associent un identifiant de cours au nombre
+    de notes créées ou modifiées dans ce cours.
+    """
+    saisies = saisies or {}
+    modifications = modifications or {}
+    cours_ids = set(saisies) | set(modifications)
+    if not cours_ids:
+        return
+    jour = jour or timezone.localdate()
+
+    classes = dict(Cours.objects.filter(pk__in=cours_ids).values_list('pk', 'classe'))
+    variations = defaultdict(lambda: [0, 0])
+    for cours_id, nombre in saisies.items():
+        if cours_id in classes:
+            variations[classes[cours_id]][0] += nombre
+    for cours_id, nombre in modifications.items():
+        if cours_id in classes:
+            variations[classes[cours_id]][1] += nombre
+
+    with transaction.atomic():
+        ActiviteNotesJour.objects.bulk_create(
+            [ActiviteNotesJour(jour=jour, classe_id=classe_id) for classe_id in variations],
+            ignore_conflicts=True,
+        )
+        for classe_id, (nombre_saisies, nombre_modifiees) in variations.items():
+            ActiviteNotesJour.objects.filter(jour=jour, classe_id=classe_id).update(
+                notes_saisies=F('notes_saisies') + nombre_saisies,
+                notes_modifiees=F('notes_modifiees') + nombre_modifiees,
+            )
+
+
+def _debuts_periodes(periode, debut, fin):
+    """Premiers jours des semaines ou des mois couvrant [debut, fin]"""
+    if periode == 'semaine':
+        jour = debut - timedelta(days=debut.weekday())
+    else:
+        jour = debut.replace(day=1)
+    while jour <= fin:
+        yield jour
+        if periode == 'semaine':
+            jour += timedelta(days=7)
+        else:
+            jour = (jour + timedelta(days=32)).replace(day=1)
+
+
+def serie_activite(periode='semaine', departement=None, classe=None, debut=None, fin=None):
+    """
+    Notes saisies et modifiées par semaine ou par mois (périodes sans activité comprises).
+
+    Lue dans les compartiments journaliers, sans parcourir la table des notes.
+    """
+    fin = fin or timezone.localdate()
+    debut = debut or fin - DUREE_SERIE
+    compartiments = ActiviteNotesJour.objects.filter(jour__gte=debut, jour__lte=fin)
+    if departement is not None:
+        compartiments = compartiments.filter(classe__departement=departement)
+    if classe is not None:
+        compartiments = compartiments.filter(classe=classe)
+
+    lignes = compartiments.annotate(periode=PERIODES[periode]('jour')).values('periode').annotate(
+        saisies=Sum('notes_saisies'),
+        modifiees=Sum('notes_modifiees'),
+    ).order_by('periode')
+    par_periode = {ligne['periode']: ligne for ligne in lignes}
+
+    serie = []
+    for jour in _debuts_periodes(periode, debut, fin):
+        ligne = par_periode.get(jour, {})
+        serie.append({
+            'periode': jour,
+            'saisies': ligne.get('saisies') or 0,
+            'modifiees': ligne.get('modifiees') or 0,
+        })
+    return serie
@@ -1,10 +1,12 @@
 from django.contrib import admin
 from .models import (
     Departement, Enseignant, Classe, Etudiant, 
-    Matiere, Cours, Note, EmploiDuTemps,
+    Matiere, Cours, Note, EmploiDuTemps, Salle, Equipement,
     Message, Notification, ProfilUtilisateur, 
-    HistoriqueConnexion, ParametresSysteme
+    HistoriqueConnexion, ParametresSysteme, AgregatNotes, ActiviteConnexionJour,
+    ActiviteNotesJour, DecisionSemestre, HistoriqueNote, AnomalieNote
 )
+from .bulletins import dernier_semestre, lancer_generation
 
 
 @admin.register(Departement)
@@ -25,6 +27,23 @@ class ClasseAdmin(admin.ModelAdmin):
     list_display = ['nom', 'niveau', 'departement']
     list_filter = ['niveau', 'departement']
     search_fields = ['nom']
+    actions = ['generer_bulletins']
+    
+    @admin.action(description='Générer les bulletins du dernier semestre')
+    def generer_bulletins(self, request, queryset):
+        # Chaque classe est traitée pour son semestre le plus récent, en arrière-plan
+        par_semestre = {}
+        for classe in queryset:
+            semestre = dernier_semestre(classe)
+            if semestre:
+                par_semestre.setdefault(semestre, []).append(classe)
+        for (semestre, annee_scolaire), classes in par_semestre.items():
+            journal = lancer_generation(classes, semestre, annee_scolaire)
+            self.message_user(
+                request,
+                f'Génération des bulletins {semestre} {annee_scolaire} lancée pour {len(classes)} classe(s) ; '
+                f'suivi dans {journal}.'
+            )
 
 
 @admin.register(Etudiant)
@@ -36,7 +55,7 @@ class EtudiantAdmin(admin.ModelAdmin):
 
 @admin.register(Matiere)
 class MatiereAdmin(admin.ModelAdmin):
-    list_display = ['code', 'nom', 'credits']
+    list_display = ['code', 'nom', 'credits', 'note_validation']
     search_fields = ['nom', 'code']
 
 
@@ -54,11 +73,44 @@ class NoteAdmin(admin.ModelAdmin):
     search_fields = ['etudiant__user__last_name', 'cours__matiere__nom']
 
 
+@admin.register(DecisionSemestre)
+class DecisionSemestreAdmin(admin.ModelAdmin):
+    list_display = ['etudiant', 'classe', 'semestre', 'annee_scolaire', 'decision', 'moyenne', 'credits_obtenus']
+    list_filter = ['decision', 'semestre', 'annee_scolaire', 'classe']
+    search_fields = ['etudiant__user__last_name', 'etudiant__numero_etudiant']
+    
+    def has_add_permission(self, request):
+        return False  # Calculée par la délibération
+    
+    def has_change_permission(self, request, obj=None):
+        return False  # Calculée par la délibération
+
+
+@admin.register(Equipement)
+class EquipementAdmin(admin.ModelAdmin):
+    list_display = ['nom']
+    search_fields = ['nom']
+
+
+@admin.register(Salle)
+class SalleAdmin(admin.ModelAdmin):
+    list_display = ['nom', 'capacite']
+    search_fields = ['nom']
+    filter_horizontal = ['equipements']
+
+    def get_readonly_fields(self, request, obj=None):
+        # Les créneaux désignent la salle par son nom
+        if obj is not None and obj.creneaux.exists():
+            return ['nom']
+        return []
+
+
 @admin.register(EmploiDuTemps)
 class EmploiDuTempsAdmin(admin.ModelAdmin):
     list_display = ['cours', 'jour', 'heure_debut', 'heure_fin', 'type_cours', 'salle']
     list_filter = ['jour', 'type_cours', 'cours__classe']
-    search_fields = ['cours__matiere__nom', 'salle']
+    search_fields = ['cours__matiere__nom', 'salle__nom']
+    list_select_related = ['cours__matiere', 'cours__classe']
 
 
 @admin.register(Message)
@@ -105,6 +157,83 @@ class HistoriqueConnexionAdmin(admin.ModelAdmin):
         return False  # Pas de modification
 
 
+@admin.register(HistoriqueNote)
+class HistoriqueNoteAdmin(admin.ModelAdmin):
+    list_display = ['date', 'action', 'identifiant_note', 'etudiant', 'cours', 'ancienne_valeur', 'nouvelle_valeur', 'auteur']
+    list_filter = ['action', 'date']
+    search_fields = ['etudiant__user__last_name', 'etudiant__numero_etudiant', 'auteur__username']
+    date_hierarchy = 'date'
+    
+    def has_add_permission(self, request):
+        return False  # Alimenté automatiquement
+    
+    def has_change_permission(self, request, obj=None):
+        return False  # Ajout seul
+    
+    def has_delete_permission(self, request, obj=None):
+        return False  # Ajout seul
+
+
+@admin.register(AnomalieNote)
+class AnomalieNoteAdmin(admin.ModelAdmin):
+    list_display = ['date_detection', 'type_anomalie', 'note', 'cours', 'score', 'detail', 'statut']
+    list_filter = ['statut', 'type_anomalie', 'cours__classe']
+    list_editable = ['statut']
+    list_select_related = ['note__etudiant__user', 'note__cours__matiere', 'cours__matiere', 'cours__classe']
+    search_fields = ['note__etudiant__user__last_name', 'note__etudiant__numero_etudiant', 'cours__matiere__nom']
+    readonly_fields = ['note', 'cours', 'type_anomalie', 'score', 'detail', 'date_detection']
+    actions = ['marquer_corrigees', 'marquer_ignorees']
+    
+    def has_add_permission(self, request):
+        return False  # Alimenté par la détection d'anomalies
+    
+    @admin.action(description='Marquer comme erreurs confirmées')
+    def marquer_corrigees(self, request, queryset):
+        queryset.update(statut='CORRIGEE')
+    
+    @admin.action(description='Marquer comme notes correctes')
+    def marquer_ignorees(self, request, queryset):
+        queryset.update(statut='IGNOREE')
+
+
+@admin.register(AgregatNotes)
+class AgregatNotesAdmin(admin.ModelAdmin):
+    list_display = ['cours', 'classe', 'matiere', 'semestre', 'annee_scolaire', 'nombre_notes', 'reussites']
+    list_filter = ['semestre', 'annee_scolaire', 'classe__niveau']
+    search_fields = ['matiere__nom', 'classe__nom']
+    
+    def has_add_permission(self, request):
+        return False  # Maintenu automatiquement
+    
+    def has_change_permission(self, request, obj=None):
+        return False  # Maintenu automatiquement
+
+
+@admin.register(ActiviteNotesJour)
+class ActiviteNotesJourAdmin(admin.ModelAdmin):
+    list_display = ['jour', 'classe', 'notes_saisies', 'notes_modifiees']
+    list_filter = ['classe__departement', 'classe__niveau']
+    date_hierarchy = 'jour'
+    
+    def has_add_permission(self, request):
+        return False  # Maintenu automatiquement
+    
+    def has_change_permission(self, request, obj=None):
+        return False  # Maintenu automatiquement
+
+
+@admin.register(ActiviteConnexionJour)
+class ActiviteConnexionJourAdmin(admin.ModelAdmin):
+    list_display = ['jour', 'connexions_reussies', 'connexions_echouees', 'utilisateurs_distincts']
+    date_hierarchy = 'jour'
+    
+    def has_add_permission(self, request):
+        return False  # Maintenu automatiquement
+    
+    def has_change_permission(self, request, obj=None):
+        return False  # Maintenu automatiquement
+
+
 @admin.register(ParametresSysteme)
 class ParametresSystemeAdmin(admin.ModelAdmin):
     list_display = ['nom_etablissement', 'email_etablissement', 'duree_session', 'tentatives_connexion_max']
@@ -115,6 +244,9 @@ class ParametresSystemeAdmin(admin.ModelAdmin):
         ('Paramètres de sécurité', {
             'fields': ('duree_session', 'tentatives_connexion_max')
         }),
+        ('Règles de délibération', {
+            'fields': ('compensation_semestre', 'moyenne_compensation', 'note_eliminatoire')
+        }),
         ('Configuration SMTP', {
             'fields': ('smtp_server', 'smtp_port', 'smtp_username', 'smtp_password', 'smtp_use_tls'),
             'classes': ('collapse',)
@@ -0,0 +1,172 @@
+"""
+Agrégats incrémentaux des notes
+
+La table AgregatNotes contient une ligne par cours (nombre de notes, somme,
+somme des carrés, réussites, extrêmes). Elle est mise à jour par variations
+à chaque création, modification ou suppression de note, y compris lors des
+opérations en masse, ce qui évite de parcourir la table des notes pour
+afficher les statistiques.
+"""
+from collections import defaultdict
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, Sum, Min, Max, Q, F, DecimalField
+from .models import AgregatNotes, Note
+
+
+NOTE_REUSSITE = 10
+
+CHAMPS_VALEURS = ['nombre_notes', 'somme', 'somme_carres', 'reussites', 'minimum', 'maximum']
+
+
+def _decimal(valeur):
+    """Convertit une valeur de note en Decimal"""
+    return valeur if isinstance(valeur, Decimal) else Decimal(str(valeur))
+
+
+def appliquer_variations(ajouts=(), retraits=()):
+    """Applique aux agrégats des notes ajoutées et retirées, données en (cours_id, valeur)"""
+    variations = defaultdict(lambda: ([], []))
+    for cours_id, valeur in ajouts:
+        variations[cours_id][0].append(_decimal(valeur))
+    for cours_id, valeur in retraits:
+        variations[cours_id][1].append(_decimal(valeur))
+    if not variations:
+        return
+
+    with transaction.atomic():
+        existants = AgregatNotes.objects.select_for_update().in_bulk(
+            list(variations), field_name='cours_id'
+        )
+        a_recalculer = set(variations) - set(existants)
+
+        for cours_id, agregat in existants.items():
+            valeurs_ajoutees, valeurs_retirees = variations[cours_id]
+            for valeur in valeurs_ajoutees:
+                agregat.nombre_notes += 1
+                agregat.somme += valeur
+                agregat.somme_carres += valeur * valeur
+                agregat.reussites += valeur >= NOTE_REUSSITE
+                if agregat.minimum is None or valeur < agregat.minimum:
+                    agregat.minimum = valeur
+                if agregat.maximum is None or valeur > agregat.maximum:
+                    agregat.maximum = valeur
+            for valeur in valeurs_retirees:
+                agregat.nombre_notes -= 1
+                agregat.somme -= valeur
+                agregat.somme_carres -= valeur * valeur
+                agregat.reussites -= valeur >= NOTE_REUSSITE
+                # Un extrême retiré ne peut pas être déduit par variation
+                if valeur in (agregat.minimum, agregat.maximum):
+                    a_recalculer.add(cours_id)
+            if cours_id not in a_recalculer:
+                agregat.save(update_fields=CHAMPS_VALEURS)
+
+        recalculer_agregats(a_recalculer)
+
+
+def calculer_agregats(cours_ids=None):
+    """Calcule les agrégats attendus à partir des notes (une requête groupée)"""
+    notes = Note.objects.all()
+    if cours_ids is not None:
+        notes = notes.filter(cours_id__in=cours_ids)
+
+    lignes = notes.values(
+        'cours', 'cours__classe', 'cours__matiere', 'cours__semestre', 'cours__annee_scolaire'
+    ).annotate(
+        nombre_notes=Count('id'),
+        somme=Sum('note'),
+        somme_carres=Sum(
+            F('note') * F('note'),
+            output_field=DecimalField(max_digits=18, decimal_places=4)
+        ),
+        reussites=Count('id', filter=Q(note__gte=NOTE_REUSSITE)),
+        minimum=Min('note'),
+        maximum=Max('note'),
+    ).order_by()
+
+    return {
+        ligne['cours']: AgregatNotes(
+            cours_id=ligne['cours'],
+            classe_id=ligne['cours__classe'],
+            matiere_id=ligne['cours__matiere'],
+            semestre=ligne['cours__semestre'],
+            annee_scolaire=ligne['cours__annee_scolaire'],
+            **{champ: ligne[champ] for champ in CHAMPS_VALEURS}
+        )
+        for ligne in lignes
+    }
+
+
+def recalculer_agregats(cours_ids=None):
+    """Reconstruit les agrégats des cours donnés (tous si None) depuis les notes"""
+    if cours_ids is not None:
+        cours_ids = set(cours_ids)
+        if not cours_ids:
+            return
+
+    attendus = calculer_agregats(cours_ids)
+    with transaction.atomic():
+        existants = AgregatNotes.objects.select_for_update()
+        if cours_ids is not None:
+            existants = existants.filter(cours_id__in=cours_ids)
+        existants = existants.in_bulk(field_name='cours_id')
+
+        # Les cours sans note n'ont plus d'agrégat
+        obsoletes = [a.pk for cours_id, a in existants.items() if cours_id not in attendus]
+        AgregatNotes.objects.filter(pk__in=obsoletes).delete()
+
+        a_modifier = []
+        for cours_id, attendu in attendus.items():
+            if cours_id in existants:
+                attendu.pk = existants[cours_id].pk
+                a_modifier.append(attendu)
+        AgregatNotes.objects.bulk_update(
+            a_modifier, ['classe', 'matiere', 'semestre', 'annee_scolaire'] + CHAMPS_VALEURS
+        )
+        AgregatNotes.objects.bulk_create(
+            [a for cours_id, a in attendus.items() if cours_id not in existants]
+        )
+
+
+def comparer_agregats():
+    """Compare la table des agrégats aux notes et retourne les cours divergents"""
+    attendus = calculer_agregats()
+    existants = AgregatNotes.objects.in_bulk(field_name='cours_id')
+
+    divergents = []
+    for cours_id in set(attendus) | set(existants):
+        attendu = attendus.get(cours_id)
+        existant = existants.get(cours_id)
+        valeurs_attendues = _valeurs(attendu)
+        valeurs_existantes = _valeurs(existant)
+        if valeurs_attendues != valeurs_existantes:
+            divergents.append((cours_id, valeurs_existantes, valeurs_attendues))
+    return divergents
+
+
+def _valeurs(agregat):
+    """Valeurs comparables d'un agrégat (un agrégat absent équivaut à un agrégat vide)"""
+    if agregat is None or not agregat.nombre_notes:
+        return None
+    return (
+        agregat.classe_id, agregat.matiere_id, agregat.semestre, agregat.annee_scolaire,
+        agregat.nombre_notes, agregat.reussites,
+        round(_decimal(agregat.somme), 2),
+        round(_decimal(agregat.somme_carres), 4),
+        round(_decimal(agregat.minimum), 2),
+        round(_decimal(agregat.maximum), 2),
+    )
+
+
+def synchroniser_cours(cours):
+    """
+    Répercute les clés d'un cours modifié sur son agrégat (signal post_save ;
+    les opérations en masse passent par CoursQuerySet.update).
+    """
+    AgregatNotes.objects.filter(cours=cours).update(
+        classe=cours.classe_id,
+        matiere=cours.matiere_id,
+        semestre=cours.semestre,
+        annee_scolaire=cours.annee_scolaire,
+    )
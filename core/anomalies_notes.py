@@ -0,0 +1,171 @@
+"""
+Détection des notes suspectes
+
+Les notes sont lues en une passe, triées par (cours, type d'évaluation) : ce
+tri est servi par l'index (cours, type_evaluation, date_evaluation). Chaque
+évaluation est rangée dans des tableaux numpy puis analysée d'un bloc :
+
+- valeur aberrante : score z robuste |0,6745 (x - médiane) / MAD| au-delà de
+  SEUIL_SCORE (Iglewicz et Hoaglin), par exemple 2 saisi à la place de 20 ou
+  une note saisie dans le mauvais cours ;
+- doublon : même étudiant, même cours, même type et même date qu'une note
+  saisie avant.
+
+La mémoire utilisée est bornée par la plus grande évaluation. Les anomalies
+nouvelles sont ajoutées à la table de vérification AnomalieNote, et chaque
+enseignant concerné reçoit une notification, en une insertion groupée.
+"""
+from collections import Counter, defaultdict
+from decimal import Decimal
+import numpy as np
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from .models import Cours, Note, AnomalieNote
+from .utils import envoyer_notifications
+
+
+SEUIL_SCORE = 3.5
+
+# Constante de normalisation du MAD (quantile 0,75 de la loi normale)
+NORMALISATION = 0.6745
+
+# Nombre minimal de notes d'une évaluation pour calculer des scores
+NOTES_MIN = 5
+
+# Écart absolu médian minimal, en points : sans lui, une évaluation où
+# presque tout le monde a la même note signalerait le moindre écart
+ECART_MIN = 1.0
+
+TAILLE_LOT = 5000
+
+
+def scores_robustes(valeurs):
+    """Scores z robustes (médiane et écart absolu médian) d'un tableau de notes"""
+    mediane = np.median(valeurs)
+    ecart = max(float(np.median(np.abs(valeurs - mediane))), ECART_MIN)
+    return NORMALISATION * (valeurs - mediane) / ecart
+
+
+def doublons(etudiants, dates, identifiants):
+    """Masque des notes qui répètent (étudiant, date) d'une note d'identifiant plus petit"""
+    ordre = np.lexsort((identifiants, dates, etudiants))
+    e, d = etudiants[ordre], dates[ordre]
+    repetees = np.zeros(len(ordre), dtype=bool)
+    repetees[1:] = (e[1:] == e[:-1]) & (d[1:] == d[:-1])
+    masque = np.zeros(len(ordre), dtype=bool)
+    masque[ordre] = repetees
+    # Identifiant de la première note de chaque série, pour le détail
+    debuts = np.maximum.accumulate(np.where(repetees, 0, np.arange(len(ordre))))
+    originales = np.empty_like(identifiants)
+    originales[ordre] = identifiants[ordre][debuts]
+    return masque, originales
+
+
+def analyser_evaluation(lignes):
+    """
+    Anomalies d'une évaluation donnée en lignes (identifiant, etudiant_id,
+    note, date ordinale). Retourne (identifiant, type, score, détail).
+    """
+    tableau = np.array(lignes, dtype=np.float64)
+    identifiants = tableau[:, 0].astype(np.int64)
+    valeurs = tableau[:, 2]
+    anomalies = []
+
+    if len(valeurs) >= NOTES_MIN:
+        scores = scores_robustes(valeurs)
+        mediane = float(np.median(valeurs))
+        for i in np.flatnonzero(np.abs(scores) > SEUIL_SCORE):
+            anomalies.append((
+                int(identifiants[i]), 'ABERRANTE', round(float(scores[i]), 2),
+                f'{valeurs[i]:.2f}/20 pour une médiane de {mediane:.2f}/20',
+            ))
+
+    repetees, originales = doublons(tableau[:, 1].astype(np.int64), tableau[:, 3].astype(np.int64), identifiants)
+    for i in np.flatnonzero(repetees):
+        anomalies.append((
+            int(identifiants[i]), 'DOUBLON', None,
+            f'Même étudiant et même évaluation que la note {int(originales[i])}',
+        ))
+    return anomalies
+
+
+def parcourir_evaluations(taille_lot=TAILLE_LOT):
+    """Lignes de chaque évaluation (cours, type d'évaluation), en une lecture de la table"""
+    notes = Note.objects.order_by('cours', 'type_evaluation').values_list(
+        'cours', 'type_evaluation', 'pk', 'etudiant', 'note', 'date_evaluation'
+    ).iterator(chunk_size=taille_lot)
+    cle, lignes = None, []
+    for cours_id, type_evaluation, pk, etudiant_id, note, date_evaluation in notes:
+        if (cours_id, type_evaluation) != cle:
+            if lignes:
+                yield cle, lignes
+            cle, lignes = (cours_id, type_evaluation), []
+        lignes.append((pk, etudiant_id, float(note), date_evaluation.toordinal()))
+    if lignes:
+        yield cle, lignes
+
+
+def _notifier(nouvelles):
+    """Une notification par enseignant, avec le nombre de nouvelles anomalies par cours"""
+    par_cours = Counter(anomalie.cours_id for anomalie in nouvelles)
+    messages = defaultdict(list)
+    for pk, user_id, code, classe in Cours.objects.filter(pk__in=par_cours).values_list(
+        'pk', 'enseignant__user', 'matiere__code', 'classe__nom'
+    ).order_by('matiere__code', 'classe__nom'):
+        messages[user_id].append(f'{code} {classe} : {par_cours[pk]}')
+    utilisateurs = User.objects.in_bulk(list(messages))
+    return envoyer_notifications(
+        [(utilisateurs[user_id], 'Notes à vérifier dans vos cours : ' + ', '.join(lignes) + '.')
+         for user_id, lignes in messages.items()],
+        'WARNING', 'Notes suspectes détectées',
+    )
+
+
+def detecter_anomalies(enregistrer=True, taille_lot=TAILLE_LOT):
+    """
+    Analyse toutes les notes.
+
+    Les anomalies nouvelles sont ajoutées à AnomalieNote (statut « À
+    vérifier ») et notifiées ; celles qui restaient à vérifier et ne sont
+    plus détectées (note corrigée) sont retirées. Les anomalies déjà
+    examinées ne sont jamais signalées de nouveau. Retourne un rapport.
+    """
+    maintenant = timezone.now()
+    rapport = {
+        'notes': 0, 'evaluations': 0, 'ABERRANTE': 0, 'DOUBLON': 0,
+        'nouvelles': 0, 'resolues': 0, 'notifications': 0,
+    }
+    detectees = []
+    for (cours_id, _), lignes in parcourir_evaluations(taille_lot):
+        rapport['notes'] += len(lignes)
+        rapport['evaluations'] += 1
+        for pk, type_anomalie, score, detail in analyser_evaluation(lignes):
+            rapport[type_anomalie] += 1
+            detectees.append(AnomalieNote(
+                note_id=pk, cours_id=cours_id, type_anomalie=type_anomalie,
+                score=None if score is None else Decimal(str(score)),
+                detail=detail, date_detection=maintenant,
+            ))
+
+    connues = {
+        (note_id, type_anomalie): (pk, statut)
+        for pk, note_id, type_anomalie, statut in AnomalieNote.objects.values_list(
+            'pk', 'note', 'type_anomalie', 'statut'
+        )
+    }
+    nouvelles = [a for a in detectees if (a.note_id, a.type_anomalie) not in connues]
+    presentes = {(a.note_id, a.type_anomalie) for a in detectees}
+    resolues = [
+        pk for cle, (pk, statut) in connues.items() if statut == 'A_VERIFIER' and cle not in presentes
+    ]
+    rapport['nouvelles'] = len(nouvelles)
+    rapport['resolues'] = len(resolues)
+
+    if enregistrer:
+        with transaction.atomic():
+            AnomalieNote.objects.filter(pk__in=resolues).delete()
+            AnomalieNote.objects.bulk_create(nouvelles, batch_size=TAILLE_LOT)
+            if nouvelles:
+                rapport['notifications'] = len(_notifier(nouvelles))
+    return rapport
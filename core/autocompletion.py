@@ -0,0 +1,65 @@
+"""
+Autocomplétion des filtres étudiant et cours
+
+Les listes déroulantes de la liste des notes contenaient tous les étudiants
+et tous les cours. Les champs de saisie interrogent ces fonctions, qui ne
+renvoient que les premiers résultats dont un libellé commence par le texte
+saisi, en nombre borné et en une requête (jointures par select_related).
+
+La recherche par préfixe n'utilise pas d'index : les préfixes sans
+distinction de casse (LIKE / UPPER(...) LIKE) sur plusieurs tables jointes
+sont évalués ligne par ligne. Les étudiants sont parcourus dans l'ordre de
+l'index du numéro et la lecture s'arrête aux `limite` premiers trouvés ; un
+terme rare parcourt toute la table, ce qui reste acceptable aux effectifs
+d'un établissement.
+"""
+from django.db.models import Q
+from .models import Etudiant, Cours
+
+
+LIMITE = 10
+LIMITE_MAX = 50
+
+
+def libelle_etudiant(etudiant):
+    return f'{etudiant.nom_complet} ({etudiant.numero_etudiant})'
+
+
+def libelle_cours(cours):
+    return f'{cours.matiere.nom} - {cours.classe.nom} ({cours.semestre} {cours.annee_scolaire})'
+
+
+def _limite(limite):
+    return max(1, min(limite or LIMITE, LIMITE_MAX))
+
+
+def rechercher_etudiants(terme, limite=None):
+    """Étudiants dont le numéro, le nom ou le prénom commence par `terme`"""
+    terme = terme.strip()
+    etudiants = Etudiant.objects.select_related('user')
+    if terme:
+        etudiants = etudiants.filter(
+            Q(numero_etudiant__startswith=terme.upper())
+            | Q(user__last_name__istartswith=terme)
+            | Q(user__first_name__istartswith=terme)
+        )
+    return [
+        {'id': etudiant.pk, 'libelle': libelle_etudiant(etudiant)}
+        for etudiant in etudiants.order_by('numero_etudiant')[:_limite(limite)]
+    ]
+
+
+def rechercher_cours(terme, limite=None):
+    """Cours dont le code ou le nom de la matière, ou le nom de la classe, commence par `terme`"""
+    terme = terme.strip()
+    cours = Cours.objects.select_related('matiere', 'classe')
+    if terme:
+        cours = cours.filter(
+            Q(matiere__code__startswith=terme.upper())
+            | Q(matiere__nom__istartswith=terme)
+            | Q(classe__nom__istartswith=terme)
+        )
+    return [
+        {'id': c.pk, 'libelle': libelle_cours(c)}
+        for c in cours.order_by('-annee_scolaire', 'matiere__code', 'classe__nom', 'semestre')[:_limite(limite)]
+    ]
@@ -0,0 +1,242 @@
+"""
+Bulletins de fin de semestre
+
+Les données d'une classe (moyennes par cours, rangs, crédits, commentaires)
+sont calculées en quelques requêtes groupées, indépendamment de l'effectif.
+Le rendu des fichiers, qui ne touche plus à la base, est réparti sur un
+ProcessPoolExecutor par lots d'étudiants : pendant que les processus
+produisent les bulletins d'une classe, la classe suivante est préparée.
+
+Depuis l'administration, la génération est confiée à la commande
+generer_bulletins, lancée dans un processus détaché : la requête rend la main
+aussitôt et le pool de processus n'est pas créé dans le serveur web.
+
+Fichiers produits : MEDIA_ROOT/bulletins/<année>/<semestre>/<id>-<classe>/<numéro>.html|.pdf
+"""
+import os
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from decimal import Decimal
+from pathlib import Path
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.text import slugify
+from .models import Etudiant, Cours, ParametresSysteme
+from .moyennes import moyennes_ponderees
+from .classements import classement_classe
+from .releves import releves_etudiants
+
+
+FORMATS = ('html', 'pdf')
+
+# Nombre de bulletins rendus par tâche envoyée aux processus
+TAILLE_LOT = 50
+
+# Échelle de notation (seuil minimal, mention), du plus haut au plus bas
+MENTIONS = [
+    (Decimal('16'), 'Très bien'),
+    (Decimal('12'), 'Assez bien'),
+    (Decimal('10'), 'Passable'),
+    (Decimal('0'), 'Insuffisant'),
+]
+
+
+class ErreurBulletin(Exception):
+    """Format demandé indisponible"""
+
+
+def mention(moyenne):
+    if moyenne is None:
+        return ''
+    for seuil, libelle in MENTIONS:
+        if moyenne >= seuil:
+            return libelle
+    return MENTIONS[-1][1]
+
+
+def donnees_bulletins(classe, semestre, annee_scolaire):
+    """
+    Contenu des bulletins d'une classe, un dictionnaire par étudiant.
+
+    Moyennes, crédits et commentaires des étudiants viennent de leurs relevés
+    (core.releves), servis par le cache ; le reste tient en six requêtes (deux
+    sont servies par le cache du classement). Le résultat ne contient que des
+    valeurs simples, transmissibles aux processus.
+    """
+    filtres = {'classe': classe, 'semestre': semestre, 'annee_scolaire': annee_scolaire}
+    cours = list(Cours.objects.filter(
+        classe=classe, semestre=semestre, annee_scolaire=annee_scolaire
+    ).select_related('matiere', 'enseignant__user').order_by('matiere__nom'))
+    etudiants = list(Etudiant.objects.filter(classe=classe).select_related('user').order_by(
+        'user__last_name', 'user__first_name'
+    ))
+    releves = releves_etudiants(etudiants)
+
+    moyennes_cours = moyennes_ponderees(par=('cours',), **filtres)
+    classement = classement_classe(classe, semestre, annee_scolaire)
+    general = {ligne['etudiant_id']: ligne for ligne in classement['general']}
+    rangs_cours = {
+        (ligne['etudiant_id'], cours_id): ligne['rang']
+        for cours_id, lignes in classement['par_cours'].items() for ligne in lignes
+    }
+    effectifs_cours = {cours_id: len(lignes) for cours_id, lignes in classement['par_cours'].items()}
+
+    entete = {
+        'etablissement': ParametresSysteme.objects.values_list('nom_etablissement', flat=True).first() or 'EduManager',
+        'classe': classe.nom,
+        'niveau': classe.get_niveau_display(),
+        'semestre': semestre,
+        'annee_scolaire': annee_scolaire,
+        'effectif': len(general),
+        'date_edition': timezone.localdate(),
+    }
+    bulletins = []
+    for etudiant in etudiants:
+        pk = etudiant.pk
+        releve = {ligne['cours_id']: ligne for ligne in releves[pk]['cours']}
+        lignes, credits_tentes, credits_obtenus = [], 0, 0
+        for c in cours:
+            ligne = releve.get(c.pk, {})
+            moyenne = ligne.get('moyenne')
+            if moyenne is not None:
+                credits_tentes += c.matiere.credits
+                if ligne['validee']:
+                    credits_obtenus += c.matiere.credits
+            lignes.append({
+                'matiere': c.matiere.nom,
+                'code': c.matiere.code,
+                'credits': c.matiere.credits,
+                'enseignant': c.enseignant.nom_complet,
+                'moyenne': moyenne,
+                'moyenne_classe': moyennes_cours.get(c.pk),
+                'rang': rangs_cours.get((pk, c.pk)),
+                'effectif': effectifs_cours.get(c.pk, 0),
+                'commentaire': ligne.get('commentaire', ''),
+            })
+        resultat = general.get(pk, {})
+        bulletins.append(dict(
+            entete,
+            numero_etudiant=etudiant.numero_etudiant,
+            nom=etudiant.nom_complet,
+            date_naissance=etudiant.date_naissance,
+            lignes=lignes,
+            moyenne=resultat.get('moyenne'),
+            rang=resultat.get('rang'),
+            mention=mention(resultat.get('moyenne')),
+            credits_tentes=credits_tentes,
+            credits_obtenus=credits_obtenus,
+        ))
+    return bulletins
+
+
+def dossier_bulletins(classe, semestre, annee_scolaire, racine=None):
+    racine = Path(racine or settings.MEDIA_ROOT)
+    # L'identifiant distingue les classes homonymes
+    return racine / 'bulletins' / annee_scolaire / semestre / f'{classe.pk}-{slugify(classe.nom)}'
+
+
+def _verifier_formats(formats):
+    inconnus = set(formats) - set(FORMATS)
+    if inconnus:
+        raise ErreurBulletin(f"Format(s) inconnu(s) : {', '.join(sorted(inconnus))}")
+    if 'pdf' in formats:
+        try:
+            import weasyprint  # noqa: F401
+        except ImportError:
+            raise ErreurBulletin('La génération PDF nécessite le paquet weasyprint')
+
+
+def rendre_lot(bulletins, dossier, formats):
+    """Écrit les fichiers d'un lot de bulletins (exécuté dans un processus de rendu)"""
+    dossier = Path(dossier)
+    dossier.mkdir(parents=True, exist_ok=True)
+    fichiers = []
+    for bulletin in bulletins:
+        html = render_to_string('core/bulletin.html', bulletin)
+        if 'html' in formats:
+            chemin = dossier / f"{bulletin['numero_etudiant']}.html"
+            chemin.write_text(html, encoding='utf-8')
+            fichiers.append(str(chemin))
+        if 'pdf' in formats:
+            from weasyprint import HTML
+            chemin = dossier / f"{bulletin['numero_etudiant']}.pdf"
+            HTML(string=html).write_pdf(chemin)
+            fichiers.append(str(chemin))
+    return fichiers
+
+
+def _initialiser_processus():
+    import django
+    django.setup()
+
+
+def generer_bulletins(classes, semestre, annee_scolaire, formats=('html',), processus=None,
+                      progression=None, racine=None, taille_lot=TAILLE_LOT):
+    """
+    Génère les bulletins des classes données pour un semestre.
+
+    `processus` fixe le nombre de processus de rendu (par défaut un par cœur,
+    1 pour tout rendre dans le processus courant) ; `progression` est appelé
+    avec (bulletins produits, bulletins prévus) après chaque lot. Retourne la
+    liste des fichiers écrits.
+    """
+    _verifier_formats(formats)
+    processus = processus or os.cpu_count() or 1
+    fichiers, termines, prevus = [], 0, 0
+
+    def lots():
+        nonlocal prevus
+        for classe in classes:
+            bulletins = donnees_bulletins(classe, semestre, annee_scolaire)
+            prevus += len(bulletins)
+            dossier = str(dossier_bulletins(classe, semestre, annee_scolaire, racine))
+            for debut in range(0, len(bulletins), taille_lot):
+                yield bulletins[debut:debut + taille_lot], dossier
+
+    def terminer(resultat):
+        nonlocal termines
+        fichiers.extend(resultat)
+        termines += len(resultat) // len(formats)
+        if progression:
+            progression(termines, prevus)
+
+    if processus == 1:
+        for lot, dossier in lots():
+            terminer(rendre_lot(lot, dossier, formats))
+        return fichiers
+
+    # Les processus de rendu ne touchent pas à la base : les connexions
+    # héritées du fork ne sont ni utilisées ni fermées par eux
+    with ProcessPoolExecutor(max_workers=processus, initializer=_initialiser_processus) as executeur:
+        taches = [executeur.submit(rendre_lot, lot, dossier, formats) for lot, dossier in lots()]
+        for tache in as_completed(taches):
+            terminer(tache.result())
+    return fichiers
+
+
+def lancer_generation(classes, semestre, annee_scolaire, racine=None):
+    """
+    Lance la commande generer_bulletins en arrière-plan pour les classes
+    données et rend la main. Sa sortie est écrite dans generation.log, dans le
+    dossier du semestre ; retourne le chemin de ce journal.
+    """
+    journal = Path(racine or settings.MEDIA_ROOT) / 'bulletins' / annee_scolaire / semestre / 'generation.log'
+    journal.parent.mkdir(parents=True, exist_ok=True)
+    commande = [sys.executable, str(Path(settings.BASE_DIR) / 'manage.py'), 'generer_bulletins', semestre, annee_scolaire]
+    for classe in classes:
+        commande += ['--classe-id', str(classe.pk)]
+    with open(journal, 'ab') as sortie:
+        subprocess.Popen(
+            commande, cwd=settings.BASE_DIR, stdin=subprocess.DEVNULL, stdout=sortie, stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+    return journal
+
+
+def dernier_semestre(classe):
+    """(semestre, année scolaire) le plus récent parmi les cours d'une classe"""
+    return Cours.objects.filter(classe=classe).order_by(
+        '-annee_scolaire', '-semestre'
+    ).values_list('semestre', 'annee_scolaire').first()
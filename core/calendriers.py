@@ -0,0 +1,213 @@
+"""
+Abonnements iCalendar à l'emploi du temps
+
+Chaque classe, enseignant et salle a un flux .ics : un événement
+hebdomadaire récurrent par créneau, du premier jour du semestre à son
+dernier jour. Les agendas interrogent ces flux toutes les quelques minutes
+sans session : l'adresse porte un jeton signé propre à la ressource.
+
+Le flux rendu est mis en cache sous une clé dérivée des versions des
+modèles de l'emploi du temps (core.compteurs) et servi avec un ETag calculé
+depuis ces mêmes versions : tant que l'emploi du temps ne change pas, une
+interrogation est résolue par un 304 sans requête à la base.
+"""
+from datetime import date, datetime, time, timedelta, timezone as fuseau
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:
+    # Python 3.8 : module fourni par backports.zoneinfo, dépendance de Django 4
+    from backports.zoneinfo import ZoneInfo
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
+from .compteurs import valeur_en_cache
+from .conflits_horaires import normaliser_salle
+from .models import Classe, Cours, EmploiDuTemps, Enseignant, Matiere
+
+
+RESSOURCES = ('classe', 'enseignant', 'salle')
+
+# Modèles dont dépend un flux
+DEPENDANCES = (EmploiDuTemps, Cours, Matiere, Classe, Enseignant, User)
+
+# Premier et dernier jour de chaque semestre : (mois, jour, année de l'année scolaire 0 ou 1)
+PERIODES_SEMESTRES = {
+    'S1': ((9, 1, 0), (1, 31, 1)),
+    'S2': ((2, 1, 1), (6, 30, 1)),
+}
+
+JOURS = [code for code, _ in EmploiDuTemps.JOURS_SEMAINE]
+
+
+def semestre_courant(jour=None):
+    """(semestre, année scolaire) en cours ; en été, le semestre qui vient de finir"""
+    jour = jour or timezone.localdate()
+    if jour.month >= 9:
+        return 'S1', f'{jour.year}-{jour.year + 1}'
+    return ('S1' if jour.month == 1 else 'S2'), f'{jour.year - 1}-{jour.year}'
+
+
+def periode_semestre(semestre, annee_scolaire):
+    """Premier et dernier jour d'un semestre"""
+    premiere_annee = int(annee_scolaire[:4])
+    return tuple(
+        date(premiere_annee + decalage, mois, jour) for mois, jour, decalage in PERIODES_SEMESTRES[semestre]
+    )
+
+
+def jeton(ressource, valeur):
+    """Jeton d'abonnement d'une ressource"""
+    return salted_hmac('core.calendriers', f'{ressource}:{valeur}').hexdigest()[:32]
+
+
+def verifier_jeton(ressource, valeur, candidat):
+    return ressource in RESSOURCES and constant_time_compare(jeton(ressource, valeur), candidat or '')
+
+
+def url_abonnement(ressource, valeur):
+    """Adresse (relative) du flux d'une ressource, jeton compris"""
+    if ressource == 'salle':
+        valeur = normaliser_salle(valeur)
+    return reverse('calendrier_ics', args=[ressource, valeur]) + f'?jeton={jeton(ressource, valeur)}'
+
+
+def _echapper(texte):
+    return (str(texte).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def _plier(ligne):
+    """Lignes de 75 octets au plus, les suivantes commençant par une espace (RFC 5545)"""
+    morceaux, courant = [], ''
+    for caractere in ligne:
+        if len((courant + caractere).encode('utf-8')) > (75 if not morceaux else 74):
+            morceaux.append(courant)
+            courant = ''
+        courant += caractere
+    morceaux.append(courant)
+    return '\r\n '.join(morceaux)
+
+
+def _local(moment):
+    return moment.strftime('%Y%m%dT%H%M%S')
+
+
+def _decalage(delta):
+    minutes = int(delta.total_seconds() // 60)
+    signe = '+' if minutes >= 0 else '-'
+    return f'{signe}{abs(minutes) // 60:02d}{abs(minutes) % 60:02d}'
+
+
+def vtimezone(nom, debut, fin):
+    """Définition VTIMEZONE d'un fuseau entre deux dates : décalage initial et changements d'heure"""
+    zone = ZoneInfo(nom)
+    instant = datetime.combine(debut - timedelta(days=1), time.min, fuseau.utc)
+    limite = datetime.combine(fin + timedelta(days=1), time.min, fuseau.utc)
+    precedent = instant.astimezone(zone)
+    # (décalage précédent, heure locale à partir de laquelle le nouveau décalage s'applique)
+    observances = [(precedent.utcoffset(), precedent)]
+    while instant < limite:
+        instant += timedelta(hours=1)
+        local = instant.astimezone(zone)
+        if local.utcoffset() != precedent.utcoffset():
+            observances.append((precedent.utcoffset(), local))
+        precedent = local
+
+    lignes = ['BEGIN:VTIMEZONE', f'TZID:{nom}']
+    for decalage_avant, local in observances:
+        composant = 'DAYLIGHT' if local.dst() else 'STANDARD'
+        lignes += [
+            f'BEGIN:{composant}',
+            # Heure locale du changement, exprimée dans le décalage précédent
+            f'DTSTART:{_local(local.astimezone(fuseau.utc).replace(tzinfo=None) + decalage_avant)}',
+            f'TZOFFSETFROM:{_decalage(decalage_avant)}',
+            f'TZOFFSETTO:{_decalage(local.utcoffset())}',
+            f'TZNAME:{local.tzname()}',
+            f'END:{composant}',
+        ]
+    lignes.append('END:VTIMEZONE')
+    return lignes
+
+
+def emplois_ressource(ressource, valeur, semestre, annee_scolaire):
+    """(titre, créneaux) d'une ressource pour un semestre, None si elle n'existe pas"""
+    emplois = EmploiDuTemps.objects.filter(
+        cours__semestre=semestre, cours__annee_scolaire=annee_scolaire
+    ).select_related('cours__matiere', 'cours__classe', 'cours__enseignant__user')
+    if ressource == 'salle':
+        salle = normaliser_salle(valeur)
+        emplois = emplois.filter(salle_id=salle)
+        titre = f'Salle {salle}'
+    elif not valeur.isdigit():
+        return None
+    elif ressource == 'classe':
+        classe = Classe.objects.filter(pk=valeur).first()
+        if classe is None:
+            return None
+        emplois, titre = emplois.filter(cours__classe=classe), f'Classe {classe.nom}'
+    else:
+        enseignant = Enseignant.objects.select_related('user').filter(pk=valeur).first()
+        if enseignant is None:
+            return None
+        emplois, titre = emplois.filter(cours__enseignant=enseignant), enseignant.nom_complet
+    return titre, list(emplois.order_by('jour', 'heure_debut', 'pk'))
+
+
+def generer_calendrier(ressource, valeur, semestre, annee_scolaire, horodatage):
+    """Flux iCalendar d'une ressource (texte), None si elle n'existe pas"""
+    trouve = emplois_ressource(ressource, valeur, semestre, annee_scolaire)
+    if trouve is None:
+        return None
+    titre, emplois = trouve
+    debut, fin = periode_semestre(semestre, annee_scolaire)
+    nom_fuseau = settings.TIME_ZONE
+    # Fin de la récurrence, en UTC comme l'exige une date de début avec fuseau
+    jusqu_a = datetime.combine(fin, time(23, 59, 59), ZoneInfo(nom_fuseau)).astimezone(fuseau.utc)
+    types = dict(EmploiDuTemps.TYPES_COURS)
+
+    lignes = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//EduManager//Emploi du temps//FR',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{_echapper(f"{titre} - {semestre} {annee_scolaire}")}',
+        f'X-WR-TIMEZONE:{nom_fuseau}',
+    ]
+    lignes += vtimezone(nom_fuseau, debut, fin)
+    for emploi in emplois:
+        if emploi.jour not in JOURS:
+            continue
+        # Première occurrence : premier jour de la semaine du créneau dans le semestre
+        jour = debut + timedelta(days=(JOURS.index(emploi.jour) - debut.weekday()) % 7)
+        if jour > fin:
+            continue
+        cours = emploi.cours
+        lignes += [
+            'BEGIN:VEVENT',
+            f'UID:emploi-du-temps-{emploi.pk}-{semestre}-{annee_scolaire}@edumanager',
+            f'DTSTAMP:{horodatage.astimezone(fuseau.utc).strftime("%Y%m%dT%H%M%SZ")}',
+            f'DTSTART;TZID={nom_fuseau}:{_local(datetime.combine(jour, emploi.heure_debut))}',
+            f'DTEND;TZID={nom_fuseau}:{_local(datetime.combine(jour, emploi.heure_fin))}',
+            f'RRULE:FREQ=WEEKLY;UNTIL={jusqu_a.strftime("%Y%m%dT%H%M%SZ")}',
+            f'SUMMARY:{_echapper(f"{cours.matiere.nom} ({types.get(emploi.type_cours, emploi.type_cours)})")}',
+            f'LOCATION:{_echapper(emploi.salle_id)}',
+            f'DESCRIPTION:{_echapper(f"{cours.classe.nom} - {cours.enseignant.nom_complet}")}',
+            'END:VEVENT',
+        ]
+    lignes.append('END:VCALENDAR')
+    return '\r\n'.join(_plier(ligne) for ligne in lignes) + '\r\n'
+
+
+def calendrier_en_cache(ressource, valeur, semestre, annee_scolaire, horodatage):
+    """Flux d'une ressource, calculé une fois par version de l'emploi du temps"""
+    if ressource == 'salle':
+        valeur = normaliser_salle(valeur)
+    return valeur_en_cache(
+        'calendrier',
+        DEPENDANCES,
+        lambda: generer_calendrier(ressource, valeur, semestre, annee_scolaire, horodatage),
+        ressource, valeur, semestre, annee_scolaire,
+    )
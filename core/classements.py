@@ -0,0 +1,107 @@
+"""
+Classements des étudiants
+
+Les rangs sont calculés dans la base avec Window(Rank()) sur les moyennes
+pondérées (core.moyennes) : par classe sur la moyenne générale, par cours sur
+la moyenne du cours. Le classement d'une (classe, semestre, année scolaire)
+est mis en cache et invalidé par toute modification des notes, des cours,
+des matières ou des étudiants.
+"""
+from django.db.models import F, Window
+from django.db.models.functions import Rank
+from .models import Etudiant, Cours, Note, Matiere
+from .compteurs import valeur_en_cache
+from .moyennes import (
+    filtrer_notes, expression_moyenne_cours, expression_moyenne_generale, _arrondir
+)
+
+
+class RangGroupe(Window):
+    """
+    Window calculée sur une requête groupée.
+
+    Django 4.2 ajoute une Window partitionnée au GROUP BY, ce que les bases
+    refusent lorsqu'elle porte sur un agrégat. Les colonnes de partition
+    font déjà partie du regroupement, il n'y a donc rien à y ajouter.
+    """
+
+    def get_group_by_cols(self):
+        return []
+
+
+def _classer(lignes):
+    return [
+        {'etudiant_id': ligne['etudiant'], 'moyenne': _arrondir(ligne['moyenne']), 'rang': ligne['rang']}
+        for ligne in lignes
+    ]
+
+
+def calculer_classement(classe, semestre=None, annee_scolaire=None):
+    """Classements général et par cours d'une classe (deux requêtes)"""
+    notes = filtrer_notes(classe=classe, semestre=semestre, annee_scolaire=annee_scolaire)
+
+    general = notes.values('etudiant', 'etudiant__classe').annotate(
+        moyenne=expression_moyenne_generale(),
+        rang=RangGroupe(
+            Rank(),
+            partition_by=F('etudiant__classe'),
+            order_by=expression_moyenne_generale().desc(),
+        ),
+    ).order_by('rang', 'etudiant')
+
+    par_cours = {}
+    lignes_cours = notes.values('cours', 'etudiant').annotate(
+        moyenne=expression_moyenne_cours(),
+        rang=RangGroupe(
+            Rank(),
+            partition_by=F('cours'),
+            order_by=expression_moyenne_cours().desc(),
+        ),
+    ).order_by('cours', 'rang', 'etudiant')
+    for ligne in lignes_cours:
+        par_cours.setdefault(ligne['cours'], []).append(ligne)
+
+    return {
+        'general': _classer(general),
+        'par_cours': {cours_id: _classer(lignes) for cours_id, lignes in par_cours.items()},
+    }
+
+
+def classement_classe(classe, semestre=None, annee_scolaire=None):
+    """Classement d'une classe, servi depuis le cache tant que les notes ne changent pas"""
+    return valeur_en_cache(
+        'classement',
+        (Note, Cours, Matiere, Etudiant),
+        lambda: calculer_classement(classe, semestre, annee_scolaire),
+        classe.pk, semestre or '', annee_scolaire or '',
+    )
+
+
+def rangs_etudiant(etudiant, semestre=None, annee_scolaire=None):
+    """Rang d'un étudiant dans sa classe et dans chacun de ses cours"""
+    classement = classement_classe(etudiant.classe, semestre, annee_scolaire)
+
+    def trouver(lignes):
+        for ligne in lignes:
+            if ligne['etudiant_id'] == etudiant.pk:
+                return {'rang': ligne['rang'], 'effectif': len(lignes), 'moyenne': ligne['moyenne']}
+        return None
+
+    return {
+        'general': trouver(classement['general']),
+        'par_cours': {
+            cours_id: trouver(lignes) for cours_id, lignes in classement['par_cours'].items()
+        },
+    }
+
+
+def tableau_classement(classe, semestre=None, annee_scolaire=None):
+    """Classement général d'une classe avec les étudiants chargés (une requête hors cache)"""
+    classement = classement_classe(classe, semestre, annee_scolaire)
+    etudiants = Etudiant.objects.select_related('user').in_bulk(
+        [ligne['etudiant_id'] for ligne in classement['general']]
+    )
+    return [
+        dict(ligne, etudiant=etudiants[ligne['etudiant_id']])
+        for ligne in classement['general'] if ligne['etudiant_id'] in etudiants
+    ]
@@ -0,0 +1,294 @@
+"""
+Compteurs en cache pour le tableau de bord
+
+Chaque modèle suivi possède une clé de version dans le cache. Les valeurs
+mises en cache sont rangées sous une clé qui inclut les versions des modèles
+dont elles dépendent : modifier un modèle (signal save/delete ou opération en
+masse) change sa version et rend obsolètes, sans les parcourir, toutes les
+valeurs qui en dépendent.
+"""
+import hashlib
+import time
+from datetime import datetime, time as heure, timedelta, timezone as fuseau
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import (
+    Etudiant, Enseignant, Classe, Cours, Note, Matiere, EmploiDuTemps,
+    Message, Notification, ProfilUtilisateur, HistoriqueConnexion, ActiviteConnexionJour,
+    ActiviteNotesJour, Salle, Equipement,
+)
+from .moyennes import moyenne_etudiant
+
+
+PREFIXE = 'compteurs'
+DUREE_CACHE = 60 * 60 * 24
+
+# Nombre de jours d'activité de connexion affichés sur le tableau de bord admin
+JOURS_ACTIVITE = 28
+
+# Modèles dont une modification invalide des valeurs en cache
+MODELES_SUIVIS = [
+    User, Etudiant, Enseignant, Classe, Cours, Note, Matiere, EmploiDuTemps,
+    Message, Notification, ProfilUtilisateur, HistoriqueConnexion, ActiviteConnexionJour,
+    ActiviteNotesJour, Salle, Equipement,
+]
+
+
+def _cle_version(modele):
+    return f'{PREFIXE}:version:{modele._meta.label_lower}'
+
+
+def _nouvelle_version():
+    return time.time_ns()
+
+
+def invalider_compteurs(*modeles):
+    """Change la version des modèles donnés (immédiatement et après le commit)"""
+    versions = {_cle_version(modele): None for modele in modeles}
+
+    def invalider():
+        cache.set_many({cle: _nouvelle_version() for cle in versions}, None)
+
+    invalider()
+    # Une lecture concurrente avant le commit a pu remettre en cache des valeurs obsolètes
+    transaction.on_commit(invalider)
+
+
+def lire_versions(modeles):
+    """Versions courantes des modèles (une seule lecture du cache)"""
+    cles = {_cle_version(modele): modele for modele in modeles}
+    trouvees = cache.get_many(list(cles))
+    manquantes = {cle: _nouvelle_version() for cle in cles if cle not in trouvees}
+    if manquantes:
+        cache.set_many(manquantes, None)
+        trouvees.update(manquantes)
+    return {cles[cle]: version for cle, version in trouvees.items()}
+
+
+def _cle_valeur(nom, modeles, versions, *parametres):
+    """Clé d'une valeur en cache, dérivée des versions des modèles dont elle dépend"""
+    empreinte = ':'.join(str(versions[modele]) for modele in modeles)
+    empreinte = hashlib.md5(empreinte.encode()).hexdigest()
+    suffixe = ':'.join(str(p) for p in parametres)
+    return f'{PREFIXE}:{nom}:{suffixe}:{empreinte}'
+
+
+def horodatage_versions(modeles, *parametres):
+    """
+    ETag et date de dernière modification des données dérivées des modèles.
+
+    Ne lit que le cache : une requête conditionnelle peut être résolue par un
+    304 sans interroger la base.
+    """
+    versions = lire_versions(modeles)
+    empreinte = ':'.join([str(versions[modele]) for modele in modeles] + [str(p) for p in parametres])
+    etag = hashlib.md5(empreinte.encode()).hexdigest()
+    derniere_modification = datetime.fromtimestamp(max(versions.values()) / 1e9, tz=fuseau.utc)
+    return etag, derniere_modification
+
+
+def _debut_jour(jour):
+    return timezone.make_aware(datetime.combine(jour, heure.min))
+
+
+def activite_par_jour(debut, fin):
+    """Activité de connexion de chaque jour de la période, jours sans connexion compris"""
+    lignes = ActiviteConnexionJour.objects.filter(jour__gte=debut, jour__lte=fin).in_bulk(
+        field_name='jour'
+    )
+    activite = []
+    jour = debut
+    while jour <= fin:
+        ligne = lignes.get(jour)
+        activite.append({
+            'jour': jour,
+            'reussies': ligne.connexions_reussies if ligne else 0,
+            'echouees': ligne.connexions_echouees if ligne else 0,
+            'utilisateurs': ligne.utilisateurs_distincts if ligne else 0,
+        })
+        jour += timedelta(days=1)
+    return activite
+
+
+def definitions_compteurs():
+    """Compteurs disponibles : nom -> (modèles dont il dépend, calcul, paramètres de clé)"""
+    aujourd_hui = timezone.localdate()
+    debut_jour = _debut_jour(aujourd_hui)
+    debut_semaine = debut_jour - timedelta(days=7)
+    activite_semaine = ActiviteConnexionJour.objects.filter(
+        jour__gte=aujourd_hui - timedelta(days=7)
+    )
+
+    return {
+        'total_etudiants': ((Etudiant,), Etudiant.objects.count, ()),
+        'total_enseignants': ((Enseignant,), Enseignant.objects.count, ()),
+        'total_cours': ((Cours,), Cours.objects.count, ()),
+        'total_classes': ((Classe,), Classe.objects.count, ()),
+        'connexions_aujourd_hui': (
+            (ActiviteConnexionJour,),
+            lambda: activite_semaine.filter(jour=aujourd_hui).aggregate(
+                n=Coalesce(Sum('connexions_reussies'), 0)
+            )['n'],
+            (aujourd_hui,),
+        ),
+        'connexions_semaine': (
+            (ActiviteConnexionJour,),
+            lambda: activite_semaine.aggregate(n=Coalesce(Sum('connexions_reussies'), 0))['n'],
+            (aujourd_hui,),
+        ),
+        # Chaque connexion réussie met à jour last_login et l'activité du jour ;
+        # les comptes supprimés ou désactivés changent la version de User
+        'utilisateurs_actifs': (
+            (ActiviteConnexionJour, User),
+            User.objects.filter(last_login__gte=debut_semaine).count,
+            (aujourd_hui,),
+        ),
+        'activite_connexions': (
+            (ActiviteConnexionJour,),
+            lambda: activite_par_jour(aujourd_hui - timedelta(days=JOURS_ACTIVITE - 1), aujourd_hui),
+            (aujourd_hui,),
+        ),
+        'messages_semaine': (
+            (Message,),
+            Message.objects.filter(date_envoi__gte=debut_semaine).count,
+            (aujourd_hui,),
+        ),
+        'notes_ajoutees_semaine': (
+            (ActiviteNotesJour,),
+            lambda: ActiviteNotesJour.objects.filter(
+                jour__gte=aujourd_hui - timedelta(days=7)
+            ).aggregate(n=Coalesce(Sum('notes_saisies'), 0))['n'],
+            (aujourd_hui,),
+        ),
+        'mots_de_passe_temporaires': (
+            (ProfilUtilisateur,),
+            ProfilUtilisateur.objects.filter(mot_de_passe_temporaire=True).count,
+            (),
+        ),
+        'notifications_non_lues': (
+            (Notification,), Notification.objects.filter(lue=False).count, (),
+        ),
+        'messages_non_lus': ((Message,), Message.objects.filter(lu=False).count, ()),
+    }
+
+
+def lire_compteurs(noms, sections=()):
+    """
+    Lit des compteurs et des sections en cache et calcule uniquement ceux qui manquent.
+
+    `sections` est une liste de (nom, modèles, calcul, paramètres) pour des
+    valeurs qui ne sont pas des compteurs globaux (données propres à un utilisateur).
+    Avec un cache chaud, aucune requête n'est envoyée à la base de données.
+    """
+    definitions = definitions_compteurs()
+    entrees = [(nom,) + definitions[nom] for nom in noms] + list(sections)
+
+    modeles = {modele for _, dependances, _, _ in entrees for modele in dependances}
+    versions = lire_versions(modeles)
+
+    cles = {
+        nom: _cle_valeur(nom, dependances, versions, *parametres)
+        for nom, dependances, _, parametres in entrees
+    }
+    en_cache = cache.get_many(list(cles.values()))
+
+    valeurs = {}
+    a_stocker = {}
+    for nom, _, calcul, _ in entrees:
+        cle = cles[nom]
+        if cle in en_cache:
+            valeurs[nom] = en_cache[cle]
+        else:
+            valeurs[nom] = a_stocker[cle] = calcul()
+    if a_stocker:
+        cache.set_many(a_stocker, DUREE_CACHE)
+    return valeurs
+
+
+def _section_etudiant(etudiant):
+    notes = Note.objects.filter(etudiant=etudiant)
+    return {
+        'user_type': 'etudiant',
+        'etudiant': etudiant,
+        'mes_cours': list(
+            Cours.objects.filter(classe=etudiant.classe_id)
+            .select_related('matiere', 'enseignant__user')
+        ),
+        'mes_notes': list(
+            notes.select_related('cours__matiere').order_by('-date_evaluation')[:5]
+        ),
+        'emploi_du_temps': list(
+            EmploiDuTemps.objects.filter(cours__classe=etudiant.classe_id)
+            .select_related('cours__matiere', 'cours__enseignant__user')
+            .order_by('jour', 'heure_debut')
+        ),
+        'moyenne_generale': moyenne_etudiant(etudiant),
+    }
+
+
+def _section_enseignant(enseignant):
+    from .effectifs import effectifs_enseignant
+
+    effectifs = effectifs_enseignant(enseignant)
+    mes_cours = list(
+        Cours.objects.filter(enseignant=enseignant).select_related('matiere', 'classe')
+    )
+    for cours in mes_cours:
+        cours.effectif = effectifs['par_cours'].get(cours.pk, 0)
+    return {
+        'user_type': 'enseignant',
+        'enseignant': enseignant,
+        'mes_cours': mes_cours,
+        'emploi_du_temps': list(
+            EmploiDuTemps.objects.filter(cours__enseignant=enseignant)
+            .select_related('cours__matiere', 'cours__enseignant__user')
+            .order_by('jour', 'heure_debut')
+        ),
+        'mes_etudiants': effectifs['total'],
+    }
+
+
+def valeur_en_cache(nom, modeles, calcul, *parametres):
+    """Valeur calculée une fois puis servie depuis le cache tant que les modèles ne changent pas"""
+    return lire_compteurs([], sections=[(nom, modeles, calcul, parametres)])[nom]
+
+
+def section_utilisateur(user):
+    """Données du tableau de bord propres au rôle de l'utilisateur"""
+    etudiant = Etudiant.objects.select_related('user', 'classe').filter(user=user).first()
+    if etudiant:
+        return _section_etudiant(etudiant)
+    enseignant = Enseignant.objects.select_related('user').filter(user=user).first()
+    if enseignant:
+        return _section_enseignant(enseignant)
+    return {'user_type': 'admin'}
+
+
+def compteurs_tableau_de_bord(user):
+    """Contexte complet du tableau de bord, servi depuis le cache"""
+    noms = [
+        'total_etudiants', 'total_enseignants', 'total_cours', 'total_classes',
+        'connexions_aujourd_hui', 'connexions_semaine', 'utilisateurs_actifs',
+        'messages_semaine', 'notes_ajoutees_semaine', 'mots_de_passe_temporaires',
+        'notifications_non_lues', 'messages_non_lus', 'activite_connexions',
+    ]
+    section = (
+        'section',
+        (User, Etudiant, Enseignant, Classe, Cours, Note, Matiere, EmploiDuTemps),
+        lambda: section_utilisateur(user),
+        (user.pk,),
+    )
+    valeurs = lire_compteurs(noms, sections=[section])
+
+    context = {nom: valeurs[nom] for nom in noms}
+    context.update(valeurs['section'])
+    if context['user_type'] != 'admin':
+        # Compteurs réservés à la vue administrateur
+        del context['notifications_non_lues']
+        del context['messages_non_lus']
+        del context['activite_connexions']
+    return context
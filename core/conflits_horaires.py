@@ -0,0 +1,158 @@
+"""
+Conflits de l'emploi du temps
+
+Les créneaux d'une période (semestre, année scolaire) sont chargés en une
+requête et rangés par ressource : salle, enseignant et classe, pour chaque
+jour de la semaine. Les créneaux de chaque ressource sont triés par heure de
+début puis balayés en gardant dans un tas ceux qui ne sont pas terminés :
+chaque créneau est en conflit avec tous les créneaux encore en cours.
+Tous les chevauchements sont trouvés en O(n log n + k), k étant le nombre
+de conflits.
+
+Le même moteur valide un emploi du temps entier, une modification isolée
+(vues d'ajout et de modification) ou un lot de créneaux à ajouter.
+"""
+import heapq
+from collections import defaultdict, namedtuple
+from django.db.models import Q
+from .models import EmploiDuTemps
+
+
+# `ref` identifie le créneau : clé primaire d'un créneau enregistré, ou toute
+# valeur choisie par l'appelant pour un créneau proposé
+Creneau = namedtuple('Creneau', [
+    'ref', 'cours_id', 'enseignant_id', 'classe_id', 'salle', 'jour', 'debut', 'fin',
+    'semestre', 'annee_scolaire', 'libelle',
+])
+
+Conflit = namedtuple('Conflit', ['ressource', 'valeur', 'premier', 'second'])
+
+# Ressource -> (libellé, description d'un conflit du point de vue d'un créneau)
+RESSOURCES = {
+    'salle': ('salle', 'Salle {valeur} déjà occupée'),
+    'enseignant': ('enseignant', 'Enseignant déjà en cours'),
+    'classe': ('classe', 'Classe déjà en cours'),
+}
+
+CHAMPS = [
+    'pk', 'cours_id', 'cours__enseignant_id', 'cours__classe_id', 'salle', 'jour',
+    'heure_debut', 'heure_fin', 'cours__semestre', 'cours__annee_scolaire',
+    'cours__matiere__code', 'cours__classe__nom',
+]
+
+
+def normaliser_salle(salle):
+    return (salle or '').strip().upper()
+
+
+def _valeur(creneau, ressource):
+    if ressource == 'salle':
+        return normaliser_salle(creneau.salle) or None
+    return getattr(creneau, f'{ressource}_id')
+
+
+def creneaux(emplois):
+    """Créneaux d'un QuerySet d'EmploiDuTemps, en une requête"""
+    return [
+        Creneau(pk, cours_id, enseignant_id, classe_id, salle, jour, debut, fin, semestre, annee,
+                f'{code} {classe}')
+        for pk, cours_id, enseignant_id, classe_id, salle, jour, debut, fin, semestre, annee, code, classe
+        in emplois.values_list(*CHAMPS).order_by()
+    ]
+
+
+def charger_creneaux(semestre=None, annee_scolaire=None):
+    """Créneaux enregistrés d'une période (toutes les périodes par défaut)"""
+    emplois = EmploiDuTemps.objects.all()
+    if semestre:
+        emplois = emplois.filter(cours__semestre=semestre)
+    if annee_scolaire:
+        emplois = emplois.filter(cours__annee_scolaire=annee_scolaire)
+    return creneaux(emplois)
+
+
+def index_ressources(liste):
+    """Créneaux rangés par (ressource, valeur, période, jour)"""
+    index = defaultdict(list)
+    for creneau in liste:
+        for ressource in RESSOURCES:
+            valeur = _valeur(creneau, ressource)
+            if valeur is not None:
+                index[ressource, valeur, creneau.semestre, creneau.annee_scolaire, creneau.jour].append(creneau)
+    return index
+
+
+def _balayer(liste):
+    """Paires de créneaux qui se chevauchent (balayage par heure de début)"""
+    en_cours = []
+    for i, creneau in enumerate(sorted(liste, key=lambda c: (c.debut, c.fin))):
+        # Un créneau qui finit à l'heure où commence le suivant n'est pas en conflit
+        while en_cours and en_cours[0][0] <= creneau.debut:
+            heapq.heappop(en_cours)
+        for _, _, autre in en_cours:
+            yield autre, creneau
+        heapq.heappush(en_cours, (creneau.fin, i, creneau))
+
+
+def detecter_conflits(liste, concernes=None):
+    """
+    Tous les conflits entre les créneaux donnés.
+
+    Si `concernes` (ensemble de refs) est donné, seuls les conflits qui
+    impliquent l'un de ces créneaux sont retournés.
+    """
+    conflits = []
+    for (ressource, valeur, *_), groupe in index_ressources(liste).items():
+        if len(groupe) < 2:
+            continue
+        for premier, second in _balayer(groupe):
+            if concernes is None or premier.ref in concernes or second.ref in concernes:
+                conflits.append(Conflit(ressource, valeur, premier, second))
+    return conflits
+
+
+def verifier_creneaux(nouveaux, remplaces=()):
+    """
+    Conflits d'un lot de créneaux proposés, entre eux et avec les créneaux
+    enregistrés des mêmes périodes et des mêmes jours.
+
+    `remplaces` : clés primaires des créneaux enregistrés que le lot remplace
+    (modification), ignorés.
+    """
+    nouveaux = list(nouveaux)
+    if not nouveaux:
+        return []
+    periodes = Q()
+    for semestre, annee_scolaire in {(c.semestre, c.annee_scolaire) for c in nouveaux}:
+        periodes |= Q(cours__semestre=semestre, cours__annee_scolaire=annee_scolaire)
+    emplois = EmploiDuTemps.objects.filter(periodes, jour__in={c.jour for c in nouveaux}).exclude(
+        pk__in=list(remplaces)
+    )
+    return detecter_conflits(creneaux(emplois) + nouveaux, concernes={c.ref for c in nouveaux})
+
+
+def creneau_propose(cours, jour, debut, fin, salle, ref=None):
+    """Créneau d'un cours (instance avec matière et classe) qui n'est pas encore enregistré"""
+    return Creneau(
+        ref, cours.pk, cours.enseignant_id, cours.classe_id, salle, jour, debut, fin,
+        cours.semestre, cours.annee_scolaire, f'{cours.matiere.code} {cours.classe.nom}',
+    )
+
+
+def _decrire(creneau):
+    return f"{creneau.libelle} ({creneau.debut.strftime('%H:%M')}-{creneau.fin.strftime('%H:%M')})"
+
+
+def decrire_conflit(conflit, point_de_vue=None):
+    """
+    Phrase décrivant un conflit. Avec `point_de_vue` (ref d'un créneau),
+    seul l'autre créneau, qui occupe déjà la ressource, est décrit.
+    """
+    libelle, occupation = RESSOURCES[conflit.ressource]
+    jour = dict(EmploiDuTemps.JOURS_SEMAINE).get(conflit.premier.jour, conflit.premier.jour)
+    if point_de_vue is not None:
+        autre = conflit.second if conflit.premier.ref == point_de_vue else conflit.premier
+        return f'{occupation.format(valeur=conflit.valeur)} le {jour.lower()} : {_decrire(autre)}'
+    if conflit.ressource == 'salle':
+        libelle = f'{libelle} {conflit.valeur}'
+    return f'{jour}, {libelle} : {_decrire(conflit.premier)} / {_decrire(conflit.second)}'
@@ -0,0 +1,253 @@
+"""
+Délibérations de semestre
+
+Les moyennes pondérées étudiant × cours d'un semestre sont chargées en une
+requête groupée, puis rangées dans une matrice numpy par classe (une ligne
+par étudiant, une colonne par cours, NaN sans note). Les règles sont
+appliquées sur la matrice entière :
+
+- une matière est validée si sa moyenne atteint Matiere.note_validation ;
+- si la compensation est active, un semestre complet dont la moyenne
+  (pondérée par les crédits) atteint le seuil de compensation valide toutes
+  ses matières, sauf si l'une d'elles est sous la note éliminatoire ;
+- un étudiant sans note dans un cours de sa classe est incomplet.
+
+Les décisions et leurs explications sont écrites en un bulk_create.
+"""
+from decimal import Decimal
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+from .models import Etudiant, Cours, DecisionSemestre, ParametresSysteme
+from .moyennes import filtrer_notes, expression_moyenne_cours
+
+
+REGLES_DEFAUT = {
+    'compensation': True,
+    'moyenne_compensation': Decimal('10'),
+    'note_eliminatoire': Decimal('7'),
+}
+
+TAILLE_LOT = 1000
+
+
+def regles_deliberation():
+    """Règles de délibération des paramètres système (valeurs par défaut sinon)"""
+    parametres = ParametresSysteme.objects.values(
+        'compensation_semestre', 'moyenne_compensation', 'note_eliminatoire'
+    ).first()
+    if parametres is None:
+        return dict(REGLES_DEFAUT)
+    return {
+        'compensation': parametres['compensation_semestre'],
+        'moyenne_compensation': parametres['moyenne_compensation'],
+        'note_eliminatoire': parametres['note_eliminatoire'],
+    }
+
+
+def _decoupage(valeurs):
+    """Intervalle [début, fin) occupé par chaque valeur d'un tableau trié"""
+    if not len(valeurs):
+        return {}
+    debuts = np.flatnonzero(np.r_[True, valeurs[1:] != valeurs[:-1]])
+    fins = np.r_[debuts[1:], len(valeurs)]
+    return {int(valeurs[d]): (int(d), int(f)) for d, f in zip(debuts, fins)}
+
+
+def charger_matrices(classes, semestre, annee_scolaire):
+    """
+    Moyennes étudiant × cours de chaque classe, en trois requêtes.
+
+    Retourne un dictionnaire classe_id -> {'etudiants', 'cours', 'moyennes'} :
+    identifiants des étudiants (lignes), liste des cours (colonnes) et
+    matrice des moyennes arrondies au centième (NaN sans note).
+    """
+    classes_ids = [getattr(classe, 'pk', classe) for classe in classes]
+    etudiants = np.array(
+        list(Etudiant.objects.filter(classe__in=classes_ids).values_list('classe', 'pk').order_by('classe', 'pk')),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    cours = list(Cours.objects.filter(
+        classe__in=classes_ids, semestre=semestre, annee_scolaire=annee_scolaire
+    ).values(
+        'pk', 'classe', 'matiere__code', 'matiere__nom', 'matiere__credits', 'matiere__note_validation'
+    ).order_by('classe', 'matiere__code', 'pk'))
+    cours_ids = np.array([c['pk'] for c in cours], dtype=np.int64)
+    cours_classes = np.array([c['classe'] for c in cours], dtype=np.int64)
+
+    lignes = filtrer_notes(semestre=semestre, annee_scolaire=annee_scolaire).filter(
+        etudiant__classe__in=classes_ids
+    ).values('etudiant', 'cours').annotate(moyenne=expression_moyenne_cours()).values_list(
+        'etudiant', 'cours', 'moyenne'
+    ).order_by()
+    triplets = np.array(list(lignes), dtype=np.float64).reshape(-1, 3)
+
+    # Position globale de chaque moyenne : ligne de l'étudiant, colonne du cours
+    lignes_globales = colonnes_globales = np.empty(0, dtype=np.int64)
+    valeurs = np.empty(0)
+    if len(cours_ids) and len(triplets):
+        ordre_etudiants = np.argsort(etudiants[:, 1])
+        ordre_cours = np.argsort(cours_ids)
+        positions = np.searchsorted(cours_ids[ordre_cours], triplets[:, 1].astype(np.int64))
+        positions = np.minimum(positions, len(cours_ids) - 1)
+        colonnes = ordre_cours[positions]
+        lignes_e = ordre_etudiants[np.searchsorted(etudiants[ordre_etudiants, 1], triplets[:, 0].astype(np.int64))]
+        # Seuls les cours du semestre de la classe de l'étudiant comptent
+        garder = (cours_ids[colonnes] == triplets[:, 1]) & (cours_classes[colonnes] == etudiants[lignes_e, 0])
+        lignes_globales, colonnes_globales = lignes_e[garder], colonnes[garder]
+        valeurs = np.round(triplets[garder, 2], 2)
+
+    blocs_etudiants = _decoupage(etudiants[:, 0])
+    blocs_cours = _decoupage(cours_classes)
+    classe_moyennes = etudiants[lignes_globales, 0]
+    matrices = {}
+    for classe_id in classes_ids:
+        debut_e, fin_e = blocs_etudiants.get(classe_id, (0, 0))
+        debut_c, fin_c = blocs_cours.get(classe_id, (0, 0))
+        moyennes = np.full((fin_e - debut_e, fin_c - debut_c), np.nan)
+        dans_classe = classe_moyennes == classe_id
+        moyennes[lignes_globales[dans_classe] - debut_e, colonnes_globales[dans_classe] - debut_c] = valeurs[dans_classe]
+        matrices[classe_id] = {
+            'etudiants': etudiants[debut_e:fin_e, 1],
+            'cours': cours[debut_c:fin_c],
+            'moyennes': moyennes,
+        }
+    return matrices
+
+
+def appliquer_regles(moyennes, credits, seuils, regles):
+    """
+    Décisions d'une classe à partir de sa matrice de moyennes.
+
+    `credits` et `seuils` sont indexés par colonne. Retourne un dictionnaire
+    de tableaux indexés par étudiant (décision, moyenne du semestre, crédits
+    obtenus) et par (étudiant, cours) (présence, validation, élimination).
+    """
+    presentes = ~np.isnan(moyennes)
+    notes = np.where(presentes, moyennes, 0.0)
+    validees = presentes & (notes >= seuils)
+    eliminatoires = presentes & (notes < float(regles['note_eliminatoire']))
+
+    poids = np.where(presentes, credits, 0.0)
+    total_poids = poids.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        moyenne_semestre = np.round((notes * poids).sum(axis=1) / total_poids, 2)
+
+    completes = presentes.all(axis=1)
+    toutes_validees = validees.all(axis=1)
+    compensees = (
+        bool(regles['compensation']) & completes & ~toutes_validees & ~eliminatoires.any(axis=1)
+        & (np.nan_to_num(moyenne_semestre, nan=-1.0) >= float(regles['moyenne_compensation']))
+    )
+    decisions = np.select(
+        [toutes_validees & completes, compensees, ~completes],
+        ['ADMIS', 'COMPENSATION', 'INCOMPLET'],
+        default='AJOURNE',
+    )
+    credits_obtenus = np.where(compensees[:, None], presentes, validees) @ credits
+
+    return {
+        'decisions': decisions,
+        'moyennes': moyenne_semestre,
+        'credits_obtenus': credits_obtenus.astype(np.int64),
+        'presentes': presentes,
+        'validees': validees,
+        'eliminatoires': eliminatoires,
+        'compensees': compensees,
+    }
+
+
+def _nombre(valeur):
+    # Appelé pour chaque moyenne : number_format serait le poste le plus coûteux
+    return f'{float(valeur):.2f}'.replace('.', ',')
+
+
+def expliquer_decisions(cours, moyennes, resultat, regles):
+    """Explications des décisions d'une classe, une par ligne de la matrice"""
+    libelles = [f"{c['matiere__code']} {c['matiere__nom']}" for c in cours]
+    seuils = [_nombre(c['matiere__note_validation']) for c in cours]
+    eliminatoire = f", note éliminatoire (< {_nombre(regles['note_eliminatoire'])})"
+    compensation = _nombre(regles['moyenne_compensation'])
+    # Listes Python : l'accès élément par élément aux tableaux numpy est lent
+    notes, presentes = moyennes.tolist(), resultat['presentes'].tolist()
+    validees, eliminatoires = resultat['validees'].tolist(), resultat['eliminatoires'].tolist()
+    compensees, semestre = resultat['compensees'].tolist(), resultat['moyennes'].tolist()
+
+    explications = []
+    for i, decision in enumerate(resultat['decisions'].tolist()):
+        lignes = []
+        etat_non_valide = 'compensée' if compensees[i] else 'non validée'
+        for j, libelle in enumerate(libelles):
+            if not presentes[i][j]:
+                lignes.append(f'{libelle} : aucune note')
+                continue
+            etat = 'validée' if validees[i][j] else etat_non_valide
+            detail = f'{libelle} : {_nombre(notes[i][j])}/20 - {etat} (seuil {seuils[j]})'
+            lignes.append(detail + eliminatoire if eliminatoires[i][j] else detail)
+
+        if decision == 'ADMIS':
+            motif = 'Toutes les matières sont validées.'
+        elif decision == 'COMPENSATION':
+            motif = (f'Matières compensées : moyenne du semestre {_nombre(semestre[i])} '
+                     f'≥ {compensation} sans note éliminatoire.')
+        elif decision == 'INCOMPLET':
+            motif = 'Au moins une matière sans note.'
+        elif not regles['compensation']:
+            motif = 'Matière(s) non validée(s), compensation désactivée.'
+        elif any(eliminatoires[i]):
+            motif = 'Matière(s) non validée(s), compensation impossible : note éliminatoire.'
+        else:
+            motif = (f'Matière(s) non validée(s), compensation impossible : moyenne du semestre '
+                     f'{_nombre(semestre[i])} < {compensation}.')
+        lignes.append(motif)
+        explications.append('\n'.join(lignes))
+    return explications
+
+
+def deliberer(classes, semestre, annee_scolaire, regles=None, enregistrer=True):
+    """
+    Délibère un semestre pour les classes données.
+
+    Retourne les décisions (DecisionSemestre), enregistrées en remplaçant
+    celles d'une délibération précédente sauf si `enregistrer` est faux.
+    """
+    regles = regles or regles_deliberation()
+    maintenant = timezone.now()
+    decisions = []
+    for classe_id, matrice in charger_matrices(classes, semestre, annee_scolaire).items():
+        cours, moyennes = matrice['cours'], matrice['moyennes']
+        if not cours:
+            continue
+        credits = np.array([c['matiere__credits'] for c in cours], dtype=np.float64)
+        seuils = np.array([float(c['matiere__note_validation']) for c in cours])
+        resultat = appliquer_regles(moyennes, credits, seuils, regles)
+        credits_totaux = int(credits.sum())
+        explications = expliquer_decisions(cours, moyennes, resultat, regles)
+        for i, etudiant_id in enumerate(matrice['etudiants'].tolist()):
+            moyenne = resultat['moyennes'][i]
+            decisions.append(DecisionSemestre(
+                etudiant_id=etudiant_id,
+                classe_id=classe_id,
+                semestre=semestre,
+                annee_scolaire=annee_scolaire,
+                decision=str(resultat['decisions'][i]),
+                moyenne=None if np.isnan(moyenne) else Decimal(str(moyenne)),
+                credits_obtenus=int(resultat['credits_obtenus'][i]),
+                credits_totaux=credits_totaux,
+                explication=explications[i],
+                date_deliberation=maintenant,
+            ))
+
+    if enregistrer:
+        with transaction.atomic():
+            DecisionSemestre.objects.bulk_create(
+                decisions,
+                batch_size=TAILLE_LOT,
+                update_conflicts=True,
+                unique_fields=['etudiant', 'semestre', 'annee_scolaire'],
+                update_fields=[
+                    'classe', 'decision', 'moyenne', 'credits_obtenus', 'credits_totaux',
+                    'explication', 'date_deliberation',
+                ],
+            )
+    return decisions
@@ -0,0 +1,140 @@
+"""
+Distribution des notes avec NumPy
+
+Les notes sont lues en flux (values_list(...).iterator()) et rangées lot par
+lot dans des tableaux NumPy compacts : trois clés entières (classe, matière,
+type d'évaluation) et la valeur en float32, soit 16 octets par note. Les
+médianes, quartiles, écarts-types et histogrammes 0-20 de tous les groupes
+sont ensuite calculés en quelques passes vectorisées, sans boucle Python sur
+les notes.
+"""
+from itertools import islice
+import numpy as np
+from django.db.models import Case, When, Value, IntegerField, FloatField
+from django.db.models.functions import Cast
+from .models import Note
+
+
+TAILLE_LOT = 50000
+
+# Histogramme 0-20 par tranches de 2 points (20/20 compte dans la dernière tranche)
+LARGEUR_TRANCHE = 2
+NOMBRE_TRANCHES = 10
+LIBELLES_TRANCHES = [
+    f'{i * LARGEUR_TRANCHE}-{(i + 1) * LARGEUR_TRANCHE}' for i in range(NOMBRE_TRANCHES)
+]
+
+CODES_TYPES = [code for code, _ in Note.TYPES_EVALUATION]
+
+# Nombre de centièmes possibles entre 0 et 20 inclus
+PAS_CODAGE = 2001
+
+# Colonnes du tableau des clés
+CLASSE, MATIERE, TYPE = 0, 1, 2
+
+
+def charger_notes(notes=None, taille_lot=TAILLE_LOT):
+    """Lit les notes en flux et retourne (clés int32 de forme (n, 3), valeurs float32)"""
+    if notes is None:
+        notes = Note.objects.all()
+    lignes = notes.annotate(
+        valeur=Cast('note', FloatField()),
+        code_type=Case(
+            *[When(type_evaluation=code, then=Value(i)) for i, code in enumerate(CODES_TYPES)],
+            default=Value(-1),
+            output_field=IntegerField(),
+        ),
+    ).values_list(
+        'etudiant__classe_id', 'cours__matiere_id', 'code_type', 'valeur'
+    ).order_by().iterator(chunk_size=taille_lot)
+
+    cles, valeurs = [], []
+    while True:
+        lot = list(islice(lignes, taille_lot))
+        if not lot:
+            break
+        tableau = np.array(lot, dtype=np.float64)
+        cles.append(tableau[:, :3].astype(np.int32))
+        valeurs.append(tableau[:, 3].astype(np.float32))
+
+    if not cles:
+        return np.empty((0, 3), dtype=np.int32), np.empty(0, dtype=np.float32)
+    return np.concatenate(cles), np.concatenate(valeurs)
+
+
+def statistiques_groupes(cles, valeurs):
+    """
+    Statistiques de distribution de chaque groupe, en passes vectorisées.
+
+    `cles` est un tableau d'entiers (un groupe par valeur distincte) de même
+    longueur que `valeurs`. Retourne un dictionnaire clé -> statistiques.
+    """
+    if not len(valeurs):
+        return {}
+
+    # Tri par groupe puis par valeur : chaque groupe devient une tranche triée.
+    # Les notes (0-20, au centième) sont codées avec leur groupe dans un seul
+    # entier, ce qui remplace un tri indirect à deux clés par un tri direct.
+    centiemes = np.rint(valeurs.astype(np.float64) * 100).astype(np.int64)
+    codes = np.sort(cles.astype(np.int64) * PAS_CODAGE + centiemes)
+    cles_triees = codes // PAS_CODAGE
+    valeurs_triees = (codes % PAS_CODAGE) / 100
+
+    debuts = np.flatnonzero(np.r_[True, cles_triees[1:] != cles_triees[:-1]])
+    effectifs = np.diff(np.r_[debuts, len(valeurs_triees)])
+    groupes = cles_triees[debuts]
+
+    sommes = np.add.reduceat(valeurs_triees, debuts)
+    carres = np.add.reduceat(valeurs_triees * valeurs_triees, debuts)
+    moyennes = sommes / effectifs
+    ecarts_types = np.sqrt(np.maximum(carres / effectifs - moyennes * moyennes, 0))
+
+    def quantile(q):
+        # Interpolation linéaire, comme numpy.percentile
+        position = debuts + q * (effectifs - 1)
+        bas = np.floor(position).astype(np.int64)
+        haut = np.ceil(position).astype(np.int64)
+        fraction = position - bas
+        return valeurs_triees[bas] * (1 - fraction) + valeurs_triees[haut] * fraction
+
+    premiers_quartiles = quantile(0.25)
+    medianes = quantile(0.5)
+    troisiemes_quartiles = quantile(0.75)
+
+    tranches = np.clip(
+        (valeurs_triees // LARGEUR_TRANCHE).astype(np.int64), 0, NOMBRE_TRANCHES - 1
+    )
+    rangs = np.repeat(np.arange(len(groupes)), effectifs)
+    histogrammes = np.bincount(
+        rangs * NOMBRE_TRANCHES + tranches, minlength=len(groupes) * NOMBRE_TRANCHES
+    ).reshape(len(groupes), NOMBRE_TRANCHES)
+
+    return {
+        int(groupe): {
+            'nombre_notes': int(effectifs[i]),
+            'moyenne': round(float(moyennes[i]), 2),
+            'ecart_type': round(float(ecarts_types[i]), 2),
+            'minimum': round(float(valeurs_triees[debuts[i]]), 2),
+            'premier_quartile': round(float(premiers_quartiles[i]), 2),
+            'mediane': round(float(medianes[i]), 2),
+            'troisieme_quartile': round(float(troisiemes_quartiles[i]), 2),
+            'maximum': round(float(valeurs_triees[debuts[i] + effectifs[i] - 1]), 2),
+            'histogramme': histogrammes[i].tolist(),
+        }
+        for i, groupe in enumerate(groupes)
+    }
+
+
+def calculer_distributions(notes=None):
+    """Distributions globales, par classe, par matière et par type d'évaluation"""
+    cles, valeurs = charger_notes(notes)
+    par_type = statistiques_groupes(cles[:, TYPE], valeurs)
+    return {
+        'globale': statistiques_groupes(np.zeros(len(valeurs), dtype=np.int32), valeurs).get(0),
+        'par_classe': statistiques_groupes(cles[:, CLASSE], valeurs),
+        'par_matiere': statistiques_groupes(cles[:, MATIERE], valeurs),
+        'par_type': {
+            CODES_TYPES[code]: stats for code, stats in par_type.items() if code >= 0
+        },
+        'tranches': LIBELLES_TRANCHES,
+    }
@@ -0,0 +1,44 @@
+"""
+Effectifs des cours et des enseignants
+
+Les étudiants d'un cours sont ceux de sa classe (Cours -> Classe -> Etudiant) :
+les effectifs sont dérivés des inscriptions et non des notes déjà saisies, si
+bien qu'un étudiant encore sans note est compté. Les valeurs sont mises en
+cache et invalidées par toute modification des cours ou des étudiants.
+"""
+from django.db.models import Count
+from .models import Cours, Etudiant
+from .compteurs import valeur_en_cache
+
+
+def calculer_effectifs_enseignant(enseignant_id):
+    """Effectif de chaque cours d'un enseignant et nombre d'étudiants distincts (une requête)"""
+    lignes = Cours.objects.filter(enseignant_id=enseignant_id).values('pk', 'classe').annotate(
+        effectif=Count('classe__etudiant')
+    ).order_by()
+
+    par_cours, par_classe = {}, {}
+    for ligne in lignes:
+        par_cours[ligne['pk']] = ligne['effectif']
+        par_classe[ligne['classe']] = ligne['effectif']
+    # Un étudiant appartient à une seule classe : les classes distinctes suffisent
+    return {'par_cours': par_cours, 'total': sum(par_classe.values())}
+
+
+def effectifs_enseignant(enseignant):
+    """Effectifs des cours d'un enseignant, servis depuis le cache"""
+    return valeur_en_cache(
+        'effectifs_enseignant',
+        (Cours, Etudiant),
+        lambda: calculer_effectifs_enseignant(enseignant.pk),
+        enseignant.pk,
+    )
+
+
+def effectifs_classes():
+    """Nombre d'étudiants inscrits par classe, servi depuis le cache"""
+    return valeur_en_cache(
+        'effectifs_classes',
+        (Etudiant,),
+        lambda: dict(Etudiant.objects.values_list('classe').annotate(n=Count('id')).order_by()),
+    )
@@ -69,6 +69,52 @@ class NoteForm(forms.ModelForm):
         }
 
 
+class SaisieNotesForm(forms.Form):
+    """Évaluation commune à toute la grille de saisie d'un cours"""
+    type_evaluation = forms.ChoiceField(
+        choices=Note.TYPES_EVALUATION,
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    date_evaluation = forms.DateField(
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'})
+    )
+    coefficient = forms.DecimalField(
+        max_digits=3, decimal_places=1, min_value=0.5, initial=1,
+        widget=forms.NumberInput(attrs={'step': '0.5', 'class': 'form-control'})
+    )
+
+
+class ImportNotesForm(forms.Form):
+    fichier = forms.FileField(
+        help_text="Fichier CSV ou XLSX",
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.xlsx'})
+    )
+    simulation = forms.BooleanField(
+        required=False,
+        initial=True,
+        help_text="Valider le fichier sans enregistrer les notes",
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
+
+
+class ImportEmploiDuTempsForm(forms.Form):
+    fichier = forms.FileField(
+        help_text="Fichier CSV ou XLSX",
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.xlsx'})
+    )
+    simulation = forms.BooleanField(
+        required=False,
+        initial=True,
+        help_text="Valider le fichier sans enregistrer les créneaux",
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
+    remplacer = forms.BooleanField(
+        required=False,
+        help_text="Remplacer les créneaux enregistrés des cours présents dans le fichier",
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
+
+
 class EmploiDuTempsForm(forms.ModelForm):
     class Meta:
         model = EmploiDuTemps
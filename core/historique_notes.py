@@ -0,0 +1,137 @@
+"""
+Historique des changements de notes
+
+Chaque création, modification ou suppression de note produit une entrée
+HistoriqueNote (ancienne valeur, nouvelle valeur, auteur, date). Les entrées
+sont mises en attente jusqu'au commit et écrites par bulk_create : chaque
+opération enregistre sa part avec transaction.on_commit, et la première part
+exécutée écrit le lot entier de la transaction en une insertion groupée.
+Le lot en attente de chaque base est gardé par thread et ne retient ses parts
+que par des références faibles : Django oublie les rappels d'une transaction
+ou d'un point de sauvegarde annulé, leurs parts disparaissent donc du lot.
+
+L'auteur est celui de la requête en cours (AuteurModificationsMiddleware) ou
+celui fixé par le contexte auteur_modifications().
+"""
+import threading
+import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.db import transaction
+from .models import HistoriqueNote
+
+
+TAILLE_LOT = 1000
+
+_auteur = ContextVar('auteur_modifications_notes', default=None)
+
+# Lot en attente de chaque base, dans ce thread (références faibles)
+_en_attente = threading.local()
+
+
+@contextmanager
+def auteur_modifications(utilisateur):
+    """Attribue à `utilisateur` les changements de notes faits dans le bloc"""
+    jeton = _auteur.set(utilisateur)
+    try:
+        yield
+    finally:
+        _auteur.reset(jeton)
+
+
+class AuteurModificationsMiddleware:
+    """Attribue les changements de notes d'une requête à l'utilisateur connecté"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        utilisateur = request.user if request.user.is_authenticated else None
+        with auteur_modifications(utilisateur):
+            return self.get_response(request)
+
+
+class _Lot:
+    """Entrées en attente d'une transaction, écrites lorsqu'elle est validée"""
+
+    def __init__(self, using):
+        self.using = using
+        self.parts = []
+        self.ecrit = False
+
+    def ecrire(self, debut=0):
+        self.ecrit = True
+        entrees = [entree for ref in self.parts[debut:] if (part := ref()) is not None for entree in part]
+        HistoriqueNote.objects.using(self.using).bulk_create(entrees, batch_size=TAILLE_LOT)
+
+
+class _Part(list):
+    """Entrées d'une opération, rappel transaction.on_commit de son lot"""
+
+    def __init__(self, lot, entrees):
+        super().__init__(entrees)
+        self.lot = lot
+        self.rang = len(lot.parts)
+        lot.parts.append(weakref.ref(self))
+
+    def __call__(self):
+        # Les rappels s'exécutent dans l'ordre : les parts suivantes, encore en
+        # attente, sont écrites avec la première
+        if not self.lot.ecrit:
+            self.lot.ecrire(self.rang)
+
+
+def _entree(action, identifiant, etudiant_id, cours_id, ancienne=None, nouvelle=None):
+    return HistoriqueNote(
+        identifiant_note=identifiant, etudiant_id=etudiant_id, cours_id=cours_id,
+        action=action, ancienne_valeur=ancienne, nouvelle_valeur=nouvelle,
+        auteur=_auteur.get(),
+    )
+
+
+def journaliser(entrees, using='default'):
+    """Met en attente des entrées (HistoriqueNote non sauvegardées) jusqu'au commit"""
+    if not entrees:
+        return
+    lots = getattr(_en_attente, 'lots', None)
+    if lots is None:
+        lots = _en_attente.lots = {}
+    ref = lots.get(using)
+    lot = ref() if ref is not None else None
+    # Un lot sans part vivante a disparu avec sa transaction ; un lot écrit est clos
+    if lot is None or lot.ecrit:
+        lot = _Lot(using)
+        lots[using] = weakref.ref(lot)
+    transaction.on_commit(_Part(lot, entrees), using=using)
+
+
+def journaliser_creations(notes):
+    """`notes` : (identifiant, etudiant_id, cours_id, valeur) des notes créées"""
+    journaliser([_entree('C', pk, etudiant_id, cours_id, nouvelle=valeur)
+                 for pk, etudiant_id, cours_id, valeur in notes if pk is not None])
+
+
+def journaliser_modifications(avant, apres):
+    """
+    `avant` associe l'identifiant de chaque note modifiée à son ancienne
+    valeur, `apres` à (etudiant_id, cours_id, valeur) après l'opération.
+    """
+    journaliser([
+        _entree('M', pk, etudiant_id, cours_id, avant[pk], valeur)
+        for pk, (etudiant_id, cours_id, valeur) in apres.items() if pk in avant
+    ])
+
+
+def journaliser_suppressions(notes):
+    """`notes` : (identifiant, etudiant_id, cours_id, valeur) des notes supprimées"""
+    journaliser([_entree('S', pk, etudiant_id, cours_id, ancienne=valeur)
+                 for pk, etudiant_id, cours_id, valeur in notes])
+
+
+def historique_notes(etudiant, cours=None):
+    """Historique d'un étudiant, pour un cours ou tous (index etudiant, cours)"""
+    entrees = HistoriqueNote.objects.filter(etudiant=etudiant).select_related('auteur', 'cours__matiere')
+    if cours is not None:
+        entrees = entrees.filter(cours=cours)
+    return entrees
+
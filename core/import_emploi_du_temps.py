@@ -0,0 +1,188 @@
+"""
+Import de l'emploi du temps depuis un fichier CSV ou XLSX
+
+Les cours et les salles sont résolus par des dictionnaires (code de
+matière, classe) et un ensemble de noms de salles chargés une fois au début
+de l'import. Les créneaux valides du fichier sont ensuite vérifiés d'un bloc
+par le moteur de conflits (core.conflits_horaires) : un balayage trié trouve
+les chevauchements entre lignes du fichier et avec les créneaux enregistrés
+des mêmes périodes, en une requête. Les créneaux sont insérés par
+bulk_create.
+
+Comme l'import de notes, l'import est tout ou rien : il s'exécute dans une
+transaction et rien n'est écrit si une ligne est invalide ou en conflit. En
+mode simulation, rien n'est écrit. Avec `remplacer`, les créneaux
+enregistrés des cours présents dans le fichier sont remplacés (nouvel
+emploi du temps d'un semestre).
+
+Colonnes attendues (la première ligne contient les en-têtes) :
+code_matiere, classe, jour, heure_debut, heure_fin, type_cours, salle et,
+facultatives, semestre, annee_scolaire.
+"""
+from datetime import datetime, time
+from django.db import transaction
+from django.utils.dateparse import parse_time
+from .conflits_horaires import Creneau, decrire_conflit, normaliser_salle, verifier_creneaux
+from .import_notes import ERREURS_MAX, LECTEURS, ErreurLigne, _texte
+from .models import Cours, EmploiDuTemps, Salle
+
+
+COLONNES_OBLIGATOIRES = ['code_matiere', 'classe', 'jour', 'heure_debut', 'heure_fin', 'type_cours', 'salle']
+
+TAILLE_LOT = 500
+
+
+class Referentiel:
+    """Cours, salles, jours et types de cours chargés une fois pour tout l'import"""
+
+    def __init__(self, enseignant=None):
+        cours = Cours.objects.all()
+        if enseignant is not None:
+            cours = cours.filter(enseignant=enseignant)
+        self.cours = {}
+        for pk, code, classe_id, classe, enseignant_id, semestre, annee in cours.values_list(
+            'pk', 'matiere__code', 'classe_id', 'classe__nom', 'enseignant_id', 'semestre', 'annee_scolaire'
+        ):
+            self.cours.setdefault((code.upper(), classe.casefold()), []).append(
+                (semestre, annee, (pk, enseignant_id, classe_id, f'{code} {classe}'))
+            )
+        self.salles = set(Salle.objects.values_list('nom', flat=True))
+        jours = dict(EmploiDuTemps.JOURS_SEMAINE)
+        self.jours = {code.lower(): code for code in jours}
+        self.jours.update({libelle.lower(): code for code, libelle in jours.items()})
+        types = dict(EmploiDuTemps.TYPES_COURS)
+        self.types = {code.lower(): code for code in types}
+        self.types.update({libelle.lower(): code for code, libelle in types.items()})
+
+    def cours_de(self, code, classe, semestre, annee_scolaire):
+        """(cours_id, enseignant_id, classe_id, libellé) du cours désigné par une ligne"""
+        if not code or not classe:
+            raise ErreurLigne('Matière et classe obligatoires')
+        candidats = [
+            (s, a, cours) for s, a, cours in self.cours.get((code.upper(), classe.casefold()), [])
+            if (not semestre or s == semestre) and (not annee_scolaire or a == annee_scolaire)
+        ]
+        if not candidats:
+            raise ErreurLigne(f'Aucun cours {code!r} pour la classe {classe!r}')
+        if len(candidats) > 1:
+            raise ErreurLigne('Plusieurs cours possibles : préciser semestre et annee_scolaire')
+        return candidats[0]
+
+
+def _heure(valeur, champ):
+    if isinstance(valeur, datetime):
+        return valeur.time()
+    if isinstance(valeur, time):
+        return valeur
+    texte = _texte(valeur).lower().replace('h', ':')
+    if texte.endswith(':'):
+        texte += '00'
+    try:
+        heure = parse_time(texte)
+    except ValueError:
+        heure = None
+    if heure is None:
+        raise ErreurLigne(f'{champ} invalide : {_texte(valeur)!r}')
+    return heure
+
+
+def construire_creneau(numero, ligne, referentiel):
+    """
+    Créneau (core.conflits_horaires.Creneau, ref = ('ligne', numéro)) et
+    type de cours d'une ligne (ErreurLigne si la ligne est invalide).
+    """
+    semestre, annee_scolaire, (cours_id, enseignant_id, classe_id, libelle) = referentiel.cours_de(
+        _texte(ligne.get('code_matiere')), _texte(ligne.get('classe')),
+        _texte(ligne.get('semestre')).upper(), _texte(ligne.get('annee_scolaire')),
+    )
+
+    jour = referentiel.jours.get(_texte(ligne.get('jour')).lower())
+    if jour is None:
+        raise ErreurLigne(f"Jour inconnu : {_texte(ligne.get('jour'))!r}")
+    type_cours = referentiel.types.get(_texte(ligne.get('type_cours')).lower())
+    if type_cours is None:
+        raise ErreurLigne(f"Type de cours inconnu : {_texte(ligne.get('type_cours'))!r}")
+
+    debut = _heure(ligne.get('heure_debut'), 'Heure de début')
+    fin = _heure(ligne.get('heure_fin'), 'Heure de fin')
+    if debut >= fin:
+        raise ErreurLigne("L'heure de fin doit suivre l'heure de début")
+
+    salle = _texte(ligne.get('salle'))
+    if not salle:
+        raise ErreurLigne('Salle obligatoire')
+    if normaliser_salle(salle) not in referentiel.salles:
+        raise ErreurLigne(f'Salle inconnue : {salle!r}')
+    salle = normaliser_salle(salle)
+
+    return Creneau(
+        ('ligne', numero), cours_id, enseignant_id, classe_id, salle, jour, debut, fin,
+        semestre, annee_scolaire, libelle,
+    ), type_cours
+
+
+def erreurs_conflits(conflits):
+    """
+    Erreurs (numéro de ligne, message) des conflits d'un import. Un conflit
+    entre deux lignes est signalé sur la seconde.
+    """
+    erreurs = []
+    for conflit in conflits:
+        lignes = sorted(c.ref[1] for c in (conflit.premier, conflit.second) if isinstance(c.ref, tuple))
+        numero = lignes[-1]
+        message = decrire_conflit(conflit, point_de_vue=('ligne', numero))
+        if len(lignes) == 2:
+            message += f' (ligne {lignes[0]})'
+        erreurs.append((numero, message))
+    return erreurs
+
+
+def importer_emploi_du_temps(fichier, format_fichier='csv', simulation=False, remplacer=False, enseignant=None,
+                             taille_lot=TAILLE_LOT):
+    """
+    Importe les créneaux d'un fichier binaire ouvert.
+
+    `enseignant` restreint l'import à ses cours. Retourne un rapport : lignes
+    lues, créneaux importés et remplacés, nombre d'erreurs et erreurs
+    détaillées (numéro de ligne, message) dans l'ordre du fichier.
+    """
+    lignes = LECTEURS[format_fichier](fichier, COLONNES_OBLIGATOIRES)
+    referentiel = Referentiel(enseignant)
+    rapport = {
+        'lignes': 0, 'importes': 0, 'remplaces': 0, 'nombre_erreurs': 0, 'erreurs': [],
+        'simulation': simulation,
+    }
+
+    erreurs, creneaux, types = [], [], {}
+    for numero, ligne in lignes:
+        rapport['lignes'] += 1
+        try:
+            creneau, types[numero] = construire_creneau(numero, ligne, referentiel)
+        except ErreurLigne as e:
+            erreurs.append((numero, str(e)))
+        else:
+            creneaux.append(creneau)
+
+    with transaction.atomic():
+        remplaces = EmploiDuTemps.objects.none()
+        if remplacer:
+            remplaces = EmploiDuTemps.objects.filter(cours__in={creneau.cours_id for creneau in creneaux})
+        erreurs += erreurs_conflits(verifier_creneaux(creneaux, remplaces=remplaces.values_list('pk', flat=True)))
+
+        rapport['nombre_erreurs'] = len(erreurs)
+        rapport['erreurs'] = sorted(erreurs)[:ERREURS_MAX]
+        if erreurs:
+            return rapport
+
+        rapport['importes'] = len(creneaux)
+        rapport['remplaces'] = remplaces.count()
+        if not simulation:
+            remplaces.delete()
+            EmploiDuTemps.objects.bulk_create([
+                EmploiDuTemps(
+                    cours_id=creneau.cours_id, jour=creneau.jour, heure_debut=creneau.debut,
+                    heure_fin=creneau.fin, type_cours=types[creneau.ref[1]], salle_id=creneau.salle,
+                )
+                for creneau in creneaux
+            ], batch_size=taille_lot)
+    return rapport
@@ -0,0 +1,263 @@
+"""
+Import de notes depuis un fichier CSV ou XLSX
+
+Le fichier est lu ligne par ligne. Étudiants, matières et cours sont résolus
+par des dictionnaires chargés une fois au début de l'import, sans requête par
+ligne, et les notes valides sont insérées par lots (bulk_create de
+NoteQuerySet, qui tient à jour agrégats, activité, historique et relevés) :
+la mémoire utilisée est bornée par la taille d'un lot et non par celle du
+fichier.
+
+L'import est tout ou rien : il s'exécute dans une transaction annulée si une
+ligne est invalide. En mode simulation, rien n'est écrit.
+
+Colonnes attendues (la première ligne contient les en-têtes) :
+numero_etudiant, code_matiere, type_evaluation, note, date_evaluation et,
+facultatives, coefficient, commentaire, semestre, annee_scolaire.
+"""
+import csv
+import io
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+from django.db import transaction
+from .models import Etudiant, Matiere, Cours, Note
+
+
+TAILLE_LOT = 2000
+
+# Nombre maximal d'erreurs détaillées conservées dans le rapport
+ERREURS_MAX = 500
+
+COLONNES_OBLIGATOIRES = ['numero_etudiant', 'code_matiere', 'type_evaluation', 'note', 'date_evaluation']
+
+FORMATS_DATE = ['%Y-%m-%d', '%d/%m/%Y']
+
+NOTE_MIN = Decimal('0')
+NOTE_MAX = Decimal('20')
+PRECISION = Decimal('0.01')
+
+
+class ErreurImport(Exception):
+    """Fichier illisible ou en-têtes manquants"""
+
+
+class ErreurLigne(Exception):
+    """Ligne invalide"""
+
+
+def _normaliser(entete):
+    return str(entete or '').strip().lower().replace(' ', '_')
+
+
+def _verifier_entetes(entetes, colonnes):
+    manquantes = [c for c in colonnes if c not in entetes]
+    if manquantes:
+        raise ErreurImport(f"Colonne(s) manquante(s) : {', '.join(manquantes)}")
+
+
+def lire_csv(fichier, colonnes=COLONNES_OBLIGATOIRES):
+    """Lignes d'un fichier CSV (séparateur ; , ou tabulation), en (numéro, dictionnaire)"""
+    texte = io.TextIOWrapper(fichier, encoding='utf-8-sig', newline='')
+    debut = texte.read(4096)
+    texte.seek(0)
+    try:
+        dialecte = csv.Sniffer().sniff(debut, delimiters=';,\t')
+    except csv.Error:
+        dialecte = csv.excel
+    lecteur = csv.reader(texte, dialecte)
+    entetes = [_normaliser(e) for e in next(lecteur, [])]
+    _verifier_entetes(entetes, colonnes)
+    for numero, valeurs in enumerate(lecteur, start=2):
+        if any(v.strip() for v in valeurs):
+            yield numero, dict(zip(entetes, valeurs))
+
+
+def lire_xlsx(fichier, colonnes=COLONNES_OBLIGATOIRES):
+    """Lignes de la première feuille d'un classeur XLSX, en (numéro, dictionnaire)"""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ErreurImport("L'import XLSX nécessite le paquet openpyxl")
+    try:
+        classeur = load_workbook(fichier, read_only=True, data_only=True)
+    except Exception as e:
+        raise ErreurImport(f'Classeur illisible : {e}')
+    try:
+        lignes = classeur.worksheets[0].iter_rows(values_only=True)
+        entetes = [_normaliser(e) for e in next(lignes, ())]
+        _verifier_entetes(entetes, colonnes)
+        for numero, valeurs in enumerate(lignes, start=2):
+            if any(v not in (None, '') for v in valeurs):
+                yield numero, dict(zip(entetes, valeurs))
+    finally:
+        classeur.close()
+
+
+LECTEURS = {
+    'csv': lire_csv,
+    'xlsx': lire_xlsx,
+}
+
+
+def format_fichier(nom):
+    """Format déduit de l'extension du fichier"""
+    extension = nom.rsplit('.', 1)[-1].lower()
+    if extension not in LECTEURS:
+        raise ErreurImport('Format non pris en charge (CSV ou XLSX attendu)')
+    return extension
+
+
+class Referentiel:
+    """Étudiants, matières et cours chargés une fois pour tout l'import"""
+
+    def __init__(self, enseignant=None):
+        self.etudiants = {
+            numero: (pk, classe_id)
+            for pk, numero, classe_id in Etudiant.objects.values_list('pk', 'numero_etudiant', 'classe_id')
+        }
+        self.matieres = dict(Matiere.objects.values_list('code', 'pk'))
+        cours = Cours.objects.all()
+        if enseignant is not None:
+            cours = cours.filter(enseignant=enseignant)
+        self.cours = {}
+        for pk, matiere_id, classe_id, semestre, annee in cours.values_list(
+            'pk', 'matiere_id', 'classe_id', 'semestre', 'annee_scolaire'
+        ):
+            self.cours.setdefault((matiere_id, classe_id), []).append((semestre, annee, pk))
+        types = dict(Note.TYPES_EVALUATION)
+        self.types = {code.lower(): code for code in types}
+        self.types.update({libelle.lower(): code for code, libelle in types.items()})
+
+    def cours_id(self, matiere_id, classe_id, semestre, annee_scolaire):
+        candidats = [
+            pk for s, a, pk in self.cours.get((matiere_id, classe_id), [])
+            if (not semestre or s == semestre) and (not annee_scolaire or a == annee_scolaire)
+        ]
+        if not candidats:
+            raise ErreurLigne("Aucun cours de cette matière pour la classe de l'étudiant")
+        if len(candidats) > 1:
+            raise ErreurLigne('Plusieurs cours possibles : préciser semestre et annee_scolaire')
+        return candidats[0]
+
+
+def _texte(valeur):
+    return '' if valeur is None else str(valeur).strip()
+
+
+def _decimal(valeur, champ):
+    if isinstance(valeur, (int, float, Decimal)):
+        valeur = str(valeur)
+    try:
+        nombre = Decimal(_texte(valeur).replace(',', '.'))
+    except InvalidOperation:
+        raise ErreurLigne(f'{champ} invalide : {_texte(valeur)!r}')
+    if not nombre.is_finite():
+        raise ErreurLigne(f'{champ} invalide : {_texte(valeur)!r}')
+    return nombre
+
+
+@lru_cache(maxsize=4096)
+def _date_texte(texte):
+    # Les fichiers répètent les mêmes dates : chaque texte n'est analysé qu'une fois
+    for format_date in FORMATS_DATE:
+        try:
+            return datetime.strptime(texte, format_date).date()
+        except ValueError:
+            pass
+    raise ErreurLigne(f'Date invalide : {texte!r}')
+
+
+def _date(valeur):
+    if isinstance(valeur, datetime):
+        return valeur.date()
+    if isinstance(valeur, date):
+        return valeur
+    return _date_texte(_texte(valeur))
+
+
+def construire_ligne(ligne, referentiel):
+    """Note (non enregistrée) correspondant à une ligne (ErreurLigne si la ligne est invalide)"""
+    numero = _texte(ligne.get('numero_etudiant'))
+    if numero not in referentiel.etudiants:
+        raise ErreurLigne(f'Étudiant inconnu : {numero!r}')
+    etudiant_id, classe_id = referentiel.etudiants[numero]
+
+    code = _texte(ligne.get('code_matiere'))
+    if code not in referentiel.matieres:
+        raise ErreurLigne(f'Matière inconnue : {code!r}')
+    cours_id = referentiel.cours_id(
+        referentiel.matieres[code], classe_id,
+        _texte(ligne.get('semestre')).upper(), _texte(ligne.get('annee_scolaire')),
+    )
+
+    type_evaluation = referentiel.types.get(_texte(ligne.get('type_evaluation')).lower())
+    if type_evaluation is None:
+        raise ErreurLigne(f"Type d'évaluation inconnu : {_texte(ligne.get('type_evaluation'))!r}")
+
+    note = _decimal(ligne.get('note'), 'Note')
+    if not NOTE_MIN <= note <= NOTE_MAX:
+        raise ErreurLigne('La note doit être comprise entre 0 et 20')
+    if note != note.quantize(PRECISION):
+        raise ErreurLigne('Note : deux décimales au maximum')
+
+    coefficient = Decimal('1')
+    if _texte(ligne.get('coefficient')):
+        coefficient = _decimal(ligne.get('coefficient'), 'Coefficient')
+        if not Decimal('0') < coefficient < Decimal('100') or coefficient != coefficient.quantize(Decimal('0.1')):
+            raise ErreurLigne('Coefficient invalide')
+
+    return Note(
+        etudiant_id=etudiant_id, cours_id=cours_id, type_evaluation=type_evaluation,
+        note=note.quantize(PRECISION), coefficient=coefficient,
+        date_evaluation=_date(ligne.get('date_evaluation')), commentaire=_texte(ligne.get('commentaire')),
+    )
+
+
+def inserer_lot(lot):
+    """Insère un lot de notes (instances non enregistrées, voir construire_ligne)"""
+    Note.objects.bulk_create(lot, batch_size=TAILLE_LOT)
+
+
+def importer_notes(fichier, format_fichier='csv', simulation=False, enseignant=None,
+                   progression=None, taille_lot=TAILLE_LOT):
+    """
+    Importe les notes d'un fichier binaire ouvert.
+
+    `enseignant` restreint l'import à ses cours ; `progression` est appelé avec
+    le nombre de lignes lues après chaque lot. Retourne un rapport : lignes
+    lues, notes importées, nombre d'erreurs et erreurs détaillées (numéro de
+    ligne, message).
+    """
+    lignes = LECTEURS[format_fichier](fichier)
+    referentiel = Referentiel(enseignant)
+    rapport = {'lignes': 0, 'importees': 0, 'nombre_erreurs': 0, 'erreurs': [], 'simulation': simulation}
+
+    with transaction.atomic():
+        lot = []
+
+        def ecrire_lot():
+            if not simulation and not rapport['nombre_erreurs']:
+                inserer_lot(lot)
+            rapport['importees'] += len(lot)
+            lot.clear()
+            if progression:
+                progression(rapport['lignes'])
+
+        for numero, ligne in lignes:
+            rapport['lignes'] += 1
+            try:
+                lot.append(construire_ligne(ligne, referentiel))
+            except ErreurLigne as e:
+                rapport['nombre_erreurs'] += 1
+                if len(rapport['erreurs']) < ERREURS_MAX:
+                    rapport['erreurs'].append((numero, str(e)))
+            if len(lot) >= taille_lot:
+                ecrire_lot()
+        ecrire_lot()
+
+        if rapport['nombre_erreurs']:
+            # Tout ou rien : les lots déjà insérés sont annulés
+            transaction.set_rollback(True)
+            rapport['importees'] = 0
+    return rapport
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from core.utils import reconstruire_activite_connexions
+
+
+class Command(BaseCommand):
+    help = "Reconstruire l'activité de connexion par jour à partir de l'historique des connexions"
+
+    def handle(self, *args, **options):
+        self.stdout.write("Reconstruction de l'activité de connexion...")
+        
+        jours = reconstruire_activite_connexions()
+        self.stdout.write(
+            self.style.SUCCESS(f'{jours} jour(s) d\'activité reconstruit(s).')
+        )
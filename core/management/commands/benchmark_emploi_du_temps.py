@@ -0,0 +1,74 @@
+import math
+import random
+from django.core.management.base import BaseCommand
+from core.conflits_horaires import detecter_conflits
+from core.planification import BUDGET, Seance, creneaux_planning, grille, nombre_seances, planifier
+
+
+VOLUMES = {'CM': 1.5, 'TD': 1.5}
+
+# Classes par département : un enseignant n'enseigne que dans son département
+CLASSES_PAR_DEPARTEMENT = 10
+
+
+class Command(BaseCommand):
+    help = "Mesurer le générateur d'emploi du temps sur des départements fictifs"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--classes',
+            default='50,100,200',
+            help='Nombres de classes des établissements générés, séparés par des virgules (par défaut: 50,100,200)'
+        )
+        parser.add_argument('--matieres', type=int, default=10, help='Cours par classe (par défaut: 10)')
+        parser.add_argument(
+            '--cours-par-enseignant',
+            type=int,
+            default=5,
+            help='Cours confiés à chaque enseignant (par défaut: 5)'
+        )
+        parser.add_argument(
+            '--marge-salles',
+            type=float,
+            default=0.05,
+            help='Salles en plus du minimum nécessaire, en proportion (par défaut: 0.05)'
+        )
+        parser.add_argument('--budget', type=float, default=BUDGET, help='Temps de recherche maximal en secondes')
+        parser.add_argument('--graine', type=int, default=42, help='Graine du générateur aléatoire')
+
+    def handle(self, *args, **options):
+        plages = grille()
+        self.stdout.write(f"{'Classes':>8} {'Séances':>8} {'Salles':>7} {'Placées':>8} "
+                          f"{'Nœuds':>8} {'Retours':>8} {'Essais':>7} {'Durée':>9} {'Conflits':>9}")
+        for nombre in [int(valeur) for valeur in options['classes'].split(',')]:
+            seances = self.generer(
+                nombre, options['matieres'], options['cours_par_enseignant'], random.Random(options['graine'])
+            )
+            salles = [f'S{i:03d}' for i in range(math.ceil(len(seances) / len(plages) * (1 + options['marge_salles'])))]
+            planning = planifier(seances, plages, salles, budget=options['budget'])
+            conflits = detecter_conflits(creneaux_planning(planning))
+            self.stdout.write(
+                f'{nombre:>8} {len(seances):>8} {len(salles):>7} {len(planning.affectations):>8} '
+                f'{planning.noeuds:>8} {planning.retours:>8} {planning.essais:>7} {planning.duree:>8.2f}s {len(conflits):>9}'
+            )
+
+    def generer(self, nombre_classes, matieres, cours_par_enseignant, aleatoire):
+        """Séances d'un établissement fictif : départements de 10 classes, enseignants tirés au sort"""
+        seances, enseignant = [], 0
+        for premiere in range(0, nombre_classes, CLASSES_PAR_DEPARTEMENT):
+            cours = [
+                (classe, matiere)
+                for classe in range(premiere, min(premiere + CLASSES_PAR_DEPARTEMENT, nombre_classes))
+                for matiere in range(matieres)
+            ]
+            aleatoire.shuffle(cours)
+            for rang, (classe, matiere) in enumerate(cours):
+                if rang % cours_par_enseignant == 0:
+                    enseignant += 1
+                for type_cours, heures in VOLUMES.items():
+                    seances.extend(
+                        Seance(classe * matieres + matiere, enseignant, classe, type_cours, 'S1', '2023-2024',
+                               f'M{matiere} C{classe}')
+                        for _ in range(nombre_seances(heures))
+                    )
+        return seances
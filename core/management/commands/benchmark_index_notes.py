@@ -0,0 +1,149 @@
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, models
+from core.import_notes import TAILLE_LOT, inserer_lot
+from core.models import Departement, Enseignant, Classe, Etudiant, Matiere, Cours, Note
+from core.moyennes import filtrer_notes, expression_moyenne_cours
+
+
+# Index des clés étrangères avant la migration 0009
+INDEX_AVANT = [
+    models.Index(fields=['etudiant'], name='bench_note_etudiant'),
+    models.Index(fields=['cours'], name='bench_note_cours'),
+]
+
+ANNEE = '2023-2024'
+
+
+class Command(BaseCommand):
+    help = "Comparer les plans et les temps des requêtes sur les notes avant et après les index composites"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--notes',
+            type=int,
+            default=1_000_000,
+            help='Nombre de notes générées (par défaut: 1 000 000)'
+        )
+        parser.add_argument(
+            '--repetitions',
+            type=int,
+            default=5,
+            help='Exécutions de chaque requête, le temps médian est affiché (par défaut: 5)'
+        )
+        parser.add_argument('--graine', type=int, default=42, help='Graine du générateur aléatoire')
+
+    def handle(self, *args, **options):
+        # Base de test jetable, créée par les migrations comme pour les tests
+        ancien_nom = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.stdout.write(f"Génération de {options['notes']} notes...")
+            debut = time.monotonic()
+            cibles = self.generer(options['notes'], random.Random(options['graine']))
+            self.stdout.write(f'  {time.monotonic() - debut:.1f} s')
+
+            requetes = self.requetes(**cibles)
+            with connection.schema_editor() as editeur:
+                for index in Note._meta.indexes:
+                    editeur.remove_index(Note, index)
+                for index in INDEX_AVANT:
+                    editeur.add_index(Note, index)
+            avant = self.mesurer('Avant : index simples des clés étrangères', requetes, options['repetitions'])
+
+            with connection.schema_editor() as editeur:
+                for index in INDEX_AVANT:
+                    editeur.remove_index(Note, index)
+                for index in Note._meta.indexes:
+                    editeur.add_index(Note, index)
+            apres = self.mesurer('Après : index composites', requetes, options['repetitions'])
+
+            self.stdout.write('\nRésumé (temps médian)')
+            for nom in requetes:
+                gain = avant[nom] / apres[nom] if apres[nom] else float('inf')
+                self.stdout.write(f'  {nom:<40} {avant[nom]:9.2f} ms -> {apres[nom]:9.2f} ms  (x{gain:.1f})')
+        finally:
+            connection.creation.destroy_test_db(ancien_nom, verbosity=0)
+
+    def generer(self, nombre_notes, aleatoire):
+        """Établissement fictif : 50 classes de 40 étudiants, 10 cours par classe"""
+        departement = Departement.objects.create(nom='Banc d\'essai')
+        enseignant = Enseignant.objects.create(
+            user=User.objects.create(username='bench_prof'), departement=departement, date_embauche=date(2020, 9, 1)
+        )
+        classes = Classe.objects.bulk_create([
+            Classe(nom=f'BENCH-{i}', niveau='L1', departement=departement) for i in range(50)
+        ])
+        matieres = Matiere.objects.bulk_create([
+            Matiere(nom=f'Matière {i}', code=f'BM{i}', credits=3) for i in range(10)
+        ])
+        cours = Cours.objects.bulk_create([
+            Cours(matiere=matiere, enseignant=enseignant, classe=classe, semestre='S1', annee_scolaire=ANNEE)
+            for classe in classes for matiere in matieres
+        ])
+        users = User.objects.bulk_create([User(username=f'bench_{i}') for i in range(len(classes) * 40)])
+        etudiants = Etudiant.objects.bulk_create([
+            Etudiant(user=user, numero_etudiant=f'B{i:06d}', classe=classes[i % len(classes)],
+                     date_naissance=date(2003, 1, 1))
+            for i, user in enumerate(users)
+        ])
+        cours_par_classe = {}
+        for c in cours:
+            cours_par_classe.setdefault(c.classe_id, []).append(c.pk)
+
+        # Insertion par lots, comme l'import de notes
+        types = [code for code, _ in Note.TYPES_EVALUATION]
+        dates = [date(2023, 9, 4) + timedelta(days=i) for i in range(120)]
+        valeurs = [Decimal(i) / 4 for i in range(81)]
+        for debut in range(0, nombre_notes, TAILLE_LOT):
+            lot = []
+            for _ in range(min(TAILLE_LOT, nombre_notes - debut)):
+                etudiant = aleatoire.choice(etudiants)
+                lot.append(Note(
+                    etudiant_id=etudiant.pk, cours_id=aleatoire.choice(cours_par_classe[etudiant.classe_id]),
+                    type_evaluation=aleatoire.choice(types), note=aleatoire.choice(valeurs),
+                    coefficient=Decimal('1'), date_evaluation=aleatoire.choice(dates),
+                ))
+            inserer_lot(lot)
+
+        note = Note.objects.order_by('pk').values('etudiant', 'cours', 'type_evaluation', 'date_evaluation').first()
+        return {'note': note, 'classe': classes[0]}
+
+    def requetes(self, note, classe):
+        """Chemins d'accès des vues, tels que l'ORM les produit"""
+        liste = Note.objects.select_related('etudiant', 'cours').order_by('-date_evaluation', '-pk')
+        return {
+            'notes_list': liste[:20],
+            'notes_list ?etudiant=': liste.filter(etudiant_id=note['etudiant'])[:20],
+            'notes_list ?cours=': liste.filter(cours_id=note['cours'])[:20],
+            'etudiant_detail': Note.objects.filter(etudiant_id=note['etudiant']).order_by('-date_evaluation'),
+            'tableau de bord (5 dernières notes)': Note.objects.filter(etudiant_id=note['etudiant'])
+                .select_related('cours__matiere').order_by('-date_evaluation')[:5],
+            'saisie (cours, type, date)': Note.objects.filter(
+                cours_id=note['cours'], type_evaluation=note['type_evaluation'], date_evaluation=note['date_evaluation']
+            ),
+            'moyennes étudiant x cours (classe)': filtrer_notes(
+                classe=classe, semestre='S1', annee_scolaire=ANNEE
+            ).values('etudiant', 'cours').annotate(moyenne=expression_moyenne_cours()).order_by(),
+        }
+
+    def mesurer(self, titre, requetes, repetitions):
+        with connection.cursor() as curseur:
+            curseur.execute('ANALYZE')
+        self.stdout.write(f'\n{titre}')
+        temps = {}
+        for nom, requete in requetes.items():
+            mesures = []
+            for _ in range(repetitions):
+                debut = time.perf_counter()
+                list(requete.all())
+                mesures.append((time.perf_counter() - debut) * 1000)
+            temps[nom] = statistics.median(mesures)
+            self.stdout.write(f'\n  {nom} : {temps[nom]:.2f} ms')
+            for ligne in requete.explain().splitlines():
+                self.stdout.write(f'    {ligne}')
+        return temps
@@ -2,7 +2,7 @@ from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
 from core.models import (
     Departement, Enseignant, Classe, Etudiant, 
-    Matiere, Cours, Note, EmploiDuTemps
+    Matiere, Cours, Note, EmploiDuTemps, Salle, Equipement
 )
 from datetime import date, time
 import random
@@ -205,6 +205,23 @@ class Command(BaseCommand):
             (cours_list[4], 'VENDREDI', time(9, 0), time(12, 0), 'TP', 'Lab Info 2'),
         ]
         
+        # Créer les salles et leurs équipements
+        videoprojecteur = Equipement.objects.get_or_create(nom='Vidéoprojecteur')[0]
+        ordinateurs = Equipement.objects.get_or_create(nom='Ordinateurs')[0]
+        salles_data = [
+            ('Amphi A', 200, [videoprojecteur]),
+            ('Amphi B', 150, [videoprojecteur]),
+            ('Amphi C', 150, [videoprojecteur]),
+            ('Salle 101', 40, [videoprojecteur]),
+            ('Lab Info 1', 24, [videoprojecteur, ordinateurs]),
+            ('Lab Info 2', 24, [ordinateurs]),
+        ]
+        salles = {}
+        for nom, capacite, equipements in salles_data:
+            salle = Salle.objects.get_or_create(nom=nom.upper(), defaults={'capacite': capacite})[0]
+            salle.equipements.add(*equipements)
+            salles[nom] = salle
+
         for cours, jour, debut, fin, type_cours, salle in emploi_data:
             EmploiDuTemps.objects.get_or_create(
                 cours=cours,
@@ -212,7 +229,7 @@ class Command(BaseCommand):
                 heure_debut=debut,
                 heure_fin=fin,
                 type_cours=type_cours,
-                salle=salle
+                salle=salles[salle]
             )
         
         # Créer un utilisateur admin par défaut
@@ -0,0 +1,71 @@
+import time
+from collections import Counter
+from django.core.management.base import BaseCommand, CommandError
+from core.models import Classe, DecisionSemestre
+from core.deliberations import deliberer
+from core.utils import selectionner_classes
+
+
+class Command(BaseCommand):
+    help = "Délibérer un semestre : validation des matières, compensation et crédits obtenus"
+
+    def add_arguments(self, parser):
+        parser.add_argument('semestre', choices=['S1', 'S2'], help='Semestre (S1 ou S2)')
+        parser.add_argument('annee_scolaire', help='Année scolaire, par exemple 2023-2024')
+        parser.add_argument(
+            '--classe',
+            action='append',
+            help='Nom de classe (répétable ; par défaut toutes les classes)'
+        )
+        parser.add_argument(
+            '--classe-id',
+            action='append',
+            type=int,
+            dest='classes_ids',
+            help='Identifiant de classe (répétable), pour les classes homonymes'
+        )
+        parser.add_argument('--departement', help='Restreindre aux classes d\'un département')
+        parser.add_argument(
+            '--simulation',
+            action='store_true',
+            help='Calculer les décisions sans les enregistrer'
+        )
+        parser.add_argument(
+            '--details',
+            action='store_true',
+            help='Afficher l\'explication de chaque décision'
+        )
+
+    def handle(self, *args, **options):
+        classes = Classe.objects.all()
+        try:
+            classes = selectionner_classes(classes, options['classe'], options['classes_ids'])
+        except ValueError as erreur:
+            raise CommandError(str(erreur))
+        if options['departement']:
+            classes = classes.filter(departement__nom=options['departement'])
+        classes = list(classes.values_list('pk', flat=True))
+        if not classes:
+            raise CommandError('Aucune classe trouvée.')
+        
+        debut = time.monotonic()
+        decisions = deliberer(
+            classes, options['semestre'], options['annee_scolaire'],
+            enregistrer=not options['simulation'],
+        )
+        duree = time.monotonic() - debut
+        
+        if options['details']:
+            for decision in decisions:
+                self.stdout.write(f'{decision.etudiant_id} - {decision.get_decision_display()}')
+                for ligne in decision.explication.splitlines():
+                    self.stdout.write(f'    {ligne}')
+        
+        libelles = dict(DecisionSemestre.DECISIONS)
+        for code, nombre in sorted(Counter(d.decision for d in decisions).items()):
+            self.stdout.write(f'  {libelles[code]}: {nombre}')
+        message = f'{len(decisions)} décision(s) calculée(s) en {duree:.2f} s'
+        if options['simulation']:
+            self.stdout.write(self.style.WARNING(message + ' (simulation, rien n\'est enregistré).'))
+        else:
+            self.stdout.write(self.style.SUCCESS(message + '.'))
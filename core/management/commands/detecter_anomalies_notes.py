@@ -0,0 +1,29 @@
+import time
+from django.core.management.base import BaseCommand
+from core.anomalies_notes import detecter_anomalies
+
+
+class Command(BaseCommand):
+    help = "Relever les notes suspectes (valeurs aberrantes, doublons) et prévenir les enseignants (tâche de nuit)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--simulation',
+            action='store_true',
+            help='Analyser les notes sans enregistrer les anomalies ni notifier'
+        )
+
+    def handle(self, *args, **options):
+        debut = time.monotonic()
+        rapport = detecter_anomalies(enregistrer=not options['simulation'])
+        duree = time.monotonic() - debut
+        
+        self.stdout.write(f"{rapport['notes']} note(s) analysée(s) dans {rapport['evaluations']} évaluation(s)")
+        self.stdout.write(f"  Valeurs aberrantes: {rapport['ABERRANTE']}")
+        self.stdout.write(f"  Doublons: {rapport['DOUBLON']}")
+        message = (f"{rapport['nouvelles']} nouvelle(s) anomalie(s), {rapport['resolues']} résolue(s), "
+                   f"{rapport['notifications']} enseignant(s) notifié(s) en {duree:.2f} s")
+        if options['simulation']:
+            self.stdout.write(self.style.WARNING(message + ' (simulation, rien n\'est enregistré).'))
+        else:
+            self.stdout.write(self.style.SUCCESS(message + '.'))
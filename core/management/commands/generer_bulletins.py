@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.models import Classe
+from core.bulletins import FORMATS, ErreurBulletin, generer_bulletins
+from core.utils import selectionner_classes
+
+
+class Command(BaseCommand):
+    help = 'Générer les bulletins de fin de semestre (HTML/PDF) dans MEDIA_ROOT'
+
+    def add_arguments(self, parser):
+        parser.add_argument('semestre', choices=['S1', 'S2'], help='Semestre (S1 ou S2)')
+        parser.add_argument('annee_scolaire', help='Année scolaire, par exemple 2023-2024')
+        parser.add_argument(
+            '--classe',
+            action='append',
+            help='Nom de classe (répétable ; par défaut toutes les classes)'
+        )
+        parser.add_argument(
+            '--classe-id',
+            action='append',
+            type=int,
+            dest='classes_ids',
+            help='Identifiant de classe (répétable), pour les classes homonymes'
+        )
+        parser.add_argument(
+            '--format',
+            action='append',
+            choices=FORMATS,
+            dest='formats',
+            help='Format des fichiers (répétable ; par défaut: html)'
+        )
+        parser.add_argument(
+            '--processus',
+            type=int,
+            help='Nombre de processus de rendu (par défaut: un par cœur)'
+        )
+
+    def handle(self, *args, **options):
+        classes = Classe.objects.order_by('nom')
+        try:
+            classes = selectionner_classes(classes, options['classe'], options['classes_ids'])
+        except ValueError as erreur:
+            raise CommandError(str(erreur))
+        classes = list(classes)
+        if not classes:
+            raise CommandError('Aucune classe trouvée.')
+        
+        def progression(termines, prevus):
+            self.stdout.write(f'  {termines}/{prevus} bulletin(s) générés...')
+        
+        self.stdout.write(f"Génération des bulletins {options['semestre']} {options['annee_scolaire']} "
+                          f"pour {len(classes)} classe(s)...")
+        try:
+            fichiers = generer_bulletins(
+                classes,
+                options['semestre'],
+                options['annee_scolaire'],
+                formats=tuple(options['formats'] or ['html']),
+                processus=options['processus'],
+                progression=progression,
+            )
+        except ErreurBulletin as e:
+            raise CommandError(str(e))
+        
+        self.stdout.write(self.style.SUCCESS(f'{len(fichiers)} fichier(s) écrit(s).'))
@@ -0,0 +1,140 @@
+import time
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from core.conflits_horaires import normaliser_salle
+from core.models import Classe, EmploiDuTemps, Salle
+from core.planification import BUDGET, DEBUTS, DUREE_SEANCE, JOURS, VOLUMES, generer_emploi_du_temps, grille
+
+
+class Command(BaseCommand):
+    help = "Générer l'emploi du temps hebdomadaire des cours d'un semestre, sans conflit"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--semestre', choices=['S1', 'S2'], required=True, help='Semestre des cours')
+        parser.add_argument('--annee-scolaire', required=True, help='Année scolaire, par exemple 2023-2024')
+        parser.add_argument(
+            '--classe',
+            action='append',
+            dest='classes',
+            help='Nom d\'une classe à planifier (répétable, toutes par défaut)'
+        )
+        parser.add_argument(
+            '--volume',
+            action='append',
+            dest='volumes',
+            metavar='TYPE=HEURES',
+            help='Heures hebdomadaires de chaque cours pour un type de cours, par exemple TP=3 '
+                 '(répétable, par défaut: ' + ', '.join(f'{t}={h}' for t, h in VOLUMES.items()) + ')'
+        )
+        parser.add_argument(
+            '--salle',
+            action='append',
+            dest='salles',
+            help='Salle disponible (répétable, par défaut: toutes les salles)'
+        )
+        parser.add_argument(
+            '--jours',
+            default=','.join(JOURS),
+            help=f'Jours de cours, séparés par des virgules (par défaut: {",".join(JOURS)})'
+        )
+        parser.add_argument(
+            '--debuts',
+            default=','.join(debut.strftime('%H:%M') for debut in DEBUTS),
+            help='Heures de début des plages, séparées par des virgules'
+        )
+        parser.add_argument(
+            '--duree-seance',
+            type=int,
+            default=DUREE_SEANCE,
+            help=f'Durée d\'une séance en minutes (par défaut: {DUREE_SEANCE})'
+        )
+        parser.add_argument(
+            '--budget',
+            type=float,
+            default=BUDGET,
+            help=f'Temps de recherche maximal en secondes (par défaut: {BUDGET:.0f})'
+        )
+        parser.add_argument(
+            '--enregistrer',
+            action='store_true',
+            help='Remplacer les créneaux des cours planifiés (sinon simple simulation)'
+        )
+
+    def handle(self, *args, **options):
+        volumes = self.lire_volumes(options['volumes'])
+        jours_valides = dict(EmploiDuTemps.JOURS_SEMAINE)
+        jours = [jour.strip().upper() for jour in options['jours'].split(',') if jour.strip()]
+        inconnus = [jour for jour in jours if jour not in jours_valides]
+        if inconnus:
+            raise CommandError(f'Jour(s) inconnu(s): {", ".join(inconnus)}')
+        try:
+            debuts = [datetime.strptime(debut.strip(), '%H:%M').time() for debut in options['debuts'].split(',')]
+        except ValueError:
+            raise CommandError('Heures de début invalides, format attendu HH:MM.')
+        if options['duree_seance'] <= 0:
+            raise CommandError('La durée des séances doit être positive.')
+        try:
+            plages = grille(jours, debuts, options['duree_seance'])
+        except ValueError as erreur:
+            raise CommandError(str(erreur))
+
+        salles = None
+        if options['salles']:
+            salles = sorted({normaliser_salle(salle) for salle in options['salles']})
+            manquantes = set(salles) - set(Salle.objects.filter(nom__in=salles).values_list('nom', flat=True))
+            if manquantes:
+                raise CommandError(f'Salle(s) introuvable(s): {", ".join(sorted(manquantes))}')
+
+        classes = None
+        if options['classes']:
+            classes = list(Classe.objects.filter(nom__in=options['classes']))
+            manquantes = set(options['classes']) - {classe.nom for classe in classes}
+            if manquantes:
+                raise CommandError(f'Classe(s) introuvable(s): {", ".join(sorted(manquantes))}')
+
+        debut = time.monotonic()
+        planning, enregistre = generer_emploi_du_temps(
+            options['semestre'], options['annee_scolaire'], volumes=volumes, salles=salles,
+            plages=plages, classes=classes,
+            budget=options['budget'], enregistrer=options['enregistrer'],
+        )
+        duree = time.monotonic() - debut
+
+        places = len(planning.affectations)
+        total = places + len(planning.non_placees)
+        self.stdout.write(f'{places}/{total} séance(s) placée(s) en {duree:.2f} s '
+                          f'({planning.noeuds} nœud(s), {planning.retours} retour(s) arrière, {planning.essais} essai(s))')
+        if options['verbosity'] > 1:
+            for seance, plage, salle in sorted(planning.affectations, key=lambda a: (a[0].libelle, a[1])):
+                self.stdout.write(f'  {seance.libelle} {seance.type_cours}: {jours_valides[plage.jour]} '
+                                  f"{plage.debut.strftime('%H:%M')}-{plage.fin.strftime('%H:%M')} salle {salle}")
+        if planning.non_placees:
+            for seance in planning.non_placees:
+                self.stdout.write(f'  Non placée: {seance.libelle} {seance.type_cours}')
+            raise CommandError(
+                f'{len(planning.non_placees)} séance(s) non placée(s) : augmenter le budget, '
+                'les salles ou les plages.'
+            )
+        if enregistre:
+            self.stdout.write(self.style.SUCCESS('Emploi du temps enregistré.'))
+        elif options['enregistrer']:
+            raise CommandError('L\'emploi du temps a changé pendant la génération, rien n\'a été enregistré.')
+        else:
+            self.stdout.write(self.style.WARNING('Simulation : rien n\'est enregistré (--enregistrer).'))
+
+    def lire_volumes(self, valeurs):
+        if not valeurs:
+            return VOLUMES
+        types = dict(EmploiDuTemps.TYPES_COURS)
+        volumes = {}
+        for valeur in valeurs:
+            type_cours, _, heures = valeur.partition('=')
+            type_cours = type_cours.strip().upper()
+            try:
+                heures = float(heures.replace(',', '.'))
+            except ValueError:
+                raise CommandError(f'Volume invalide: {valeur} (format TYPE=HEURES)')
+            if type_cours not in types or heures < 0:
+                raise CommandError(f'Volume invalide: {valeur} (types: {", ".join(types)})')
+            volumes[type_cours] = heures
+        return volumes
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.import_emploi_du_temps import importer_emploi_du_temps
+from core.import_notes import ErreurImport, format_fichier
+
+
+class Command(BaseCommand):
+    help = "Importer des créneaux d'emploi du temps depuis un fichier CSV ou XLSX"
+
+    def add_arguments(self, parser):
+        parser.add_argument('fichier', help='Chemin du fichier CSV ou XLSX')
+        parser.add_argument(
+            '--simulation',
+            action='store_true',
+            help='Valider le fichier sans enregistrer les créneaux'
+        )
+        parser.add_argument(
+            '--remplacer',
+            action='store_true',
+            help='Remplacer les créneaux enregistrés des cours présents dans le fichier'
+        )
+
+    def handle(self, *args, **options):
+        chemin = options['fichier']
+        
+        try:
+            with open(chemin, 'rb') as fichier:
+                rapport = importer_emploi_du_temps(
+                    fichier,
+                    format_fichier(chemin),
+                    simulation=options['simulation'],
+                    remplacer=options['remplacer'],
+                )
+        except (OSError, ErreurImport) as e:
+            raise CommandError(str(e))
+        
+        for numero, message in rapport['erreurs']:
+            self.stdout.write(f'✗ Ligne {numero}: {message}')
+        if rapport['nombre_erreurs'] > len(rapport['erreurs']):
+            self.stdout.write(f"... et {rapport['nombre_erreurs'] - len(rapport['erreurs'])} autre(s) erreur(s)")
+        
+        if rapport['nombre_erreurs']:
+            raise CommandError(
+                f"{rapport['nombre_erreurs']} erreur(s) sur {rapport['lignes']} ligne(s), aucun créneau importé."
+            )
+        remplaces = f", {rapport['remplaces']} remplacé(s)" if options['remplacer'] else ''
+        if rapport['simulation']:
+            self.stdout.write(self.style.SUCCESS(
+                f"Simulation réussie : {rapport['importes']} créneau(x) prêt(s) à être importé(s){remplaces}."
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{rapport['importes']} créneau(x) importé(s){remplaces}."))
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.import_notes import ErreurImport, format_fichier, importer_notes
+
+
+class Command(BaseCommand):
+    help = 'Importer des notes depuis un fichier CSV ou XLSX'
+
+    def add_arguments(self, parser):
+        parser.add_argument('fichier', help='Chemin du fichier CSV ou XLSX')
+        parser.add_argument(
+            '--simulation',
+            action='store_true',
+            help='Valider le fichier sans enregistrer les notes'
+        )
+        parser.add_argument(
+            '--taille-lot',
+            type=int,
+            default=2000,
+            help='Nombre de notes insérées par requête (par défaut: 2000)'
+        )
+
+    def handle(self, *args, **options):
+        chemin = options['fichier']
+        
+        def progression(lignes):
+            self.stdout.write(f'  {lignes} ligne(s) traitée(s)...')
+        
+        try:
+            with open(chemin, 'rb') as fichier:
+                rapport = importer_notes(
+                    fichier,
+                    format_fichier(chemin),
+                    simulation=options['simulation'],
+                    progression=progression,
+                    taille_lot=options['taille_lot'],
+                )
+        except (OSError, ErreurImport) as e:
+            raise CommandError(str(e))
+        
+        for numero, message in rapport['erreurs']:
+            self.stdout.write(f'✗ Ligne {numero}: {message}')
+        if rapport['nombre_erreurs'] > len(rapport['erreurs']):
+            self.stdout.write(f"... et {rapport['nombre_erreurs'] - len(rapport['erreurs'])} autre(s) erreur(s)")
+        
+        if rapport['nombre_erreurs']:
+            raise CommandError(
+                f"{rapport['nombre_erreurs']} ligne(s) invalide(s) sur {rapport['lignes']}, aucune note importée."
+            )
+        if rapport['simulation']:
+            self.stdout.write(self.style.SUCCESS(
+                f"Simulation réussie : {rapport['importees']} note(s) prête(s) à être importée(s)."
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{rapport['importees']} note(s) importée(s)."))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from core.agregats import comparer_agregats, recalculer_agregats
+
+
+class Command(BaseCommand):
+    help = 'Vérifier les agrégats de notes par rapport aux notes et les réparer'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verifier',
+            action='store_true',
+            help='Vérifier seulement, sans réparer les agrégats divergents'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Vérification des agrégats de notes...')
+        
+        divergents = comparer_agregats()
+        for cours_id, existant, attendu in divergents:
+            self.stdout.write(f'✗ Cours {cours_id}: {existant} au lieu de {attendu}')
+        
+        if not divergents:
+            self.stdout.write(self.style.SUCCESS('Les agrégats sont à jour.'))
+            return
+        
+        if options['verifier']:
+            self.stdout.write(
+                self.style.WARNING(f'{len(divergents)} agrégat(s) divergent(s).')
+            )
+            return
+        
+        recalculer_agregats([cours_id for cours_id, _, _ in divergents])
+        self.stdout.write(
+            self.style.SUCCESS(f'{len(divergents)} agrégat(s) réparé(s).')
+        )
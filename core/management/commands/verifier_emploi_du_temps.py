@@ -0,0 +1,29 @@
+import time
+from collections import Counter
+from django.core.management.base import BaseCommand, CommandError
+from core.conflits_horaires import RESSOURCES, charger_creneaux, decrire_conflit, detecter_conflits
+
+
+class Command(BaseCommand):
+    help = "Vérifier l'emploi du temps : chevauchements de salle, d'enseignant et de classe"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--semestre', choices=['S1', 'S2'], help='Restreindre à un semestre')
+        parser.add_argument('--annee-scolaire', help='Restreindre à une année scolaire, par exemple 2023-2024')
+
+    def handle(self, *args, **options):
+        debut = time.monotonic()
+        creneaux = charger_creneaux(options['semestre'], options['annee_scolaire'])
+        conflits = detecter_conflits(creneaux)
+        duree = time.monotonic() - debut
+        
+        for conflit in sorted(conflits, key=lambda c: (c.premier.annee_scolaire, c.premier.semestre, c.ressource)):
+            self.stdout.write(f'{conflit.premier.semestre} {conflit.premier.annee_scolaire} - {decrire_conflit(conflit)}')
+        
+        self.stdout.write(f'{len(creneaux)} créneau(x) vérifié(s) en {duree:.2f} s')
+        if conflits:
+            comptes = Counter(conflit.ressource for conflit in conflits)
+            for ressource, (libelle, _) in RESSOURCES.items():
+                self.stdout.write(f'  {libelle.capitalize()}: {comptes[ressource]}')
+            raise CommandError(f'{len(conflits)} conflit(s) détecté(s).')
+        self.stdout.write(self.style.SUCCESS('Aucun conflit.'))
@@ -0,0 +1,72 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def initialiser_agregats(apps, schema_editor):
+    """Construit les agrégats à partir des notes existantes"""
+    Note = apps.get_model('core', 'Note')
+    AgregatNotes = apps.get_model('core', 'AgregatNotes')
+    lignes = Note.objects.values(
+        'cours', 'cours__classe', 'cours__matiere', 'cours__semestre', 'cours__annee_scolaire'
+    ).annotate(
+        nombre_notes=models.Count('id'),
+        somme=models.Sum('note'),
+        somme_carres=models.Sum(
+            models.F('note') * models.F('note'),
+            output_field=models.DecimalField(max_digits=18, decimal_places=4)
+        ),
+        reussites=models.Count('id', filter=models.Q(note__gte=10)),
+        minimum=models.Min('note'),
+        maximum=models.Max('note'),
+    ).order_by()
+    AgregatNotes.objects.bulk_create([
+        AgregatNotes(
+            cours_id=ligne['cours'],
+            classe_id=ligne['cours__classe'],
+            matiere_id=ligne['cours__matiere'],
+            semestre=ligne['cours__semestre'],
+            annee_scolaire=ligne['cours__annee_scolaire'],
+            nombre_notes=ligne['nombre_notes'],
+            somme=ligne['somme'],
+            somme_carres=ligne['somme_carres'],
+            reussites=ligne['reussites'],
+            minimum=ligne['minimum'],
+            maximum=ligne['maximum'],
+        )
+        for ligne in lignes
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_remove_profilutilisateur_notifications_email_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AgregatNotes',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('semestre', models.CharField(max_length=2)),
+                ('annee_scolaire', models.CharField(max_length=9)),
+                ('nombre_notes', models.PositiveIntegerField(default=0)),
+                ('somme', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('somme_carres', models.DecimalField(decimal_places=4, default=0, max_digits=18)),
+                ('reussites', models.PositiveIntegerField(default=0)),
+                ('minimum', models.DecimalField(blank=True, decimal_places=2, max_digits=4, null=True)),
+                ('maximum', models.DecimalField(blank=True, decimal_places=2, max_digits=4, null=True)),
+                ('classe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.classe')),
+                ('cours', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='agregat_notes', to='core.cours')),
+                ('matiere', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.matiere')),
+            ],
+            options={
+                'verbose_name': 'Agrégat de notes',
+                'verbose_name_plural': 'Agrégats de notes',
+                'indexes': [models.Index(fields=['classe', 'semestre', 'annee_scolaire'], name='core_agrega_classe__701626_idx'), models.Index(fields=['matiere', 'semestre', 'annee_scolaire'], name='core_agrega_matiere_633916_idx')],
+            },
+        ),
+        migrations.RunPython(initialiser_agregats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_agregatnotes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActiviteConnexionJour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jour', models.DateField(unique=True)),
+                ('connexions_reussies', models.PositiveIntegerField(default=0)),
+                ('connexions_echouees', models.PositiveIntegerField(default=0)),
+                ('utilisateurs_distincts', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Activité de connexion',
+                'verbose_name_plural': 'Activité de connexion',
+                'ordering': ['-jour'],
+            },
+        ),
+    ]
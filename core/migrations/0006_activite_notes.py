@@ -0,0 +1,72 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+from datetime import datetime, time
+
+
+def initialiser_activite(apps, schema_editor):
+    """Date les notes existantes à leur évaluation et construit l'activité correspondante"""
+    Note = apps.get_model('core', 'Note')
+    ActiviteNotesJour = apps.get_model('core', 'ActiviteNotesJour')
+
+    lot = []
+    for note in Note.objects.only('id', 'date_evaluation').iterator(chunk_size=2000):
+        note.date_creation = note.date_modification = django.utils.timezone.make_aware(
+            datetime.combine(note.date_evaluation, time.min)
+        )
+        lot.append(note)
+        if len(lot) == 2000:
+            Note.objects.bulk_update(lot, ['date_creation', 'date_modification'])
+            lot = []
+    Note.objects.bulk_update(lot, ['date_creation', 'date_modification'])
+
+    lignes = Note.objects.values('date_evaluation', 'cours__classe').annotate(
+        n=models.Count('id')
+    ).order_by()
+    ActiviteNotesJour.objects.bulk_create([
+        ActiviteNotesJour(
+            jour=ligne['date_evaluation'],
+            classe_id=ligne['cours__classe'],
+            notes_saisies=ligne['n'],
+        )
+        for ligne in lignes
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_activiteconnexionjour'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='date_creation',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.CreateModel(
+            name='ActiviteNotesJour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jour', models.DateField()),
+                ('notes_saisies', models.PositiveIntegerField(default=0)),
+                ('notes_modifiees', models.PositiveIntegerField(default=0)),
+                ('classe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.classe')),
+            ],
+            options={
+                'verbose_name': 'Activité de saisie des notes',
+                'verbose_name_plural': 'Activité de saisie des notes',
+                'ordering': ['-jour'],
+                'unique_together': {('jour', 'classe')},
+            },
+        ),
+        migrations.RunPython(initialiser_activite, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:30
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_activite_notes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='matiere',
+            name='note_validation',
+            field=models.DecimalField(decimal_places=2, default=10, help_text='Moyenne à atteindre pour valider la matière', max_digits=4, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(20)]),
+        ),
+        migrations.AddField(
+            model_name='parametressysteme',
+            name='compensation_semestre',
+            field=models.BooleanField(default=True, help_text='Les matières non validées sont compensées par la moyenne du semestre'),
+        ),
+        migrations.AddField(
+            model_name='parametressysteme',
+            name='moyenne_compensation',
+            field=models.DecimalField(decimal_places=2, default=10, max_digits=4),
+        ),
+        migrations.AddField(
+            model_name='parametressysteme',
+            name='note_eliminatoire',
+            field=models.DecimalField(decimal_places=2, default=7, help_text='Une moyenne de matière inférieure empêche la compensation', max_digits=4),
+        ),
+        migrations.CreateModel(
+            name='DecisionSemestre',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('semestre', models.CharField(max_length=2)),
+                ('annee_scolaire', models.CharField(max_length=9)),
+                ('decision', models.CharField(choices=[('ADMIS', 'Admis'), ('COMPENSATION', 'Admis par compensation'), ('AJOURNE', 'Ajourné'), ('INCOMPLET', 'Incomplet')], max_length=12)),
+                ('moyenne', models.DecimalField(blank=True, decimal_places=2, max_digits=4, null=True)),
+                ('credits_obtenus', models.PositiveIntegerField(default=0)),
+                ('credits_totaux', models.PositiveIntegerField(default=0)),
+                ('explication', models.TextField(blank=True)),
+                ('date_deliberation', models.DateTimeField(default=django.utils.timezone.now)),
+                ('classe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.classe')),
+                ('etudiant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='decisions', to='core.etudiant')),
+            ],
+            options={
+                'verbose_name': 'Décision de semestre',
+                'verbose_name_plural': 'Décisions de semestre',
+                'ordering': ['-annee_scolaire', '-semestre'],
+                'indexes': [models.Index(fields=['classe', 'semestre', 'annee_scolaire'], name='core_decisi_classe__6715a4_idx')],
+                'unique_together': {('etudiant', 'semestre', 'annee_scolaire')},
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:36
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0007_deliberations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistoriqueNote',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('identifiant_note', models.PositiveIntegerField()),
+                ('action', models.CharField(choices=[('C', 'Création'), ('M', 'Modification'), ('S', 'Suppression')], max_length=1)),
+                ('ancienne_valeur', models.DecimalField(blank=True, decimal_places=2, max_digits=4, null=True)),
+                ('nouvelle_valeur', models.DecimalField(blank=True, decimal_places=2, max_digits=4, null=True)),
+                ('date', models.DateTimeField(default=django.utils.timezone.now)),
+                ('auteur', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('cours', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, to='core.cours')),
+                ('etudiant', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, to='core.etudiant')),
+            ],
+            options={
+                'verbose_name': 'Historique de note',
+                'verbose_name_plural': 'Historique des notes',
+                'ordering': ['-date', '-id'],
+                'indexes': [models.Index(fields=['etudiant', 'cours'], name='core_histor_etudian_bf1dbb_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_historique_notes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='note',
+            name='cours',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='core.cours'),
+        ),
+        migrations.AlterField(
+            model_name='note',
+            name='etudiant',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='core.etudiant'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['etudiant', 'date_evaluation'], name='core_note_etudian_530162_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['cours', 'type_evaluation', 'date_evaluation'], name='core_note_cours_i_fb957a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['date_evaluation'], name='core_note_date_ev_332c02_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['etudiant', 'cours', 'note', 'coefficient'], name='core_note_etudian_80ad2e_idx'),
+        ),
+    ]
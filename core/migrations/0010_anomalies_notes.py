@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_index_notes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnomalieNote',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type_anomalie', models.CharField(choices=[('ABERRANTE', 'Valeur aberrante'), ('DOUBLON', 'Doublon')], max_length=10)),
+                ('score', models.DecimalField(blank=True, decimal_places=2, help_text='Score z robuste (médiane / écart absolu médian)', max_digits=7, null=True)),
+                ('detail', models.CharField(max_length=255)),
+                ('statut', models.CharField(choices=[('A_VERIFIER', 'À vérifier'), ('CORRIGEE', 'Erreur confirmée'), ('IGNOREE', 'Note correcte')], default='A_VERIFIER', max_length=10)),
+                ('date_detection', models.DateTimeField(default=django.utils.timezone.now)),
+                ('cours', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.cours')),
+                ('note', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='anomalies', to='core.note')),
+            ],
+            options={
+                'verbose_name': 'Anomalie de note',
+                'verbose_name_plural': 'Anomalies de notes',
+                'ordering': ['-date_detection', '-id'],
+                'indexes': [models.Index(fields=['cours', 'statut'], name='core_anomal_cours_i_4302a5_idx')],
+                'unique_together': {('note', 'type_anomalie')},
+            },
+        ),
+    ]
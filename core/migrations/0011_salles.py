@@ -0,0 +1,60 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Nom donné aux créneaux enregistrés sans salle
+SALLE_INCONNUE = 'A ATTRIBUER'
+
+
+def creer_salles(apps, schema_editor):
+    """Une salle par nom de l'emploi du temps ; les noms sont normalisés (espaces, majuscules)"""
+    EmploiDuTemps = apps.get_model('core', 'EmploiDuTemps')
+    Salle = apps.get_model('core', 'Salle')
+    noms = {
+        ancien: (ancien or '').strip().upper() or SALLE_INCONNUE
+        for ancien in EmploiDuTemps.objects.values_list('salle', flat=True).distinct()
+    }
+    Salle.objects.bulk_create([Salle(nom=nom) for nom in sorted(set(noms.values()))])
+    for ancien, nom in noms.items():
+        if ancien != nom:
+            EmploiDuTemps.objects.filter(salle=ancien).update(salle=nom)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_anomalies_notes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Equipement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nom', models.CharField(max_length=50, unique=True)),
+            ],
+            options={
+                'ordering': ['nom'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Salle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nom', models.CharField(help_text='Enregistré en majuscules, par exemple B12', max_length=20, unique=True)),
+                ('capacite', models.PositiveIntegerField(default=0, help_text='Nombre de places (0 : non renseigné)')),
+                ('equipements', models.ManyToManyField(blank=True, related_name='salles', to='core.equipement')),
+            ],
+            options={
+                'ordering': ['nom'],
+            },
+        ),
+        migrations.RunPython(creer_salles, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='emploidutemps',
+            name='salle',
+            field=models.ForeignKey(db_column='salle', on_delete=django.db.models.deletion.PROTECT, related_name='creneaux', to='core.salle', to_field='nom'),
+        ),
+    ]
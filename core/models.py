@@ -1,10 +1,35 @@
-from django.db import models
+from collections import Counter
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 from django.urls import reverse
 
 
+class CompteursQuerySet(models.QuerySet):
+    """QuerySet qui invalide les compteurs en cache lors des opérations en masse"""
+
+    def _invalider_compteurs(self):
+        from .compteurs import invalider_compteurs
+        invalider_compteurs(self.model)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        self._invalider_compteurs()
+        return objs
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        resultat = super().bulk_update(objs, fields, *args, **kwargs)
+        self._invalider_compteurs()
+        return resultat
+
+    def update(self, **kwargs):
+        resultat = super().update(**kwargs)
+        self._invalider_compteurs()
+        return resultat
+
+
 class Departement(models.Model):
     nom = models.CharField(max_length=100)
     description = models.TextField(blank=True)
@@ -21,6 +46,8 @@ class Enseignant(models.Model):
     date_embauche = models.DateField()
     avatar = models.ImageField(upload_to='avatars/enseignants/', blank=True, null=True)
     
+    objects = CompteursQuerySet.as_manager()
+    
     def __str__(self):
         return f"{self.user.first_name} {self.user.last_name}"
     
@@ -42,6 +69,8 @@ class Classe(models.Model):
     niveau = models.CharField(max_length=2, choices=NIVEAUX)
     departement = models.ForeignKey(Departement, on_delete=models.CASCADE)
     
+    objects = CompteursQuerySet.as_manager()
+    
     def __str__(self):
         return f"{self.nom} - {self.get_niveau_display()}"
 
@@ -55,6 +84,8 @@ class Etudiant(models.Model):
     adresse = models.TextField(blank=True)
     avatar = models.ImageField(upload_to='avatars/etudiants/', blank=True, null=True)
     
+    objects = CompteursQuerySet.as_manager()
+    
     def __str__(self):
         return f"{self.user.first_name} {self.user.last_name} ({self.numero_etudiant})"
     
@@ -67,12 +98,37 @@ class Matiere(models.Model):
     nom = models.CharField(max_length=100)
     code = models.CharField(max_length=10, unique=True)
     credits = models.IntegerField(validators=[MinValueValidator(1), MaxValueValidator(10)])
+    note_validation = models.DecimalField(
+        max_digits=4, decimal_places=2, default=10,
+        validators=[MinValueValidator(0), MaxValueValidator(20)],
+        help_text="Moyenne à atteindre pour valider la matière"
+    )
     description = models.TextField(blank=True)
     
+    objects = CompteursQuerySet.as_manager()
+    
     def __str__(self):
         return f"{self.code} - {self.nom}"
 
 
+class CoursQuerySet(CompteursQuerySet):
+    """QuerySet des cours qui répercute les changements de clés sur les agrégats de notes"""
+
+    # Champs recopiés dans AgregatNotes
+    CHAMPS_AGREGATS = {'classe', 'classe_id', 'matiere', 'matiere_id', 'semestre', 'annee_scolaire'}
+
+    def update(self, **kwargs):
+        # bulk_update passe aussi par update()
+        if not self.CHAMPS_AGREGATS & set(kwargs):
+            return super().update(**kwargs)
+        from .agregats import recalculer_agregats
+        with transaction.atomic(using=self.db):
+            cours_ids = list(self.values_list('pk', flat=True).order_by())
+            resultat = super().update(**kwargs)
+            recalculer_agregats(cours_ids)
+        return resultat
+
+
 class Cours(models.Model):
     matiere = models.ForeignKey(Matiere, on_delete=models.CASCADE)
     enseignant = models.ForeignKey(Enseignant, on_delete=models.CASCADE)
@@ -80,6 +136,8 @@ class Cours(models.Model):
     semestre = models.CharField(max_length=2, choices=[('S1', 'Semestre 1'), ('S2', 'Semestre 2')])
     annee_scolaire = models.CharField(max_length=9, help_text="Format: 2023-2024")
     
+    objects = CoursQuerySet.as_manager()
+    
     class Meta:
         unique_together = ['matiere', 'classe', 'semestre', 'annee_scolaire']
     
@@ -87,6 +145,101 @@ class Cours(models.Model):
         return f"{self.matiere.nom} - {self.classe.nom} ({self.annee_scolaire})"
 
 
+# Identifiants lus ou modifiés par requête (sous la limite de paramètres de SQLite)
+TAILLE_PAQUET = 900
+
+
+class NoteQuerySet(CompteursQuerySet):
+    """QuerySet des notes qui maintient les agrégats lors des opérations en masse"""
+
+    def _etats(self, pks):
+        """(etudiant_id, cours_id, note) des notes données, par paquets d'identifiants"""
+        pks, etats = list(pks), {}
+        for debut in range(0, len(pks), TAILLE_PAQUET):
+            etats.update(
+                (pk, (etudiant_id, cours_id, note))
+                for pk, etudiant_id, cours_id, note in self.model.objects.filter(
+                    pk__in=pks[debut:debut + TAILLE_PAQUET]
+                ).values_list('pk', 'etudiant_id', 'cours_id', 'note')
+            )
+        return etats
+
+    def bulk_create(self, objs, *args, **kwargs):
+        from .agregats import appliquer_variations
+        from .activite_notes import enregistrer_activite
+        from .historique_notes import journaliser_creations
+        from .releves import invalider_releves
+        objs = super().bulk_create(objs, *args, **kwargs)
+        invalider_releves({n.etudiant_id for n in objs})
+        appliquer_variations(ajouts=[(n.cours_id, n.note) for n in objs])
+        enregistrer_activite(saisies=Counter(n.cours_id for n in objs))
+        journaliser_creations((n.pk, n.etudiant_id, n.cours_id, n.note) for n in objs)
+        return objs
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        from .agregats import recalculer_agregats
+        from .activite_notes import enregistrer_activite
+        from .historique_notes import journaliser_modifications
+        from .releves import invalider_releves
+        objs = list(objs)
+        avant = self._etats(n.pk for n in objs)
+        cours_ids = {cours_id for _, cours_id, _ in avant.values()}
+        maintenant = timezone.now()
+        for note in objs:
+            note.date_modification = maintenant
+        fields = list(fields)
+        if 'date_modification' not in fields:
+            fields.append('date_modification')
+        # Le bulk_update de Django passe par update() : un QuerySet simple évite
+        # de compter et de journaliser deux fois les mêmes modifications
+        resultat = models.QuerySet(self.model, using=self.db).bulk_update(objs, fields, *args, **kwargs)
+        self._invalider_compteurs()
+        invalider_releves({etudiant_id for etudiant_id, _, _ in avant.values()} | {n.etudiant_id for n in objs})
+        recalculer_agregats(cours_ids | {n.cours_id for n in objs})
+        enregistrer_activite(modifications=Counter(n.cours_id for n in objs))
+        journaliser_modifications(
+            {pk: note for pk, (_, _, note) in avant.items()},
+            {n.pk: (n.etudiant_id, n.cours_id, n.note) for n in objs},
+        )
+        return resultat
+
+    def update(self, **kwargs):
+        from .agregats import recalculer_agregats
+        from .activite_notes import enregistrer_activite
+        from .historique_notes import journaliser_modifications
+        from .releves import invalider_releves
+        kwargs.setdefault('date_modification', timezone.now())
+        resultat, dernier, etudiants, comptes = 0, 0, set(), Counter()
+        # Par paquets d'identifiants croissants : la mémoire ne dépend pas du
+        # nombre de notes modifiées
+        with transaction.atomic(using=self.db):
+            while True:
+                avant = {
+                    pk: (etudiant_id, cours_id, note)
+                    for pk, etudiant_id, cours_id, note in self.filter(pk__gt=dernier).order_by('pk').values_list(
+                        'pk', 'etudiant_id', 'cours_id', 'note'
+                    )[:TAILLE_PAQUET]
+                }
+                if not avant:
+                    break
+                dernier = max(avant)
+                resultat += models.QuerySet(self.model, using=self.db).filter(pk__in=avant).update(**kwargs)
+                # Les nouvelles valeurs peuvent être des expressions : elles sont relues
+                apres = self._etats(avant)
+                journaliser_modifications({pk: note for pk, (_, _, note) in avant.items()}, apres)
+                etudiants.update(etudiant_id for etudiant_id, _, _ in [*avant.values(), *apres.values()])
+                comptes.update(cours_id for _, cours_id, _ in avant.values())
+        self._invalider_compteurs()
+        invalider_releves(etudiants)
+        cours_ids = set(comptes)
+        cible = kwargs.get('cours', kwargs.get('cours_id'))
+        if cible is not None:
+            cours_ids.add(getattr(cible, 'pk', cible))
+        recalculer_agregats(cours_ids)
+        enregistrer_activite(modifications=comptes)
+        return resultat
+
+
 class Note(models.Model):
     TYPES_EVALUATION = [
         ('DS', 'Devoir Surveillé'),
@@ -96,19 +249,226 @@ class Note(models.Model):
         ('EXAMEN', 'Examen Final'),
     ]
     
-    etudiant = models.ForeignKey(Etudiant, on_delete=models.CASCADE)
-    cours = models.ForeignKey(Cours, on_delete=models.CASCADE)
+    # Les index composites ci-dessous commencent par ces colonnes : les index
+    # simples des clés étrangères feraient double emploi
+    etudiant = models.ForeignKey(Etudiant, on_delete=models.CASCADE, db_index=False)
+    cours = models.ForeignKey(Cours, on_delete=models.CASCADE, db_index=False)
     type_evaluation = models.CharField(max_length=10, choices=TYPES_EVALUATION)
     note = models.DecimalField(max_digits=4, decimal_places=2, 
                               validators=[MinValueValidator(0), MaxValueValidator(20)])
     coefficient = models.DecimalField(max_digits=3, decimal_places=1, default=1.0)
     date_evaluation = models.DateField()
     commentaire = models.TextField(blank=True)
+    date_creation = models.DateTimeField(default=timezone.now)
+    date_modification = models.DateTimeField(auto_now=True)
+    
+    objects = NoteQuerySet.as_manager()
+    
+    class Meta:
+        indexes = [
+            # Notes d'un étudiant par date (fiche étudiant, tableau de bord, liste filtrée)
+            models.Index(fields=['etudiant', 'date_evaluation']),
+            # Évaluation d'un cours (saisie) et notes d'un cours par date
+            models.Index(fields=['cours', 'type_evaluation', 'date_evaluation']),
+            # Liste des notes la plus récente d'abord
+            models.Index(fields=['date_evaluation']),
+            # Moyennes par (étudiant, cours) lues dans l'index, sans accès à la table
+            models.Index(fields=['etudiant', 'cours', 'note', 'coefficient']),
+        ]
     
     def __str__(self):
         return f"{self.etudiant.nom_complet} - {self.cours.matiere.nom} - {self.note}/20"
 
 
+class HistoriqueNoteQuerySet(models.QuerySet):
+    """Refuse les modifications et suppressions en masse du journal"""
+
+    def update(self, **kwargs):
+        raise ValueError("L'historique des notes est en ajout seul")
+
+    def delete(self):
+        raise ValueError("L'historique des notes est en ajout seul")
+
+
+class HistoriqueNote(models.Model):
+    """Journal en ajout seul des changements de notes (alimenté par core.historique_notes)"""
+    ACTIONS = [
+        ('C', 'Création'),
+        ('M', 'Modification'),
+        ('S', 'Suppression'),
+    ]
+    
+    # Sans contrainte ni cascade : les entrées survivent à la suppression de la
+    # note, de l'étudiant, du cours ou de l'auteur (et sont écrites après elle)
+    identifiant_note = models.PositiveIntegerField()
+    etudiant = models.ForeignKey(Etudiant, on_delete=models.DO_NOTHING, db_constraint=False)
+    cours = models.ForeignKey(Cours, on_delete=models.DO_NOTHING, db_constraint=False)
+    action = models.CharField(max_length=1, choices=ACTIONS)
+    ancienne_valeur = models.DecimalField(max_digits=4, decimal_places=2, null=True, blank=True)
+    nouvelle_valeur = models.DecimalField(max_digits=4, decimal_places=2, null=True, blank=True)
+    auteur = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True,
+                               related_name='+')
+    date = models.DateTimeField(default=timezone.now)
+    
+    objects = HistoriqueNoteQuerySet.as_manager()
+    
+    class Meta:
+        ordering = ['-date', '-id']
+        verbose_name = "Historique de note"
+        verbose_name_plural = "Historique des notes"
+        indexes = [
+            models.Index(fields=['etudiant', 'cours']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_action_display()} de la note {self.identifiant_note} ({self.date:%d/%m/%Y %H:%M})"
+    
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError("L'historique des notes est en ajout seul")
+        super().save(*args, **kwargs)
+    
+    def delete(self, *args, **kwargs):
+        raise ValueError("L'historique des notes est en ajout seul")
+
+
+class AnomalieNote(models.Model):
+    """Note suspecte relevée par la détection d'anomalies (core.anomalies_notes), à vérifier"""
+    TYPES_ANOMALIE = [
+        ('ABERRANTE', 'Valeur aberrante'),
+        ('DOUBLON', 'Doublon'),
+    ]
+    STATUTS = [
+        ('A_VERIFIER', 'À vérifier'),
+        ('CORRIGEE', 'Erreur confirmée'),
+        ('IGNOREE', 'Note correcte'),
+    ]
+    
+    note = models.ForeignKey(Note, on_delete=models.CASCADE, related_name='anomalies')
+    # Cours de la note au moment de la détection, pour filtrer par enseignant
+    cours = models.ForeignKey(Cours, on_delete=models.CASCADE)
+    type_anomalie = models.CharField(max_length=10, choices=TYPES_ANOMALIE)
+    score = models.DecimalField(max_digits=7, decimal_places=2, null=True, blank=True,
+                                help_text="Score z robuste (médiane / écart absolu médian)")
+    detail = models.CharField(max_length=255)
+    statut = models.CharField(max_length=10, choices=STATUTS, default='A_VERIFIER')
+    date_detection = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        unique_together = ['note', 'type_anomalie']
+        ordering = ['-date_detection', '-id']
+        verbose_name = "Anomalie de note"
+        verbose_name_plural = "Anomalies de notes"
+        indexes = [
+            models.Index(fields=['cours', 'statut']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_type_anomalie_display()} - note {self.note_id} ({self.get_statut_display()})"
+
+
+class AgregatNotes(models.Model):
+    """Agrégats des notes d'un cours, maintenus par variations à chaque écriture"""
+    cours = models.OneToOneField(Cours, on_delete=models.CASCADE, related_name='agregat_notes')
+    # Clés dénormalisées du cours pour les regroupements
+    classe = models.ForeignKey(Classe, on_delete=models.CASCADE)
+    matiere = models.ForeignKey(Matiere, on_delete=models.CASCADE)
+    semestre = models.CharField(max_length=2)
+    annee_scolaire = models.CharField(max_length=9)
+    
+    nombre_notes = models.PositiveIntegerField(default=0)
+    somme = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    somme_carres = models.DecimalField(max_digits=18, decimal_places=4, default=0)
+    reussites = models.PositiveIntegerField(default=0)
+    minimum = models.DecimalField(max_digits=4, decimal_places=2, null=True, blank=True)
+    maximum = models.DecimalField(max_digits=4, decimal_places=2, null=True, blank=True)
+    
+    class Meta:
+        verbose_name = "Agrégat de notes"
+        verbose_name_plural = "Agrégats de notes"
+        indexes = [
+            models.Index(fields=['classe', 'semestre', 'annee_scolaire']),
+            models.Index(fields=['matiere', 'semestre', 'annee_scolaire']),
+        ]
+    
+    def __str__(self):
+        return f"Agrégat {self.cours} ({self.nombre_notes} notes)"
+
+
+class DecisionSemestre(models.Model):
+    """Décision de jury d'un étudiant pour un semestre (calculée par core.deliberations)"""
+    DECISIONS = [
+        ('ADMIS', 'Admis'),
+        ('COMPENSATION', 'Admis par compensation'),
+        ('AJOURNE', 'Ajourné'),
+        ('INCOMPLET', 'Incomplet'),
+    ]
+    
+    etudiant = models.ForeignKey(Etudiant, on_delete=models.CASCADE, related_name='decisions')
+    classe = models.ForeignKey(Classe, on_delete=models.CASCADE)
+    semestre = models.CharField(max_length=2)
+    annee_scolaire = models.CharField(max_length=9)
+    decision = models.CharField(max_length=12, choices=DECISIONS)
+    moyenne = models.DecimalField(max_digits=4, decimal_places=2, null=True, blank=True)
+    credits_obtenus = models.PositiveIntegerField(default=0)
+    credits_totaux = models.PositiveIntegerField(default=0)
+    explication = models.TextField(blank=True)
+    date_deliberation = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        unique_together = ['etudiant', 'semestre', 'annee_scolaire']
+        ordering = ['-annee_scolaire', '-semestre']
+        verbose_name = "Décision de semestre"
+        verbose_name_plural = "Décisions de semestre"
+        indexes = [
+            models.Index(fields=['classe', 'semestre', 'annee_scolaire']),
+        ]
+    
+    def __str__(self):
+        return f"{self.etudiant.nom_complet} - {self.semestre} {self.annee_scolaire} - {self.get_decision_display()}"
+
+
+class Equipement(models.Model):
+    """Équipement d'une salle (vidéoprojecteur, postes informatiques...)"""
+    nom = models.CharField(max_length=50, unique=True)
+    
+    objects = CompteursQuerySet.as_manager()
+    
+    class Meta:
+        ordering = ['nom']
+    
+    def __str__(self):
+        return self.nom
+
+
+class Salle(models.Model):
+    """Salle de cours, désignée par son nom dans l'emploi du temps"""
+    nom = models.CharField(max_length=20, unique=True, help_text="Enregistré en majuscules, par exemple B12")
+    capacite = models.PositiveIntegerField(default=0, help_text="Nombre de places (0 : non renseigné)")
+    equipements = models.ManyToManyField(Equipement, blank=True, related_name='salles')
+    
+    objects = CompteursQuerySet.as_manager()
+    
+    class Meta:
+        ordering = ['nom']
+    
+    def clean(self):
+        # Même forme que core.conflits_horaires.normaliser_salle, avant la
+        # validation d'unicité : « b12 » est refusé si « B12 » existe
+        self.nom = self.nom.strip().upper()
+        ancien = Salle.objects.filter(pk=self.pk).values_list('nom', flat=True).first() if self.pk else None
+        if ancien not in (None, self.nom) and EmploiDuTemps.objects.filter(salle_id=ancien).exists():
+            raise ValidationError({'nom': "Une salle utilisée dans l'emploi du temps ne peut pas être renommée."})
+    
+    def save(self, *args, **kwargs):
+        # Pour les enregistrements sans validation (commandes, migrations)
+        self.nom = self.nom.strip().upper()
+        super().save(*args, **kwargs)
+    
+    def __str__(self):
+        return self.nom
+
+
 class EmploiDuTemps(models.Model):
     JOURS_SEMAINE = [
         ('LUNDI', 'Lundi'),
@@ -130,7 +490,11 @@ class EmploiDuTemps(models.Model):
     heure_debut = models.TimeField()
     heure_fin = models.TimeField()
     type_cours = models.CharField(max_length=2, choices=TYPES_COURS)
-    salle = models.CharField(max_length=20)
+    # La colonne contient le nom de la salle : salle_id est ce nom, sans requête
+    salle = models.ForeignKey(Salle, on_delete=models.PROTECT, to_field='nom', db_column='salle',
+                              related_name='creneaux')
+    
+    objects = CompteursQuerySet.as_manager()
     
     class Meta:
         unique_together = ['cours', 'jour', 'heure_debut']
@@ -166,6 +530,8 @@ class Message(models.Model):
     pour_tous_enseignants = models.BooleanField(default=False)
     pour_tous_etudiants = models.BooleanField(default=False)
     
+    objects = CompteursQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-date_envoi']
     
@@ -195,6 +561,8 @@ class Notification(models.Model):
     lue = models.BooleanField(default=False)
     url_action = models.URLField(blank=True, null=True)  # URL vers laquelle rediriger
     
+    objects = CompteursQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-date_creation']
     
@@ -223,6 +591,8 @@ class ProfilUtilisateur(models.Model):
     theme = models.CharField(max_length=20, default='light')
     langue = models.CharField(max_length=10, default='fr')
     
+    objects = CompteursQuerySet.as_manager()
+    
     def get_avatar_url(self):
         if self.avatar:
             return self.avatar.url
@@ -240,6 +610,8 @@ class HistoriqueConnexion(models.Model):
     user_agent = models.TextField(blank=True)
     succes = models.BooleanField(default=True)
     
+    objects = CompteursQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-date_connexion']
     
@@ -247,6 +619,43 @@ class HistoriqueConnexion(models.Model):
         return f"{self.utilisateur.username} - {self.date_connexion}"
 
 
+class ActiviteNotesJour(models.Model):
+    """Notes saisies et modifiées par jour et par classe (alimentée à chaque écriture)"""
+    jour = models.DateField()
+    classe = models.ForeignKey(Classe, on_delete=models.CASCADE)
+    notes_saisies = models.PositiveIntegerField(default=0)
+    notes_modifiees = models.PositiveIntegerField(default=0)
+    
+    objects = CompteursQuerySet.as_manager()
+    
+    class Meta:
+        unique_together = ['jour', 'classe']
+        ordering = ['-jour']
+        verbose_name = "Activité de saisie des notes"
+        verbose_name_plural = "Activité de saisie des notes"
+    
+    def __str__(self):
+        return f"{self.jour} - {self.classe.nom} - {self.notes_saisies} notes saisies"
+
+
+class ActiviteConnexionJour(models.Model):
+    """Activité de connexion agrégée par jour (alimentée à chaque connexion)"""
+    jour = models.DateField(unique=True)
+    connexions_reussies = models.PositiveIntegerField(default=0)
+    connexions_echouees = models.PositiveIntegerField(default=0)
+    utilisateurs_distincts = models.PositiveIntegerField(default=0)
+    
+    objects = CompteursQuerySet.as_manager()
+    
+    class Meta:
+        ordering = ['-jour']
+        verbose_name = "Activité de connexion"
+        verbose_name_plural = "Activité de connexion"
+    
+    def __str__(self):
+        return f"{self.jour} - {self.connexions_reussies} connexions"
+
+
 class ParametresSysteme(models.Model):
     """Paramètres globaux du système"""
     nom_etablissement = models.CharField(max_length=200, default="EduManager")
@@ -259,6 +668,16 @@ class ParametresSysteme(models.Model):
     duree_session = models.PositiveIntegerField(default=30)  # en minutes
     tentatives_connexion_max = models.PositiveIntegerField(default=5)
     
+    # Règles de délibération
+    compensation_semestre = models.BooleanField(
+        default=True, help_text="Les matières non validées sont compensées par la moyenne du semestre"
+    )
+    moyenne_compensation = models.DecimalField(max_digits=4, decimal_places=2, default=10)
+    note_eliminatoire = models.DecimalField(
+        max_digits=4, decimal_places=2, default=7,
+        help_text="Une moyenne de matière inférieure empêche la compensation"
+    )
+    
     # Paramètres de notification
     smtp_server = models.CharField(max_length=100, blank=True)
     smtp_port = models.PositiveIntegerField(default=587)
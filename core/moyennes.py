@@ -0,0 +1,148 @@
+"""
+Moyennes pondérées des notes
+
+- moyenne d'un cours : moyenne des notes pondérée par Note.coefficient ;
+- moyenne générale : moyenne des cours pondérée par Matiere.credits.
+
+Les deux niveaux sont calculés dans la base par des requêtes groupées. Pour la
+moyenne générale, chaque note contribue avec le poids
+credits * coefficient / (somme des coefficients de l'étudiant dans le cours),
+ce qui donne la moyenne des cours pondérée par les crédits en une seule
+agrégation, sans boucle Python sur les notes.
+"""
+from decimal import Decimal
+from django.db.models import F, Sum, Subquery, OuterRef, FloatField
+from django.db.models.functions import Cast, NullIf
+from .models import Note
+
+
+# Regroupements acceptés : nom court -> champ de Note
+REGROUPEMENTS = {
+    'etudiant': 'etudiant',
+    'cours': 'cours',
+    'matiere': 'cours__matiere',
+    'classe': 'cours__classe',
+    'semestre': 'cours__semestre',
+    'annee_scolaire': 'cours__annee_scolaire',
+}
+
+
+def _reel(expression):
+    """Force un calcul en virgule flottante (SQLite stocke 15.0 comme entier)"""
+    return Cast(expression, FloatField())
+
+
+def _arrondir(valeur):
+    return None if valeur is None else Decimal(str(round(valeur, 2)))
+
+
+def filtrer_notes(etudiant=None, cours=None, matiere=None, classe=None,
+                  semestre=None, annee_scolaire=None):
+    """Notes restreintes aux critères donnés"""
+    filtres = {
+        'etudiant': etudiant,
+        'cours': cours,
+        'cours__matiere': matiere,
+        'etudiant__classe': classe,
+        'cours__semestre': semestre,
+        'cours__annee_scolaire': annee_scolaire,
+    }
+    return Note.objects.filter(**{champ: v for champ, v in filtres.items() if v is not None})
+
+
+def _champs(par):
+    return [REGROUPEMENTS[nom] for nom in par]
+
+
+def _cle(ligne, champs):
+    valeurs = tuple(ligne[champ] for champ in champs)
+    return valeurs[0] if len(valeurs) == 1 else valeurs
+
+
+def expression_moyenne_cours():
+    """Agrégat SQL de la moyenne des notes pondérée par les coefficients"""
+    return Sum(_reel(F('note') * F('coefficient'))) / NullIf(Sum(_reel(F('coefficient'))), 0.0)
+
+
+def _poids_credits():
+    """Poids d'une note dans la moyenne générale : crédits * coefficient / coefficients du cours"""
+    coefficients_cours = Note.objects.filter(
+        etudiant=OuterRef('etudiant'), cours=OuterRef('cours')
+    ).values('etudiant', 'cours').annotate(
+        total=Sum(_reel(F('coefficient')))
+    ).values('total')
+    return _reel(F('cours__matiere__credits') * F('coefficient')) / NullIf(
+        Subquery(coefficients_cours, output_field=FloatField()), 0.0
+    )
+
+
+def expression_moyenne_generale():
+    """Agrégat SQL de la moyenne générale (à grouper au moins par étudiant)"""
+    poids = _poids_credits()
+    return Sum(poids * _reel(F('note'))) / NullIf(Sum(poids), 0.0)
+
+
+def moyennes_ponderees(par=('etudiant', 'cours'), **filtres):
+    """
+    Moyennes pondérées par les coefficients, groupées par `par`.
+
+    Retourne un dictionnaire clé -> moyenne (la clé est un tuple si plusieurs
+    regroupements sont demandés). Une seule requête.
+    """
+    champs = _champs(par)
+    lignes = filtrer_notes(**filtres).values(*champs).annotate(
+        moyenne=expression_moyenne_cours()
+    ).order_by()
+    return {_cle(ligne, champs): _arrondir(ligne['moyenne']) for ligne in lignes}
+
+
+def moyennes_generales(par=('etudiant',), **filtres):
+    """
+    Moyennes générales (moyennes de cours pondérées par les crédits), groupées par `par`.
+
+    `par` doit contenir 'etudiant' ; une seule requête pour tous les étudiants.
+    """
+    champs = _champs(par)
+    lignes = filtrer_notes(**filtres).values(*champs).annotate(
+        moyenne=expression_moyenne_generale(),
+        credits=Sum(_poids_credits()),
+    ).order_by()
+    return {
+        _cle(ligne, champs): {
+            'moyenne': _arrondir(ligne['moyenne']),
+            'credits': round(ligne['credits'] or 0),
+        }
+        for ligne in lignes
+    }
+
+
+def moyenne_etudiant(etudiant, semestre=None, annee_scolaire=None):
+    """Moyenne générale d'un étudiant (None s'il n'a aucune note)"""
+    resultat = moyennes_generales(
+        etudiant=etudiant, semestre=semestre, annee_scolaire=annee_scolaire
+    ).get(etudiant.pk)
+    return resultat['moyenne'] if resultat else None
+
+
+def moyennes_classe(classe, semestre=None, annee_scolaire=None):
+    """Moyennes générales de tous les étudiants d'une classe (une requête)"""
+    return {
+        etudiant_id: resultat['moyenne']
+        for etudiant_id, resultat in moyennes_generales(
+            classe=classe, semestre=semestre, annee_scolaire=annee_scolaire
+        ).items()
+    }
+
+
+def releve_moyennes(etudiant):
+    """Moyennes d'un étudiant par cours et par semestre, avec sa moyenne générale"""
+    return {
+        'par_cours': moyennes_ponderees(par=('cours',), etudiant=etudiant),
+        'par_semestre': {
+            (annee, semestre): resultat
+            for (_, annee, semestre), resultat in moyennes_generales(
+                par=('etudiant', 'annee_scolaire', 'semestre'), etudiant=etudiant
+            ).items()
+        },
+        'generale': moyenne_etudiant(etudiant),
+    }
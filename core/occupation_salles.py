@@ -0,0 +1,118 @@
+"""
+Occupation des salles et recherche de salles libres
+
+La journée est découpée en cases de 15 minutes : l'occupation d'une salle
+un jour donné est un entier dont le bit i est à 1 si un créneau de la salle
+couvre la case i. L'index contient ce masque pour chaque salle, chaque jour
+et chaque période (semestre, année scolaire), ainsi que les capacités et les
+équipements (un bit par équipement).
+
+Une salle est libre sur une plage horaire si son masque ET celui de la plage
+est nul ; elle convient si son masque d'équipements contient ceux demandés.
+Les salles sont rangées par capacité croissante : celles qui ont assez de
+places se trouvent par dichotomie. La recherche ne fait que des opérations
+sur des entiers, sans requête.
+
+L'index est construit en deux requêtes, partagé par le cache et gardé en
+mémoire dans chaque processus sous la version des modèles de l'emploi du
+temps (core.compteurs) : toute modification d'un créneau, d'un cours, d'une
+salle ou d'un équipement le fait reconstruire à la recherche suivante.
+"""
+from bisect import bisect_left
+from collections import namedtuple
+from .compteurs import lire_versions, valeur_en_cache
+from .models import Cours, EmploiDuTemps, Equipement, Salle
+
+
+# Durée d'une case, en minutes
+PAS = 15
+
+# Modèles dont dépend l'index
+DEPENDANCES = (EmploiDuTemps, Cours, Salle, Equipement)
+
+IndexOccupation = namedtuple('IndexOccupation', [
+    # Salles par capacité croissante, puis par nom
+    'salles', 'capacites', 'equipements', 'noms_equipements',
+    # Nom d'équipement en minuscules -> bit
+    'bits_equipements',
+    # (semestre, année scolaire) -> jour -> masque de chaque salle (dans l'ordre de `salles`)
+    'occupation',
+])
+
+# Index de la version courante, dans ce processus
+_memoire = {}
+
+
+def _minutes(heure):
+    return heure.hour * 60 + heure.minute + (heure.second > 0 or heure.microsecond > 0)
+
+
+def masque_horaire(debut, fin):
+    """Cases de 15 minutes couvertes par une plage horaire (arrondie vers l'extérieur)"""
+    premiere = _minutes(debut) // PAS
+    derniere = -(-_minutes(fin) // PAS)
+    if derniere <= premiere:
+        return 0
+    return ((1 << (derniere - premiere)) - 1) << premiere
+
+
+def construire_index():
+    """Index d'occupation de toutes les salles, en deux requêtes"""
+    salles = list(Salle.objects.order_by('capacite', 'nom').values_list('nom', 'capacite'))
+    rangs = {nom: i for i, (nom, _) in enumerate(salles)}
+
+    bits = {}
+    equipements = [0] * len(salles)
+    noms_equipements = [[] for _ in salles]
+    for salle, equipement in Salle.equipements.through.objects.values_list(
+        'salle__nom', 'equipement__nom'
+    ).order_by('equipement__nom'):
+        bit = bits.setdefault(equipement.lower(), 1 << len(bits))
+        equipements[rangs[salle]] |= bit
+        noms_equipements[rangs[salle]].append(equipement)
+
+    occupation = {}
+    for salle, jour, debut, fin, semestre, annee_scolaire in EmploiDuTemps.objects.values_list(
+        'salle', 'jour', 'heure_debut', 'heure_fin', 'cours__semestre', 'cours__annee_scolaire'
+    ).order_by():
+        jours = occupation.setdefault((semestre, annee_scolaire), {})
+        masques = jours.setdefault(jour, [0] * len(salles))
+        masques[rangs[salle]] |= masque_horaire(debut, fin)
+
+    return IndexOccupation(
+        tuple(nom for nom, _ in salles), tuple(capacite for _, capacite in salles), tuple(equipements),
+        tuple(tuple(noms) for noms in noms_equipements), bits, occupation,
+    )
+
+
+def index_occupation():
+    """Index à jour : une lecture des versions dans le cache, reconstruit seulement s'il a changé"""
+    versions = lire_versions(DEPENDANCES)
+    cle = ':'.join(str(versions[modele]) for modele in DEPENDANCES)
+    index = _memoire.get(cle)
+    if index is None:
+        index = valeur_en_cache('occupation_salles', DEPENDANCES, construire_index)
+        _memoire.clear()
+        _memoire[cle] = index
+    return index
+
+
+def salles_libres(index, jour, debut, fin, semestre, annee_scolaire, capacite=0, equipements=()):
+    """
+    Rangs (dans index.salles) des salles libres sur la plage, d'au moins
+    `capacite` places et disposant de tous les équipements demandés, de la
+    plus petite à la plus grande.
+    """
+    requis = 0
+    for equipement in equipements:
+        bit = index.bits_equipements.get(equipement.strip().lower())
+        if bit is None:
+            # Aucune salle ne dispose d'un équipement inconnu
+            return []
+        requis |= bit
+    plage = masque_horaire(debut, fin)
+    masques = index.occupation.get((semestre, annee_scolaire), {}).get(jour)
+    return [
+        i for i in range(bisect_left(index.capacites, capacite), len(index.salles))
+        if index.equipements[i] & requis == requis and not (masques and masques[i] & plage)
+    ]
@@ -0,0 +1,366 @@
+"""
+Génération de l'emploi du temps
+
+Chaque cours d'un semestre donne des séances hebdomadaires (volume horaire
+par type de cours, découpé en séances de la durée d'une plage de la grille)
+à placer dans une plage et une salle, sans que deux séances d'une même
+classe, d'un même enseignant ou d'une même salle se chevauchent. Les
+créneaux déjà enregistrés des autres cours de la période restent en place et
+occupent leurs ressources.
+
+Les salles étant traitées comme interchangeables, une plage n'est qu'une
+ressource comptée (nombre de salles libres) : la salle de chaque séance est
+choisie une fois toutes les séances placées, la plus petite assez grande
+pour la classe quand il y en a une. La recherche est un retour arrière avec :
+
+- domaines en masques de bits (une plage par bit) ;
+- choix de la séance au plus petit domaine, puis la plus contrainte ;
+- plages essayées en évitant un deuxième passage du cours dans la journée,
+  puis en étalant la semaine de la classe, puis la moins contraignante ;
+- vérification en avant : une séance placée retire sa plage des domaines
+  des séances de sa classe et de son enseignant, et de tous les domaines
+  quand la plage n'a plus de salle libre ;
+- pour la classe et l'enseignant de la séance placée, les séances restantes
+  doivent encore disposer d'au moins autant de plages distinctes.
+
+Un essai qui dépasse son nombre de retours arrière est abandonné et la
+recherche reprend du début, égalités départagées au hasard, avec une limite
+plus large : un mauvais choix fait tôt n'est pas payé par l'exploration de
+tout le sous-arbre. La recherche s'arrête au bout du temps alloué : le
+meilleur placement partiel, complété sans anticipation quand une plage reste
+libre, est alors retourné avec les séances non placées.
+"""
+import math
+import random
+import time
+from collections import defaultdict, namedtuple
+from datetime import date, datetime, time as heure, timedelta
+from django.db import transaction
+from .conflits_horaires import Creneau, creneaux, normaliser_salle, verifier_creneaux
+from .effectifs import effectifs_classes
+from .models import Cours, EmploiDuTemps, Salle
+
+
+# Volume hebdomadaire par défaut de chaque cours, en heures par type de cours
+VOLUMES = {'CM': 1.5, 'TD': 1.5}
+
+JOURS = ['LUNDI', 'MARDI', 'MERCREDI', 'JEUDI', 'VENDREDI']
+DEBUTS = [heure(8, 0), heure(9, 30), heure(11, 0), heure(14, 0), heure(15, 30), heure(17, 0)]
+DUREE_SEANCE = 90
+
+# Temps de recherche alloué par défaut, en secondes
+BUDGET = 60.0
+
+# Retours arrière permis au premier essai, multipliés à chaque nouvel essai
+RETOURS_PREMIER_ESSAI = 100
+CROISSANCE_RETOURS = 1.5
+
+Seance = namedtuple('Seance', [
+    'cours_id', 'enseignant_id', 'classe_id', 'type_cours', 'semestre', 'annee_scolaire', 'libelle',
+])
+
+Plage = namedtuple('Plage', ['jour', 'debut', 'fin'])
+
+Planning = namedtuple('Planning', ['affectations', 'non_placees', 'noeuds', 'retours', 'essais', 'duree'])
+
+
+def _bits(masque):
+    """Nombre de bits à 1 (int.bit_count n'existe qu'à partir de Python 3.10)"""
+    return bin(masque).count('1')
+
+
+def verifier_plages(plages):
+    """
+    Lève ValueError si deux plages d'un même jour se chevauchent : la
+    recherche les traite comme des ressources indépendantes.
+    """
+    par_jour = defaultdict(list)
+    for plage in plages:
+        if plage.fin <= plage.debut:
+            raise ValueError(f"La plage {plage.debut:%H:%M} du {plage.jour} dépasse minuit.")
+        par_jour[plage.jour].append(plage)
+    for jour, plages_jour in par_jour.items():
+        plages_jour.sort()
+        for precedente, plage in zip(plages_jour, plages_jour[1:]):
+            if plage.debut < precedente.fin:
+                raise ValueError(
+                    f"Les plages {precedente.debut:%H:%M}-{precedente.fin:%H:%M} et "
+                    f"{plage.debut:%H:%M}-{plage.fin:%H:%M} du {jour} se chevauchent."
+                )
+
+
+def grille(jours=JOURS, debuts=DEBUTS, duree=DUREE_SEANCE):
+    """Plages de la semaine, jour par jour (ValueError si elles se chevauchent)"""
+    plages = [
+        Plage(jour, debut, (datetime.combine(date.min, debut) + timedelta(minutes=duree)).time())
+        for jour in jours for debut in debuts
+    ]
+    verifier_plages(plages)
+    return plages
+
+
+def duree_plage(plage):
+    """Durée d'une plage, en minutes"""
+    return (datetime.combine(date.min, plage.fin) - datetime.combine(date.min, plage.debut)).seconds // 60
+
+
+def nombre_seances(heures, duree=DUREE_SEANCE):
+    return math.ceil(heures * 60 / duree - 1e-9) if heures > 0 else 0
+
+
+def seances_cours(cours, volumes=VOLUMES, duree=DUREE_SEANCE):
+    """Séances hebdomadaires des cours donnés (instances avec matière et classe)"""
+    return [
+        Seance(c.pk, c.enseignant_id, c.classe_id, type_cours, c.semestre, c.annee_scolaire,
+               f'{c.matiere.code} {c.classe.nom}')
+        for c in cours
+        for type_cours, heures in volumes.items()
+        for _ in range(nombre_seances(heures, duree))
+    ]
+
+
+def planifier(seances, plages, salles, occupations=(), budget=BUDGET, graine=0, capacites=None, effectifs=None):
+    """
+    Place les séances dans les plages et les salles données.
+
+    `occupations` : créneaux (core.conflits_horaires.Creneau) conservés, dont
+    les classes, enseignants et salles ne sont pas disponibles. `capacites`
+    (salle -> places, 0 si non renseigné) et `effectifs` (classe -> nombre
+    d'étudiants) orientent le choix des salles. Retourne un Planning dont les
+    affectations sont des (séance, plage, salle). Les plages ne doivent pas
+    se chevaucher (ValueError).
+    """
+    verifier_plages(plages)
+    debut_calcul = time.monotonic()
+    limite = debut_calcul + budget
+    n = len(seances)
+    salles = sorted({normaliser_salle(salle) for salle in salles} - {''})
+    jour_de = [plage.jour for plage in plages]
+
+    libres = [set(salles) for _ in plages]
+    bloquees = defaultdict(int)
+    for occupation in occupations:
+        masque = 0
+        for t, plage in enumerate(plages):
+            if plage.jour == occupation.jour and occupation.debut < plage.fin and plage.debut < occupation.fin:
+                masque |= 1 << t
+                libres[t].discard(normaliser_salle(occupation.salle))
+        bloquees['classe', occupation.classe_id] |= masque
+        bloquees['enseignant', occupation.enseignant_id] |= masque
+    capacite_initiale = [len(salles_libres) for salles_libres in libres]
+    ouvertes = sum(1 << t for t, nombre in enumerate(capacite_initiale) if nombre)
+    initiaux = [
+        ouvertes & ~bloquees['classe', s.classe_id] & ~bloquees['enseignant', s.enseignant_id] for s in seances
+    ]
+
+    groupes = defaultdict(list)
+    for i, s in enumerate(seances):
+        groupes['classe', s.classe_id].append(i)
+        groupes['enseignant', s.enseignant_id].append(i)
+    voisins = [
+        sorted(set(groupes['classe', s.classe_id] + groupes['enseignant', s.enseignant_id]) - {i})
+        for i, s in enumerate(seances)
+    ]
+
+    domaines, capacite = list(initiaux), list(capacite_initiale)
+    affectation = [None] * n
+    restantes = set(range(n))
+    charge_cours = defaultdict(int)
+    charge_classe = defaultdict(int)
+    # Bits retirés des domaines, pour les rendre au retour arrière
+    trace = []
+
+    def retirer(v, bit):
+        if domaines[v] & bit:
+            domaines[v] &= ~bit
+            trace.append((v, bit))
+            return domaines[v] != 0
+        return True
+
+    def affecter(i, t):
+        s, bit = seances[i], 1 << t
+        affectation[i] = t
+        restantes.discard(i)
+        capacite[t] -= 1
+        charge_cours[s.cours_id, jour_de[t]] += 1
+        charge_classe[s.classe_id, jour_de[t]] += 1
+        if not all(retirer(v, bit) for v in voisins[i] if v in restantes):
+            return False
+        if not capacite[t] and not all(retirer(v, bit) for v in list(restantes)):
+            return False
+        for cle in (('classe', s.classe_id), ('enseignant', s.enseignant_id)):
+            membres, union = 0, 0
+            for v in groupes[cle]:
+                if v in restantes:
+                    membres += 1
+                    union |= domaines[v]
+            if _bits(union) < membres:
+                return False
+        return True
+
+    def defaire(i, repere):
+        s, t = seances[i], affectation[i]
+        while len(trace) > repere:
+            v, bit = trace.pop()
+            domaines[v] |= bit
+        affectation[i] = None
+        restantes.add(i)
+        capacite[t] += 1
+        charge_cours[s.cours_id, jour_de[t]] -= 1
+        charge_classe[s.classe_id, jour_de[t]] -= 1
+
+    def ordonner(i):
+        s, domaine = seances[i], domaines[i]
+        candidates = [t for t in range(len(plages)) if domaine >> t & 1]
+        return sorted(candidates, key=lambda t: (
+            charge_cours[s.cours_id, jour_de[t]],
+            charge_classe[s.classe_id, jour_de[t]],
+            -capacite[t],
+            sum(1 for v in voisins[i] if v in restantes and domaines[v] >> t & 1),
+            rang_plages[t],
+        ))
+
+    def reinitialiser():
+        domaines[:] = initiaux
+        affectation[:] = [None] * n
+        restantes.update(range(n))
+        capacite[:] = capacite_initiale
+        charge_cours.clear()
+        charge_classe.clear()
+        trace.clear()
+
+    aleatoire = random.Random(graine)
+    rang_seances, rang_plages = list(range(n)), list(range(len(plages)))
+    meilleure, placees, noeuds, retours, essais = [None] * n, 0, 0, 0, 0
+    limite_retours, epuise = RETOURS_PREMIER_ESSAI, False
+    while not epuise and placees < n and time.monotonic() < limite:
+        reinitialiser()
+        essais += 1
+        retours_essai = 0
+        # Pile de [séance, plages à essayer, position, repère de la trace ou None]
+        pile = []
+        while restantes:
+            i = min(restantes, key=lambda v: (_bits(domaines[v]), -len(voisins[v]), rang_seances[v]))
+            pile.append([i, ordonner(i), 0, None])
+            while pile and retours_essai < limite_retours and time.monotonic() < limite:
+                cadre = pile[-1]
+                if cadre[3] is not None:
+                    defaire(cadre[0], cadre[3])
+                    cadre[3] = None
+                if cadre[2] == len(cadre[1]):
+                    pile.pop()
+                    retours_essai += 1
+                    continue
+                t = cadre[1][cadre[2]]
+                cadre[2] += 1
+                cadre[3] = len(trace)
+                noeuds += 1
+                if affecter(cadre[0], t):
+                    break
+            else:
+                # Pile vide : toutes les possibilités ont été essayées, il n'y a pas de solution complète
+                epuise = not pile
+                break
+            if n - len(restantes) > placees:
+                meilleure, placees = list(affectation), n - len(restantes)
+        retours += retours_essai
+        # Essai suivant : plus de retours arrière permis, égalités départagées au hasard
+        limite_retours = int(limite_retours * CROISSANCE_RETOURS)
+        aleatoire.shuffle(rang_seances)
+        aleatoire.shuffle(rang_plages)
+
+    if placees < n:
+        # Placement partiel : les séances restantes prennent, sans anticipation, une plage encore libre
+        occupees = defaultdict(int)
+        capacite[:] = capacite_initiale
+        for i, t in enumerate(meilleure):
+            if t is not None:
+                occupees['classe', seances[i].classe_id] |= 1 << t
+                occupees['enseignant', seances[i].enseignant_id] |= 1 << t
+                capacite[t] -= 1
+        for i in sorted((i for i, t in enumerate(meilleure) if t is None), key=lambda i: _bits(initiaux[i])):
+            s = seances[i]
+            possibles = initiaux[i] & ~occupees['classe', s.classe_id] & ~occupees['enseignant', s.enseignant_id]
+            t = max((t for t in range(len(plages)) if possibles >> t & 1 and capacite[t]),
+                    key=lambda t: capacite[t], default=None)
+            if t is not None:
+                meilleure[i] = t
+                occupees['classe', s.classe_id] |= 1 << t
+                occupees['enseignant', s.enseignant_id] |= 1 << t
+                capacite[t] -= 1
+
+    # Salles : dans chaque plage, la plus grande classe d'abord prend la plus
+    # petite salle libre assez grande, à défaut une salle de capacité non
+    # renseignée, puis la plus grande restante (la recherche ne compte que
+    # les salles : la capacité est une préférence, pas une contrainte)
+    capacites, effectifs = capacites or {}, effectifs or {}
+    affectations, non_placees = [], []
+    par_plage = defaultdict(list)
+    for i, t in enumerate(meilleure):
+        if t is None:
+            non_placees.append(seances[i])
+        else:
+            par_plage[t].append(i)
+    for t, indices in sorted(par_plage.items()):
+        disponibles = sorted(libres[t], key=lambda salle: (capacites.get(salle, 0), salle))
+        for i in sorted(indices, key=lambda i: (-effectifs.get(seances[i].classe_id, 0), seances[i].classe_id, i)):
+            effectif = max(effectifs.get(seances[i].classe_id, 0), 1)
+            salle = next((salle for salle in disponibles if capacites.get(salle, 0) >= effectif), None) or next(
+                (salle for salle in disponibles if not capacites.get(salle)), disponibles[-1]
+            )
+            disponibles.remove(salle)
+            affectations.append((seances[i], plages[t], salle))
+    return Planning(affectations, non_placees, noeuds, retours, essais, time.monotonic() - debut_calcul)
+
+
+def creneaux_planning(planning):
+    """Créneaux (core.conflits_horaires.Creneau) des séances placées"""
+    return [
+        Creneau(f'seance-{i}', s.cours_id, s.enseignant_id, s.classe_id, salle, plage.jour, plage.debut, plage.fin,
+                s.semestre, s.annee_scolaire, s.libelle)
+        for i, (s, plage, salle) in enumerate(planning.affectations)
+    ]
+
+
+def generer_emploi_du_temps(semestre, annee_scolaire, volumes=VOLUMES, salles=None, plages=None,
+                            classes=None, budget=BUDGET, enregistrer=False):
+    """
+    Génère l'emploi du temps des cours d'une période (des classes données,
+    toutes par défaut).
+
+    Les créneaux des autres cours de la période sont conservés. Les salles
+    sont par défaut toutes les salles enregistrées. Avec
+    `enregistrer`, un planning complet remplace les créneaux des cours
+    concernés. Retourne (planning, enregistré).
+    """
+    plages = plages or grille()
+    cours = Cours.objects.filter(semestre=semestre, annee_scolaire=annee_scolaire).select_related('matiere', 'classe')
+    if classes is not None:
+        cours = cours.filter(classe__in=classes)
+    cours = list(cours.order_by('classe__nom', 'matiere__code'))
+    duree = duree_plage(plages[0])
+    capacites = dict(Salle.objects.values_list('nom', 'capacite'))
+    if salles is None:
+        salles = list(capacites)
+
+    conserves = EmploiDuTemps.objects.filter(
+        cours__semestre=semestre, cours__annee_scolaire=annee_scolaire
+    ).exclude(cours__in=cours)
+    planning = planifier(seances_cours(cours, volumes, duree), plages, salles, creneaux(conserves), budget,
+                         capacites=capacites, effectifs=effectifs_classes())
+    if not enregistrer or planning.non_placees:
+        return planning, False
+
+    remplaces = EmploiDuTemps.objects.filter(cours__in=cours)
+    with transaction.atomic():
+        # Contrôle final par le moteur de conflits, sur l'état courant de la base
+        conflits = verifier_creneaux(creneaux_planning(planning), remplaces=remplaces.values_list('pk', flat=True))
+        if conflits:
+            return planning, False
+        remplaces.delete()
+        EmploiDuTemps.objects.bulk_create([
+            EmploiDuTemps(cours_id=s.cours_id, jour=plage.jour, heure_debut=plage.debut, heure_fin=plage.fin,
+                          type_cours=s.type_cours, salle_id=salle)
+            for s, plage, salle in planning.affectations
+        ])
+    return planning, True
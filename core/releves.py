@@ -0,0 +1,197 @@
+"""
+Relevés de notes des étudiants
+
+Le relevé d'un étudiant réunit ses notes, la moyenne de chacun de ses cours
+(pondérée par les coefficients), ses moyennes de semestre et sa moyenne
+générale (pondérées par les crédits) et les crédits obtenus. Il est calculé
+une fois, en deux requêtes pour un nombre quelconque d'étudiants, puis servi
+depuis le cache : la fiche étudiant et les bulletins sont rendus sans
+interroger les notes.
+
+Chaque étudiant a sa propre version de relevé, changée à chaque écriture de
+l'une de ses notes (signaux, opérations en masse de NoteQuerySet, import).
+Les modifications des cours, matières, classes, étudiants et utilisateurs
+invalident tous les relevés par les versions de modèles de core.compteurs.
+"""
+import hashlib
+import time
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from .models import Etudiant, Enseignant, Classe, Cours, Matiere, Note
+from .compteurs import DUREE_CACHE, lire_versions
+
+
+PREFIXE = 'releves'
+
+# Modèles dont dépendent tous les relevés (libellés, crédits, classe de l'étudiant)
+MODELES_RELEVE = (User, Etudiant, Enseignant, Classe, Cours, Matiere)
+
+# Nombre d'étudiants dont les relevés sont calculés par requête
+TAILLE_LOT = 500
+
+
+def _cle_version(etudiant_id):
+    return f'{PREFIXE}:version:{etudiant_id}'
+
+
+def _nouvelle_version():
+    return time.time_ns()
+
+
+def invalider_releves(etudiant_ids):
+    """Rend obsolètes les relevés des étudiants donnés (immédiatement et après le commit)"""
+    cles = {_cle_version(pk) for pk in etudiant_ids if pk is not None}
+    if not cles:
+        return
+
+    def invalider():
+        cache.set_many({cle: _nouvelle_version() for cle in cles}, None)
+
+    invalider()
+    # Une lecture concurrente avant le commit a pu remettre en cache un relevé obsolète
+    transaction.on_commit(invalider)
+
+
+def _arrondir(valeur):
+    # Même arrondi que core.moyennes
+    return None if valeur is None else Decimal(str(round(valeur, 2)))
+
+
+def _moyenne(paires):
+    """Moyenne pondérée de (valeur, poids), None sans poids"""
+    total = sum(poids for _, poids in paires)
+    return sum(valeur * poids for valeur, poids in paires) / total if total else None
+
+
+def construire_releves(etudiants):
+    """
+    Relevés des étudiants donnés (instances), en deux requêtes.
+
+    Retourne un dictionnaire etudiant_id -> relevé ; un relevé ne contient que
+    des valeurs simples et peut être mis en cache.
+    """
+    etudiants = list(etudiants)
+    notes_par_etudiant = {etudiant.pk: [] for etudiant in etudiants}
+    types = dict(Note.TYPES_EVALUATION)
+    for pk, etudiant_id, cours_id, type_evaluation, note, coefficient, date_evaluation, commentaire in (
+        Note.objects.filter(etudiant__in=list(notes_par_etudiant)).values_list(
+            'pk', 'etudiant', 'cours', 'type_evaluation', 'note', 'coefficient', 'date_evaluation', 'commentaire'
+        ).order_by('-date_evaluation', '-pk')
+    ):
+        notes_par_etudiant[etudiant_id].append({
+            'id': pk, 'cours_id': cours_id, 'type_evaluation': type_evaluation,
+            'type_libelle': types.get(type_evaluation, type_evaluation), 'note': note,
+            'coefficient': coefficient, 'date_evaluation': date_evaluation, 'commentaire': commentaire,
+        })
+
+    cours_notes = {note['cours_id'] for notes in notes_par_etudiant.values() for note in notes}
+    cours = {
+        c.pk: c for c in Cours.objects.filter(
+            Q(classe__in={etudiant.classe_id for etudiant in etudiants}) | Q(pk__in=cours_notes)
+        ).select_related('matiere', 'enseignant__user').order_by('-annee_scolaire', 'semestre', 'matiere__nom', 'pk')
+    }
+    rangs = {pk: i for i, pk in enumerate(cours)}
+
+    releves = {}
+    for etudiant in etudiants:
+        notes = notes_par_etudiant[etudiant.pk]
+        par_cours = {}
+        for note in notes:
+            note['matiere'] = cours[note['cours_id']].matiere.nom
+            note['code'] = cours[note['cours_id']].matiere.code
+            par_cours.setdefault(note['cours_id'], []).append(note)
+
+        lignes = []
+        for pk in sorted({pk for pk, c in cours.items() if c.classe_id == etudiant.classe_id} | set(par_cours),
+                         key=rangs.get):
+            c, notes_cours = cours[pk], par_cours.get(pk, [])
+            moyenne = _moyenne([(float(n['note']), float(n['coefficient'])) for n in notes_cours])
+            arrondie = _arrondir(moyenne)
+            lignes.append({
+                'cours_id': pk,
+                'matiere': c.matiere.nom,
+                'code': c.matiere.code,
+                'description': c.matiere.description,
+                'credits': c.matiere.credits,
+                'enseignant': c.enseignant.nom_complet,
+                'semestre': c.semestre,
+                'semestre_libelle': c.get_semestre_display(),
+                'annee_scolaire': c.annee_scolaire,
+                'nombre_notes': len(notes_cours),
+                'moyenne': arrondie,
+                'moyenne_exacte': moyenne,
+                'validee': arrondie is not None and arrondie >= c.matiere.note_validation,
+                # Dernier commentaire saisi (les notes sont triées de la plus récente à la plus ancienne)
+                'commentaire': next((n['commentaire'] for n in notes_cours if n['commentaire']), ''),
+            })
+
+        semestres = {}
+        for ligne in lignes:
+            semestres.setdefault((ligne['annee_scolaire'], ligne['semestre']), []).append(ligne)
+
+        def synthese(lignes_semestre):
+            notees = [ligne for ligne in lignes_semestre if ligne['moyenne'] is not None]
+            return {
+                'moyenne': _arrondir(_moyenne([(ligne['moyenne_exacte'], ligne['credits']) for ligne in notees])),
+                'credits_tentes': sum(ligne['credits'] for ligne in notees),
+                'credits_obtenus': sum(ligne['credits'] for ligne in notees if ligne['validee']),
+            }
+
+        total = synthese(lignes)
+        releves[etudiant.pk] = {
+            'etudiant_id': etudiant.pk,
+            'notes': notes,
+            'nombre_notes': len(notes),
+            'cours': lignes,
+            'semestres': [
+                dict(synthese(lignes_semestre), annee_scolaire=annee, semestre=semestre, cours=lignes_semestre)
+                for (annee, semestre), lignes_semestre in semestres.items()
+            ],
+            'moyenne_generale': total['moyenne'],
+            'credits_tentes': total['credits_tentes'],
+            'credits_obtenus': total['credits_obtenus'],
+        }
+    return releves
+
+
+def releves_etudiants(etudiants):
+    """
+    Relevés des étudiants donnés, depuis le cache.
+
+    Seuls les relevés absents ou obsolètes sont calculés, par lots
+    (construire_releves). Avec un cache chaud, aucune requête n'est envoyée.
+    """
+    etudiants = {etudiant.pk: etudiant for etudiant in etudiants}
+    versions = lire_versions(MODELES_RELEVE)
+    globale = ':'.join(str(versions[modele]) for modele in MODELES_RELEVE)
+
+    cles_versions = {_cle_version(pk): pk for pk in etudiants}
+    versions_etudiants = cache.get_many(list(cles_versions))
+    manquantes = {cle: _nouvelle_version() for cle in cles_versions if cle not in versions_etudiants}
+    if manquantes:
+        cache.set_many(manquantes, None)
+        versions_etudiants.update(manquantes)
+
+    cles = {
+        pk: f'{PREFIXE}:releve:{pk}:' + hashlib.md5(
+            f'{globale}:{versions_etudiants[cle]}'.encode()
+        ).hexdigest()
+        for cle, pk in cles_versions.items()
+    }
+    en_cache = cache.get_many(list(cles.values()))
+    releves = {pk: en_cache[cle] for pk, cle in cles.items() if cle in en_cache}
+
+    a_calculer = [etudiant for pk, etudiant in etudiants.items() if pk not in releves]
+    for debut in range(0, len(a_calculer), TAILLE_LOT):
+        calcules = construire_releves(a_calculer[debut:debut + TAILLE_LOT])
+        cache.set_many({cles[pk]: releve for pk, releve in calcules.items()}, DUREE_CACHE)
+        releves.update(calcules)
+    return releves
+
+
+def releve_etudiant(etudiant):
+    """Relevé d'un étudiant, depuis le cache"""
+    return releves_etudiants([etudiant])[etudiant.pk]
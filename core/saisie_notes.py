@@ -0,0 +1,99 @@
+"""
+Saisie des notes d'une évaluation pour toute une classe
+
+Une évaluation est identifiée par (cours, type d'évaluation, date). La grille
+est validée en une passe, puis les notes sont créées ou mises à jour avec
+bulk_create / bulk_update dans une seule transaction et les étudiants
+notifiés par un seul bulk_create : le nombre de requêtes ne dépend pas de
+l'effectif de la classe.
+"""
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from .models import Note
+from .utils import envoyer_notifications
+
+
+NOTE_MIN = Decimal('0')
+NOTE_MAX = Decimal('20')
+PRECISION = Decimal('0.01')
+
+
+def lire_grille(donnees, etudiants):
+    """
+    Lit et valide les cellules de la grille (champs note_<id> et commentaire_<id>).
+
+    Retourne (valeurs, erreurs) : etudiant_id -> (note, commentaire) pour les
+    cellules remplies et valides, etudiant_id -> message pour les autres.
+    """
+    valeurs, erreurs = {}, {}
+    for etudiant in etudiants:
+        brut = donnees.get(f'note_{etudiant.pk}', '').strip().replace(',', '.')
+        if not brut:
+            continue
+        try:
+            valeur = Decimal(brut)
+        except InvalidOperation:
+            erreurs[etudiant.pk] = 'Note invalide'
+            continue
+        if not valeur.is_finite() or not NOTE_MIN <= valeur <= NOTE_MAX:
+            erreurs[etudiant.pk] = 'La note doit être comprise entre 0 et 20'
+        elif valeur != valeur.quantize(PRECISION):
+            erreurs[etudiant.pk] = 'Deux décimales au maximum'
+        else:
+            commentaire = donnees.get(f'commentaire_{etudiant.pk}', '').strip()
+            valeurs[etudiant.pk] = (valeur.quantize(PRECISION), commentaire)
+    return valeurs, erreurs
+
+
+def notes_evaluation(cours, type_evaluation, date_evaluation):
+    """Notes déjà saisies pour une évaluation, par étudiant"""
+    notes = Note.objects.filter(
+        cours=cours, type_evaluation=type_evaluation, date_evaluation=date_evaluation
+    )
+    return {note.etudiant_id: note for note in notes}
+
+
+def enregistrer_saisie(cours, etudiants, type_evaluation, date_evaluation, coefficient, valeurs):
+    """
+    Crée ou met à jour les notes d'une évaluation et notifie les étudiants concernés.
+
+    `valeurs` provient de lire_grille. Retourne (notes créées, notes modifiées).
+    """
+    etudiants = {etudiant.pk: etudiant for etudiant in etudiants}
+    libelle = f'{cours.matiere.nom} ({dict(Note.TYPES_EVALUATION)[type_evaluation]} du {date_evaluation:%d/%m/%Y})'
+
+    with transaction.atomic():
+        existantes = {
+            note.etudiant_id: note
+            for note in Note.objects.select_for_update().filter(
+                cours=cours, type_evaluation=type_evaluation, date_evaluation=date_evaluation
+            )
+        }
+        a_creer, a_modifier, destinataires = [], [], []
+        for etudiant_id, (valeur, commentaire) in valeurs.items():
+            note = existantes.get(etudiant_id)
+            if note is None:
+                notifier = True
+                a_creer.append(Note(
+                    etudiant_id=etudiant_id, cours=cours, type_evaluation=type_evaluation,
+                    note=valeur, coefficient=coefficient, date_evaluation=date_evaluation,
+                    commentaire=commentaire,
+                ))
+            else:
+                # Seul un changement de valeur est notifié à l'étudiant
+                notifier = note.note != valeur
+                if notifier or (note.coefficient, note.commentaire) != (coefficient, commentaire):
+                    note.note, note.coefficient, note.commentaire = valeur, coefficient, commentaire
+                    a_modifier.append(note)
+            if notifier:
+                destinataires.append((
+                    etudiants[etudiant_id].user,
+                    f'Votre note en {libelle} : {valeur}/20',
+                ))
+
+        Note.objects.bulk_create(a_creer)
+        if a_modifier:
+            Note.objects.bulk_update(a_modifier, ['note', 'coefficient', 'commentaire'])
+        envoyer_notifications(destinataires, 'NEW_GRADE', 'Nouvelle note')
+
+    return len(a_creer), len(a_modifier)
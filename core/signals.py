@@ -0,0 +1,82 @@
+"""
+Signaux d'EduManager
+"""
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.contrib.auth.models import User
+from .models import Note, Cours, Salle
+from .agregats import appliquer_variations, synchroniser_cours
+from .activite_notes import enregistrer_activite
+from .compteurs import MODELES_SUIVIS, invalider_compteurs
+from .historique_notes import journaliser_creations, journaliser_modifications, journaliser_suppressions
+from .releves import invalider_releves
+
+
+@receiver(pre_save, sender=Note)
+def memoriser_note_initiale(sender, instance, raw=False, **kwargs):
+    """Mémorise la note enregistrée avant modification"""
+    instance._note_initiale = instance._etudiant_initial = None
+    if instance.pk and not raw:
+        initiale = Note.objects.filter(pk=instance.pk).values_list(
+            'cours_id', 'note', 'etudiant_id'
+        ).first()
+        if initiale:
+            instance._note_initiale, instance._etudiant_initial = initiale[:2], initiale[2]
+
+
+@receiver(post_save, sender=Note)
+def note_enregistree(sender, instance, created, raw=False, **kwargs):
+    """Met à jour les agrégats, l'activité, l'historique et les relevés après l'écriture d'une note"""
+    if raw:
+        return
+    invalider_releves({instance.etudiant_id, getattr(instance, '_etudiant_initial', None)})
+    initiale = getattr(instance, '_note_initiale', None)
+    appliquer_variations(
+        ajouts=[(instance.cours_id, instance.note)],
+        retraits=[initiale] if initiale else [],
+    )
+    etat = (instance.etudiant_id, instance.cours_id, instance.note)
+    if created:
+        enregistrer_activite(saisies={instance.cours_id: 1})
+        journaliser_creations([(instance.pk, *etat)])
+    else:
+        enregistrer_activite(modifications={instance.cours_id: 1})
+        if initiale:
+            journaliser_modifications({instance.pk: initiale[1]}, {instance.pk: etat})
+
+
+@receiver(post_delete, sender=Note)
+def note_supprimee(sender, instance, **kwargs):
+    """Met à jour les agrégats, l'historique et le relevé après la suppression d'une note"""
+    invalider_releves([instance.etudiant_id])
+    appliquer_variations(retraits=[(instance.cours_id, instance.note)])
+    journaliser_suppressions([(instance.pk, instance.etudiant_id, instance.cours_id, instance.note)])
+
+
+@receiver(post_save, sender=Cours)
+def cours_enregistre(sender, instance, created, raw=False, **kwargs):
+    """Répercute les changements de classe, matière ou période sur les agrégats"""
+    if not created and not raw:
+        synchroniser_cours(instance)
+
+
+def modele_modifie(sender, update_fields=None, **kwargs):
+    """Invalide les compteurs qui dépendent du modèle modifié"""
+    if kwargs.get('raw'):
+        return
+    # La mise à jour de last_login à chaque connexion n'affecte aucun compteur
+    if sender is User and update_fields and set(update_fields) <= {'last_login'}:
+        return
+    invalider_compteurs(sender)
+
+
+for modele in MODELES_SUIVIS:
+    post_save.connect(modele_modifie, sender=modele, dispatch_uid=f'compteurs_save_{modele._meta.label_lower}')
+    post_delete.connect(modele_modifie, sender=modele, dispatch_uid=f'compteurs_delete_{modele._meta.label_lower}')
+
+
+@receiver(m2m_changed, sender=Salle.equipements.through)
+def equipements_salle_modifies(sender, action, **kwargs):
+    """Invalide l'occupation des salles quand leurs équipements changent"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalider_compteurs(Salle)
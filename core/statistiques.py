@@ -0,0 +1,196 @@
+"""
+Service de statistiques pour EduManager
+
+Toutes les statistiques par classe et par matière sont lues dans la table des
+agrégats de notes (une ligne par cours, voir core.agregats) avec un nombre
+constant de requêtes groupées : le coût dépend du nombre de cours et non du
+nombre de notes.
+"""
+from collections import defaultdict
+from decimal import Decimal
+from django.db.models import Count, Min, Max, Sum
+from .models import Classe, Matiere, Etudiant, Cours, AgregatNotes
+from .agregats import NOTE_REUSSITE
+from .moyennes import moyennes_generales
+
+
+def _agreger(champ_groupe, filtres):
+    """Cumule les agrégats de cours par classe ou par matière (une seule requête)"""
+    lignes = AgregatNotes.objects.filter(**filtres).values(champ_groupe).annotate(
+        nombre_notes=Sum('nombre_notes'),
+        somme=Sum('somme'),
+        somme_carres=Sum('somme_carres'),
+        reussites=Sum('reussites'),
+        minimum=Min('minimum'),
+        maximum=Max('maximum'),
+    ).order_by()
+    return {ligne[champ_groupe]: ligne for ligne in lignes}
+
+
+def _filtres_periode(semestre, annee_scolaire):
+    """Filtres de période communs aux agrégats et aux cours"""
+    filtres = {}
+    if semestre:
+        filtres['semestre'] = semestre
+    if annee_scolaire:
+        filtres['annee_scolaire'] = annee_scolaire
+    return filtres
+
+
+def _arrondir(valeur):
+    """Arrondit une valeur à deux décimales (0 si absente)"""
+    return round(Decimal(valeur or 0), 2)
+
+
+def _completer(stat, agregat):
+    """Complète une ligne de statistiques à partir d'un agrégat de notes"""
+    agregat = agregat or {}
+    nombre_notes = agregat.get('nombre_notes') or 0
+    reussites = agregat.get('reussites') or 0
+    somme = Decimal(agregat.get('somme') or 0)
+    somme_carres = Decimal(agregat.get('somme_carres') or 0)
+
+    moyenne = somme / nombre_notes if nombre_notes else Decimal('0')
+    variance = somme_carres / nombre_notes - moyenne * moyenne if nombre_notes else Decimal('0')
+
+    stat.update({
+        'nombre_notes': nombre_notes,
+        'somme': somme,
+        'moyenne': _arrondir(moyenne),
+        'ecart_type': _arrondir(max(variance, Decimal('0')).sqrt()),
+        'minimum': agregat.get('minimum'),
+        'maximum': agregat.get('maximum'),
+        'reussites': reussites,
+        'taux_reussite': round(100 * reussites / nombre_notes, 1) if nombre_notes else 0,
+    })
+    return stat
+
+
+def _effectifs_par_classe():
+    """Nombre d'étudiants inscrits par classe"""
+    return dict(
+        Etudiant.objects.values_list('classe').annotate(n=Count('id')).order_by()
+    )
+
+
+def statistiques_par_classe(semestre=None, annee_scolaire=None, effectifs=None):
+    """Statistiques de chaque classe : effectif, moyenne, min, max, taux de réussite"""
+    if effectifs is None:
+        effectifs = _effectifs_par_classe()
+    agregats = _agreger('classe', _filtres_periode(semestre, annee_scolaire))
+
+    stats = []
+    for classe in Classe.objects.select_related('departement').order_by('niveau', 'nom'):
+        stat = _completer({
+            'classe': classe,
+            'etudiants_count': effectifs.get(classe.pk, 0),
+        }, agregats.get(classe.pk))
+        # Nom historique utilisé par le template
+        stat['moyenne_generale'] = stat['moyenne']
+        stats.append(stat)
+    return stats
+
+
+def statistiques_par_matiere(semestre=None, annee_scolaire=None, effectifs=None):
+    """Statistiques de chaque matière : étudiants inscrits, moyenne, min, max, taux de réussite"""
+    if effectifs is None:
+        effectifs = _effectifs_par_classe()
+    filtres = _filtres_periode(semestre, annee_scolaire)
+    agregats = _agreger('matiere', filtres)
+
+    # Étudiants inscrits dans les classes où la matière est enseignée
+    inscrits = defaultdict(int)
+    paires = Cours.objects.filter(**filtres).values_list('matiere', 'classe').distinct()
+    for matiere_id, classe_id in paires:
+        inscrits[matiere_id] += effectifs.get(classe_id, 0)
+
+    stats = []
+    for matiere in Matiere.objects.order_by('code'):
+        stat = _completer({
+            'matiere': matiere,
+            'etudiants_count': inscrits[matiere.pk],
+        }, agregats.get(matiere.pk))
+        stats.append(stat)
+    return stats
+
+
+def statistiques_globales(stats_classes, semestre=None, annee_scolaire=None):
+    """Totaux de l'établissement, dérivés des statistiques par classe"""
+    nombre_notes = sum(s['nombre_notes'] for s in stats_classes)
+    somme = sum((s['somme'] for s in stats_classes), Decimal('0'))
+    reussites = sum(s['reussites'] for s in stats_classes)
+    return {
+        'total_etudiants': sum(s['etudiants_count'] for s in stats_classes),
+        'total_cours': Cours.objects.filter(**_filtres_periode(semestre, annee_scolaire)).count(),
+        'nombre_notes': nombre_notes,
+        'moyenne': _arrondir(somme / nombre_notes) if nombre_notes else _arrondir(0),
+        'taux_reussite': round(100 * reussites / nombre_notes, 1) if nombre_notes else 0,
+    }
+
+
+def meilleurs_et_en_difficulte(semestre=None, annee_scolaire=None, limite=10, limite_difficulte=5):
+    """Meilleurs étudiants et étudiants sous la moyenne, selon leur moyenne générale pondérée"""
+    moyennes = moyennes_generales(semestre=semestre, annee_scolaire=annee_scolaire)
+    classees = sorted(
+        ((resultat['moyenne'], etudiant_id) for etudiant_id, resultat in moyennes.items()
+         if resultat['moyenne'] is not None),
+        reverse=True,
+    )
+    meilleurs = classees[:limite]
+    en_difficulte = [c for c in reversed(classees) if c[0] < NOTE_REUSSITE][:limite_difficulte]
+
+    etudiants = Etudiant.objects.select_related('user', 'classe').in_bulk(
+        [etudiant_id for _, etudiant_id in meilleurs + en_difficulte]
+    )
+    return {
+        'meilleurs_etudiants': [
+            {'etudiant': etudiants[etudiant_id], 'moyenne': moyenne} for moyenne, etudiant_id in meilleurs
+        ],
+        'etudiants_en_difficulte': [
+            {'etudiant': etudiants[etudiant_id], 'moyenne': moyenne} for moyenne, etudiant_id in en_difficulte
+        ],
+    }
+
+
+def calculer_statistiques(semestre=None, annee_scolaire=None):
+    """Calcule l'ensemble des statistiques affichées ou exportées"""
+    effectifs = _effectifs_par_classe()
+    stats_classes = statistiques_par_classe(semestre, annee_scolaire, effectifs)
+    statistiques = {
+        'stats_classes': stats_classes,
+        'stats_matieres': statistiques_par_matiere(semestre, annee_scolaire, effectifs),
+        'stats_globales': statistiques_globales(stats_classes, semestre, annee_scolaire),
+    }
+    statistiques.update(meilleurs_et_en_difficulte(semestre, annee_scolaire))
+    return statistiques
+
+
+def series_graphiques(semestre=None, annee_scolaire=None):
+    """Séries des graphiques de statistiques (classes, matières, niveaux), sérialisables en JSON"""
+    effectifs = _effectifs_par_classe()
+    stats_classes = statistiques_par_classe(semestre, annee_scolaire, effectifs)
+    stats_matieres = statistiques_par_matiere(semestre, annee_scolaire, effectifs)
+
+    niveaux = defaultdict(int)
+    for stat in stats_classes:
+        niveaux[stat['classe'].niveau] += stat['etudiants_count']
+
+    return {
+        'classes': {
+            'ids': [s['classe'].pk for s in stats_classes],
+            'labels': [s['classe'].nom for s in stats_classes],
+            'effectifs': [s['etudiants_count'] for s in stats_classes],
+            'moyennes': [float(s['moyenne']) for s in stats_classes],
+            'taux_reussite': [s['taux_reussite'] for s in stats_classes],
+        },
+        'matieres': {
+            'ids': [s['matiere'].pk for s in stats_matieres],
+            'labels': [s['matiere'].code for s in stats_matieres],
+            'moyennes': [float(s['moyenne']) for s in stats_matieres],
+            'taux_reussite': [s['taux_reussite'] for s in stats_matieres],
+        },
+        'niveaux': {
+            'labels': [libelle for _, libelle in Classe.NIVEAUX],
+            'effectifs': [niveaux[code] for code, _ in Classe.NIVEAUX],
+        },
+    }
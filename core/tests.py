@@ -1,15 +1,27 @@
-from django.test import TestCase, Client
+from django.test import TestCase as BaseTestCase, Client, override_settings
 from django.contrib.auth.models import User
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
 from .models import (
     Departement, Enseignant, Classe, Etudiant, 
-    Matiere, Cours, Note, EmploiDuTemps
+    Matiere, Cours, Note, EmploiDuTemps, DecisionSemestre, HistoriqueNote, AnomalieNote, Salle, Equipement
 )
 from datetime import date, time
 from decimal import Decimal
 
 
+# Les tests gardent un cache propre au processus, quel que soit le lanceur
+# (manage.py test, pytest-django) : rien n'est lu ni écrit dans cache/
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+})
+class TestCase(BaseTestCase):
+    pass
+
+
 class ModelsTestCase(TestCase):
     """Tests pour les modèles"""
     
@@ -125,10 +137,10 @@ class ModelsTestCase(TestCase):
             heure_debut=time(8, 0),
             heure_fin=time(10, 0),
             type_cours="CM",
-            salle="Amphi A"
+            salle=Salle.objects.create(nom=" Amphi A", capacite=120)
         )
         self.assertEqual(emploi.jour, "LUNDI")
-        self.assertEqual(emploi.salle, "Amphi A")
+        self.assertEqual(emploi.salle_id, "AMPHI A")
 
 
 class ViewsTestCase(TestCase):
@@ -380,3 +392,1764 @@ class PerformanceTestCase(TestCase):
         
         response = self.client.get(reverse('etudiants_list'))
         self.assertEqual(response.status_code, 200)
+
+
+class DonneesNotesTestCase(TestCase):
+    """Base des tests qui ont besoin de classes notées"""
+    
+    def setUp(self):
+        """Configuration initiale pour les tests sur les notes"""
+        self.departement = Departement.objects.create(nom="Informatique")
+        user = User.objects.create_user(username="prof_stats", first_name="Jean", last_name="Dupont")
+        self.enseignant = Enseignant.objects.create(
+            user=user,
+            departement=self.departement,
+            date_embauche=date(2020, 9, 1)
+        )
+        self.compteur = 0
+
+    def creer_classe_notee(self, valeurs):
+        """Crée une classe, une matière, un cours et une note par valeur"""
+        self.compteur += 1
+        classe = Classe.objects.create(
+            nom=f"CLASSE-{self.compteur}", niveau="L1", departement=self.departement
+        )
+        matiere = Matiere.objects.create(
+            nom=f"Matière {self.compteur}", code=f"MAT{self.compteur}", credits=3
+        )
+        cours = Cours.objects.create(
+            matiere=matiere, enseignant=self.enseignant, classe=classe,
+            semestre="S1", annee_scolaire="2023-2024"
+        )
+        for i, valeur in enumerate(valeurs):
+            user = User.objects.create_user(username=f"etu_{self.compteur}_{i}")
+            etudiant = Etudiant.objects.create(
+                user=user, numero_etudiant=f"ET{self.compteur}-{i}",
+                classe=classe, date_naissance=date(2003, 1, 1)
+            )
+            Note.objects.create(
+                etudiant=etudiant, cours=cours, type_evaluation="DS",
+                note=Decimal(valeur), date_evaluation=date(2023, 10, 15)
+            )
+        return classe, matiere
+
+
+class StatistiquesServiceTestCase(DonneesNotesTestCase):
+    """Tests du service de statistiques"""
+
+    def test_statistiques_par_classe(self):
+        """Les agrégats par classe sont corrects"""
+        from .statistiques import calculer_statistiques
+        classe, matiere = self.creer_classe_notee(["8", "12", "16"])
+        stats = calculer_statistiques()
+        
+        stat_classe = stats['stats_classes'][0]
+        self.assertEqual(stat_classe['classe'], classe)
+        self.assertEqual(stat_classe['etudiants_count'], 3)
+        self.assertEqual(stat_classe['nombre_notes'], 3)
+        self.assertEqual(stat_classe['moyenne'], Decimal("12.00"))
+        self.assertEqual(stat_classe['minimum'], Decimal("8"))
+        self.assertEqual(stat_classe['maximum'], Decimal("16"))
+        self.assertEqual(stat_classe['taux_reussite'], 66.7)
+        
+        stat_matiere = stats['stats_matieres'][0]
+        self.assertEqual(stat_matiere['matiere'], matiere)
+        self.assertEqual(stat_matiere['etudiants_count'], 3)
+        self.assertEqual(stats['stats_globales']['moyenne'], Decimal("12.00"))
+
+    def test_nombre_requetes_constant(self):
+        """Le nombre de requêtes ne dépend pas du volume de données"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .statistiques import calculer_statistiques
+        
+        self.creer_classe_notee(["10", "14"])
+        with CaptureQueriesContext(connection) as petites_donnees:
+            calculer_statistiques()
+        
+        for _ in range(5):
+            self.creer_classe_notee(["5", "11", "17"])
+        with CaptureQueriesContext(connection) as grandes_donnees:
+            calculer_statistiques()
+        
+        self.assertEqual(len(petites_donnees), len(grandes_donnees))
+
+
+class AgregatsNotesTestCase(DonneesNotesTestCase):
+    """Tests des agrégats de notes maintenus par variations"""
+
+    def assertAgregatsAJour(self):
+        from .agregats import comparer_agregats
+        self.assertEqual(comparer_agregats(), [])
+
+    def test_variations_creation_modification_suppression(self):
+        """Les agrégats suivent les créations, modifications et suppressions"""
+        from .models import AgregatNotes
+        classe, matiere = self.creer_classe_notee(["8", "12", "16"])
+        agregat = AgregatNotes.objects.get(classe=classe)
+        self.assertEqual(agregat.nombre_notes, 3)
+        self.assertEqual(agregat.somme, Decimal("36"))
+        self.assertEqual(agregat.reussites, 2)
+        
+        note = Note.objects.get(note=Decimal("16"))
+        note.note = Decimal("9")
+        note.save()
+        self.assertAgregatsAJour()
+        agregat.refresh_from_db()
+        self.assertEqual(agregat.maximum, Decimal("12"))
+        
+        Note.objects.filter(note=Decimal("8")).delete()
+        self.assertAgregatsAJour()
+
+    def test_operations_en_masse(self):
+        """Les agrégats suivent bulk_create, bulk_update et update"""
+        classe, matiere = self.creer_classe_notee(["10"])
+        note = Note.objects.get()
+        Note.objects.bulk_create([
+            Note(etudiant=note.etudiant, cours=note.cours, type_evaluation="CC",
+                 note=Decimal(valeur), date_evaluation=date(2023, 11, 1))
+            for valeur in ["4", "18.5"]
+        ])
+        self.assertAgregatsAJour()
+        
+        notes = list(Note.objects.all())
+        for n in notes:
+            n.note = n.note / 2
+        Note.objects.bulk_update(notes, ['note'])
+        self.assertAgregatsAJour()
+        
+        Note.objects.filter(type_evaluation="CC").update(note=Decimal("20"))
+        self.assertAgregatsAJour()
+
+    def test_cours_modifies_en_masse(self):
+        """Les changements de classe ou de période des cours en masse suivent dans les agrégats"""
+        from .models import AgregatNotes
+        classe, _ = self.creer_classe_notee(["10", "14"])
+        autre_classe, _ = self.creer_classe_notee(["12"])
+        Cours.objects.filter(classe=classe).update(classe=autre_classe, semestre="S2")
+        self.assertAgregatsAJour()
+        self.assertEqual(AgregatNotes.objects.filter(classe=autre_classe, semestre="S2").count(), 1)
+
+        cours = list(Cours.objects.all())
+        for c in cours:
+            c.annee_scolaire = "2024-2025"
+        Cours.objects.bulk_update(cours, ['annee_scolaire'])
+        self.assertAgregatsAJour()
+
+    def test_commande_rebuild_rollups(self):
+        """La commande répare des agrégats corrompus"""
+        from django.core.management import call_command
+        from io import StringIO
+        from .models import AgregatNotes
+        self.creer_classe_notee(["7", "13"])
+        AgregatNotes.objects.update(nombre_notes=42)
+        
+        sortie = StringIO()
+        call_command('rebuild_rollups', '--verifier', stdout=sortie)
+        self.assertIn('1 agrégat(s) divergent(s)', sortie.getvalue())
+        
+        call_command('rebuild_rollups', stdout=StringIO())
+        self.assertAgregatsAJour()
+
+
+class CompteursCacheTestCase(DonneesNotesTestCase):
+    """Tests des compteurs du tableau de bord en cache"""
+
+    def setUp(self):
+        super().setUp()
+        from django.core.cache import cache
+        cache.clear()
+        self.admin = User.objects.create_superuser(username='admin_cpt', password='admin123')
+
+    def test_cache_chaud_sans_requete(self):
+        """Avec un cache chaud, le tableau de bord n'interroge pas la base"""
+        from .compteurs import compteurs_tableau_de_bord
+        self.creer_classe_notee(["12"])
+        compteurs_tableau_de_bord(self.admin)
+        with self.assertNumQueries(0):
+            context = compteurs_tableau_de_bord(self.admin)
+        self.assertEqual(context['total_etudiants'], 1)
+        self.assertEqual(context['user_type'], 'admin')
+
+    def test_invalidation_par_signal_et_en_masse(self):
+        """Les sauvegardes et opérations en masse invalident les bons compteurs"""
+        from .compteurs import compteurs_tableau_de_bord
+        self.creer_classe_notee(["12"])
+        self.assertEqual(compteurs_tableau_de_bord(self.admin)['total_classes'], 1)
+        
+        self.creer_classe_notee(["14"])
+        context = compteurs_tableau_de_bord(self.admin)
+        self.assertEqual(context['total_classes'], 2)
+        self.assertEqual(context['total_etudiants'], 2)
+        
+        from .models import Notification
+        Notification.objects.create(utilisateur=self.admin, type_notification='INFO', titre='t', message='m')
+        self.assertEqual(compteurs_tableau_de_bord(self.admin)['notifications_non_lues'], 1)
+        Notification.objects.update(lue=True)
+        self.assertEqual(compteurs_tableau_de_bord(self.admin)['notifications_non_lues'], 0)
+
+    def test_invalidation_entre_processus(self):
+        """Une invalidation faite par un autre processus (commande, worker) rend les valeurs obsolètes"""
+        import tempfile
+        from unittest import mock
+        from django.core.cache.backends.filebased import FileBasedCache
+        from . import compteurs
+        with tempfile.TemporaryDirectory() as dossier:
+            # Deux instances qui ne partagent que le stockage, comme deux processus
+            serveur, commande = FileBasedCache(dossier, {}), FileBasedCache(dossier, {})
+            self.creer_classe_notee([])
+            with mock.patch.object(compteurs, 'cache', serveur):
+                self.assertEqual(compteurs.valeur_en_cache('classes', (Classe,), Classe.objects.count), 1)
+            with mock.patch.object(compteurs, 'cache', commande):
+                self.creer_classe_notee([])
+            with mock.patch.object(compteurs, 'cache', serveur):
+                with self.assertNumQueries(1):
+                    self.assertEqual(compteurs.valeur_en_cache('classes', (Classe,), Classe.objects.count), 2)
+
+    def test_section_etudiant(self):
+        """Le tableau de bord d'un étudiant affiche sa moyenne"""
+        self.creer_classe_notee(["11", "15"])
+        etudiant = Etudiant.objects.first()
+        etudiant.user.set_password('pass123')
+        etudiant.user.save()
+        self.client.login(username=etudiant.user.username, password='pass123')
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['user_type'], 'etudiant')
+        self.assertEqual(response.context['moyenne_generale'], Decimal("11"))
+
+
+class MoyennesPondereesTestCase(DonneesNotesTestCase):
+    """Tests des moyennes pondérées par coefficients et crédits"""
+
+    def setUp(self):
+        super().setUp()
+        self.classe, self.matiere = self.creer_classe_notee(["10"])
+        self.etudiant = Etudiant.objects.get()
+        self.cours = Cours.objects.get()
+        # Cours 1 (3 crédits) : 10 (coef 1) et 16 (coef 2) -> 14
+        Note.objects.create(
+            etudiant=self.etudiant, cours=self.cours, type_evaluation="EXAMEN",
+            note=Decimal("16"), coefficient=Decimal("2"), date_evaluation=date(2024, 1, 10)
+        )
+        # Cours 2 (6 crédits) : 8 -> moyenne générale (14*3 + 8*6) / 9 = 10
+        matiere = Matiere.objects.create(nom="Algèbre", code="ALG1", credits=6)
+        self.cours2 = Cours.objects.create(
+            matiere=matiere, enseignant=self.enseignant, classe=self.classe,
+            semestre="S2", annee_scolaire="2023-2024"
+        )
+        Note.objects.create(
+            etudiant=self.etudiant, cours=self.cours2, type_evaluation="DS",
+            note=Decimal("8"), date_evaluation=date(2024, 3, 10)
+        )
+
+    def test_moyennes_par_cours(self):
+        """Les moyennes de cours sont pondérées par les coefficients"""
+        from .moyennes import moyennes_ponderees
+        moyennes = moyennes_ponderees(par=('cours',), etudiant=self.etudiant)
+        self.assertEqual(moyennes[self.cours.pk], Decimal("14.00"))
+        self.assertEqual(moyennes[self.cours2.pk], Decimal("8.00"))
+
+    def test_moyenne_generale_ponderee_par_credits(self):
+        """La moyenne générale est pondérée par les crédits des matières"""
+        from .moyennes import moyenne_etudiant, moyennes_classe, releve_moyennes
+        self.assertEqual(moyenne_etudiant(self.etudiant), Decimal("10.00"))
+        self.assertEqual(moyenne_etudiant(self.etudiant, semestre="S1"), Decimal("14.00"))
+        with self.assertNumQueries(1):
+            self.assertEqual(moyennes_classe(self.classe), {self.etudiant.pk: Decimal("10.00")})
+        releve = releve_moyennes(self.etudiant)
+        self.assertEqual(releve['par_semestre'][("2023-2024", "S2")]['credits'], 6)
+
+    def test_detail_etudiant(self):
+        """La fiche étudiant affiche la moyenne générale pondérée"""
+        admin = User.objects.create_superuser(username='admin_moy', password='admin123')
+        self.client.login(username='admin_moy', password='admin123')
+        response = self.client.get(reverse('etudiant_detail', args=[self.etudiant.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['moyenne_generale'], Decimal("10.00"))
+        self.assertContains(response, "10,00/20")
+
+    def test_statistiques_meilleurs_etudiants(self):
+        """La page des statistiques classe les étudiants par moyenne pondérée"""
+        User.objects.create_superuser(username='admin_moy', password='admin123')
+        self.client.login(username='admin_moy', password='admin123')
+        response = self.client.get(reverse('statistiques'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['meilleurs_etudiants'][0]['etudiant'], self.etudiant)
+
+
+class DistributionsNotesTestCase(DonneesNotesTestCase):
+    """Tests des distributions de notes calculées avec NumPy"""
+
+    def test_statistiques_de_distribution(self):
+        """Médiane, quartiles et histogramme d'une classe"""
+        from .distributions import calculer_distributions
+        classe, matiere = self.creer_classe_notee(["4", "10", "12", "20"])
+        distributions = calculer_distributions()
+        
+        stats = distributions['par_classe'][classe.pk]
+        self.assertEqual(stats['nombre_notes'], 4)
+        self.assertEqual(stats['mediane'], 11.0)
+        self.assertEqual(stats['premier_quartile'], 8.5)
+        self.assertEqual(stats['troisieme_quartile'], 14.0)
+        self.assertEqual(stats['ecart_type'], 5.72)
+        self.assertEqual(stats['histogramme'], [0, 0, 1, 0, 0, 1, 1, 0, 0, 1])
+        self.assertEqual(distributions['par_type']['DS']['nombre_notes'], 4)
+        self.assertEqual(distributions['par_matiere'][matiere.pk], stats)
+
+    def test_million_de_notes(self):
+        """Le calcul vectorisé traite un million de notes en moins d'une seconde"""
+        import time
+        import numpy as np
+        from .distributions import statistiques_groupes
+        generateur = np.random.default_rng(0)
+        cles = generateur.integers(0, 500, 1000000).astype(np.int32)
+        valeurs = np.round(generateur.random(1000000) * 20, 2).astype(np.float32)
+        
+        debut = time.time()
+        stats = statistiques_groupes(cles, valeurs)
+        self.assertLess(time.time() - debut, 1.0)
+        
+        groupe = np.round(valeurs[cles == 7].astype(np.float64), 2)
+        self.assertEqual(stats[7]['mediane'], round(float(np.median(groupe)), 2))
+        self.assertEqual(sum(stats[7]['histogramme']), len(groupe))
+
+    def test_endpoint_json(self):
+        """Les distributions sont exposées au format JSON"""
+        classe, matiere = self.creer_classe_notee(["9", "13"])
+        User.objects.create_user(username='lecteur', password='pass123')
+        self.client.login(username='lecteur', password='pass123')
+        response = self.client.get(reverse('distributions_notes'))
+        self.assertEqual(response.status_code, 200)
+        donnees = response.json()
+        self.assertEqual(donnees['par_classe'][0]['nom'], classe.nom)
+        self.assertEqual(donnees['globale']['mediane'], 11.0)
+        
+        response = self.client.get(reverse('statistiques'))
+        self.assertContains(response, reverse('distributions_notes'))
+
+    def test_page_statistiques_en_cache(self):
+        """Les tableaux de la page sont calculés une fois, puis recalculés après un changement de note"""
+        from unittest import mock
+        from . import views
+        self.creer_classe_notee(["9", "13"])
+        User.objects.create_user(username='lecteur', password='pass123')
+        self.client.login(username='lecteur', password='pass123')
+        self.client.get(reverse('statistiques'))
+        with mock.patch.object(views, 'calculer_distributions') as distributions, \
+                mock.patch.object(views, 'calculer_statistiques') as statistiques:
+            response = self.client.get(reverse('statistiques'))
+            self.assertEqual(response.context['stats_globales']['nombre_notes'], 2)
+            self.assertEqual(response.context['stats_types'][0]['distribution']['mediane'], 11.0)
+            distributions.assert_not_called()
+            statistiques.assert_not_called()
+        
+        Note.objects.filter(note=Decimal('9')).update(note=Decimal('15'))
+        response = self.client.get(reverse('statistiques'))
+        self.assertEqual(response.context['stats_types'][0]['distribution']['mediane'], 14.0)
+
+
+class ClassementsTestCase(DonneesNotesTestCase):
+    """Tests du service de classement"""
+
+    def setUp(self):
+        super().setUp()
+        from django.core.cache import cache
+        cache.clear()
+        self.classe, self.matiere = self.creer_classe_notee(["12", "15", "12", "9"])
+        self.etudiants = list(Etudiant.objects.order_by('numero_etudiant'))
+
+    def test_rangs_avec_ex_aequo(self):
+        """Les rangs suivent les moyennes, avec ex æquo"""
+        from .classements import calculer_classement
+        classement = calculer_classement(self.classe)
+        rangs = {ligne['etudiant_id']: ligne['rang'] for ligne in classement['general']}
+        self.assertEqual(
+            [rangs[e.pk] for e in self.etudiants], [2, 1, 2, 4]
+        )
+        cours = Cours.objects.get()
+        self.assertEqual(classement['par_cours'][cours.pk][0]['etudiant_id'], self.etudiants[1].pk)
+
+    def test_cache_invalide_par_les_notes(self):
+        """Le classement est mis en cache et invalidé par une modification de note"""
+        from .classements import classement_classe, rangs_etudiant
+        classement_classe(self.classe)
+        with self.assertNumQueries(0):
+            classement_classe(self.classe)
+        
+        Note.objects.filter(etudiant=self.etudiants[3]).update(note=Decimal("19"))
+        self.assertEqual(rangs_etudiant(self.etudiants[3])['general']['rang'], 1)
+
+    def test_page_classement(self):
+        """La page de classement d'une classe liste les étudiants par rang"""
+        User.objects.create_user(username='lecteur', password='pass123')
+        self.client.login(username='lecteur', password='pass123')
+        response = self.client.get(reverse('classement_classe', args=[self.classe.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['classement'][0]['etudiant'], self.etudiants[1])
+        
+        response = self.client.get(reverse('etudiant_detail', args=[self.etudiants[1].pk]))
+        self.assertEqual(response.context['rang_classe']['rang'], 1)
+
+
+class ActiviteConnexionsTestCase(TestCase):
+    """Tests de l'activité de connexion par jour"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='actif', password='pass123')
+
+    def test_connexions_cumulees_par_jour(self):
+        """Chaque tentative de connexion met à jour l'activité du jour"""
+        from django.utils import timezone
+        from .models import ActiviteConnexionJour
+        from .compteurs import lire_compteurs
+        
+        login_url = reverse('login')
+        self.client.post(login_url, {'username': 'actif', 'password': 'pass123'})
+        self.client.logout()
+        self.client.post(login_url, {'username': 'actif', 'password': 'pass123'})
+        self.client.logout()
+        self.client.post(login_url, {'username': 'actif', 'password': 'faux'})
+        
+        activite = ActiviteConnexionJour.objects.get(jour=timezone.localdate())
+        self.assertEqual(activite.connexions_reussies, 2)
+        self.assertEqual(activite.connexions_echouees, 1)
+        self.assertEqual(activite.utilisateurs_distincts, 1)
+        
+        compteurs = lire_compteurs(['connexions_aujourd_hui', 'connexions_semaine', 'utilisateurs_actifs'])
+        self.assertEqual(compteurs['connexions_aujourd_hui'], 2)
+        self.assertEqual(compteurs['connexions_semaine'], 2)
+        self.assertEqual(compteurs['utilisateurs_actifs'], 1)
+        
+        self.user.delete()
+        self.assertEqual(lire_compteurs(['utilisateurs_actifs'])['utilisateurs_actifs'], 0)
+
+    def test_profil_cree_a_la_connexion(self):
+        """Un compte sans profil qui se connecte n'obtient pas de mot de passe temporaire"""
+        from .models import ProfilUtilisateur
+        self.client.post(reverse('login'), {'username': 'actif', 'password': 'pass123'})
+        profil = ProfilUtilisateur.objects.get(user=self.user)
+        self.assertFalse(profil.mot_de_passe_temporaire)
+        self.assertEqual(profil.nombre_connexions, 1)
+
+    def test_reconstruction_depuis_historique(self):
+        """La commande de reconstruction retrouve l'activité incrémentale"""
+        from io import StringIO
+        from django.core.management import call_command
+        from .models import ActiviteConnexionJour
+        
+        self.client.post(reverse('login'), {'username': 'actif', 'password': 'pass123'})
+        self.client.logout()
+        self.client.post(reverse('login'), {'username': 'actif', 'password': 'faux'})
+        attendu = list(ActiviteConnexionJour.objects.values_list(
+            'jour', 'connexions_reussies', 'connexions_echouees', 'utilisateurs_distincts'
+        ))
+        
+        ActiviteConnexionJour.objects.all().delete()
+        call_command('backfill_login_activity', stdout=StringIO())
+        self.assertEqual(list(ActiviteConnexionJour.objects.values_list(
+            'jour', 'connexions_reussies', 'connexions_echouees', 'utilisateurs_distincts'
+        )), attendu)
+
+
+class DonneesStatistiquesTestCase(DonneesNotesTestCase):
+    """Tests des endpoints JSON conditionnels des graphiques"""
+
+    def setUp(self):
+        super().setUp()
+        from django.core.cache import cache
+        cache.clear()
+        User.objects.create_user(username='lecteur', password='pass123')
+        self.client.login(username='lecteur', password='pass123')
+
+    def test_series_graphiques(self):
+        """Les séries par classe, matière et niveau sont exposées en JSON"""
+        classe, matiere = self.creer_classe_notee(["8", "14"])
+        response = self.client.get(reverse('donnees_statistiques'))
+        self.assertEqual(response.status_code, 200)
+        donnees = response.json()
+        self.assertEqual(donnees['classes']['labels'], [classe.nom])
+        self.assertEqual(donnees['classes']['moyennes'], [11.0])
+        self.assertEqual(donnees['matieres']['labels'], [matiere.code])
+        self.assertEqual(donnees['niveaux']['effectifs'][0], 2)
+
+    def test_reponse_304_puis_invalidation(self):
+        """Une requête conditionnelle reçoit 304 tant que les notes ne changent pas"""
+        self.creer_classe_notee(["12"])
+        url = reverse('donnees_statistiques')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+        self.assertFalse(etag.startswith('W/'))
+        
+        with self.assertNumQueries(2):  # session et utilisateur uniquement
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        
+        # Les filtres font partie de l'ETag
+        response = self.client.get(url, {'semestre': 'S2'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        
+        Note.objects.update(note=Decimal('16'))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['classes']['moyennes'], [16.0])
+
+
+class EffectifsEnseignantTestCase(DonneesNotesTestCase):
+    """Tests des effectifs dérivés des inscriptions"""
+
+    def setUp(self):
+        super().setUp()
+        from django.core.cache import cache
+        cache.clear()
+
+    def test_etudiants_sans_note_comptes(self):
+        """Les étudiants inscrits sans note comptent dans les effectifs"""
+        from .effectifs import effectifs_enseignant
+        classe, matiere = self.creer_classe_notee(["12", "9"])
+        user = User.objects.create_user(username='sans_note')
+        Etudiant.objects.create(
+            user=user, numero_etudiant='ET-SN', classe=classe, date_naissance=date(2003, 1, 1)
+        )
+        # Deuxième cours dans la même classe : les étudiants ne sont comptés qu'une fois
+        autre = Matiere.objects.create(nom='Physique', code='PHY', credits=2)
+        cours = Cours.objects.create(
+            matiere=autre, enseignant=self.enseignant, classe=classe,
+            semestre='S2', annee_scolaire='2023-2024'
+        )
+        
+        effectifs = effectifs_enseignant(self.enseignant)
+        self.assertEqual(effectifs['total'], 3)
+        self.assertEqual(effectifs['par_cours'][cours.pk], 3)
+        with self.assertNumQueries(0):
+            effectifs_enseignant(self.enseignant)
+
+    def test_tableau_de_bord_enseignant(self):
+        """Le tableau de bord d'un enseignant affiche ses effectifs"""
+        from .compteurs import compteurs_tableau_de_bord
+        self.creer_classe_notee(["12", "9"])
+        context = compteurs_tableau_de_bord(self.enseignant.user)
+        self.assertEqual(context['mes_etudiants'], 2)
+        self.assertEqual(context['mes_cours'][0].effectif, 2)
+        
+        self.enseignant.user.set_password('pass123')
+        self.enseignant.user.save()
+        self.client.login(username='prof_stats', password='pass123')
+        response = self.client.get(reverse('cours_list'))
+        self.assertContains(response, '2 inscrits')
+
+
+class ActiviteNotesTestCase(DonneesNotesTestCase):
+    """Tests de l'activité de saisie des notes"""
+
+    def setUp(self):
+        super().setUp()
+        from django.core.cache import cache
+        cache.clear()
+
+    def test_compartiments_maintenus_a_l_ecriture(self):
+        """Créations et modifications, unitaires ou en masse, alimentent les compartiments"""
+        from django.utils import timezone
+        from .models import ActiviteNotesJour
+        classe, matiere = self.creer_classe_notee(["12", "9"])
+        note = Note.objects.first()
+        self.assertIsNotNone(note.date_creation)
+        
+        note.note = Decimal('13')
+        note.save()
+        Note.objects.filter(pk=note.pk).update(note=Decimal('14'))
+        Note.objects.bulk_create([Note(
+            etudiant=note.etudiant, cours=note.cours, type_evaluation='CC',
+            note=Decimal('10'), date_evaluation=date(2023, 11, 1)
+        )])
+        
+        activite = ActiviteNotesJour.objects.get(jour=timezone.localdate(), classe=classe)
+        self.assertEqual(activite.notes_saisies, 3)
+        self.assertEqual(activite.notes_modifiees, 2)
+
+    def test_serie_hebdomadaire_et_compteur(self):
+        """La série lit les compartiments et complète les semaines sans activité"""
+        from datetime import timedelta
+        from django.utils import timezone
+        from .activite_notes import serie_activite
+        from .compteurs import lire_compteurs
+        classe, matiere = self.creer_classe_notee(["12", "9"])
+        
+        with self.assertNumQueries(1):
+            serie = serie_activite('semaine', classe=classe)
+        self.assertGreaterEqual(len(serie), 52)
+        self.assertEqual(serie[-1]['saisies'], 2)
+        self.assertEqual(sum(p['saisies'] for p in serie), 2)
+        self.assertEqual(serie[1]['periode'] - serie[0]['periode'], timedelta(days=7))
+        
+        autre = Departement.objects.create(nom="Lettres")
+        self.assertEqual(sum(p['saisies'] for p in serie_activite('mois', departement=autre)), 0)
+        self.assertEqual(lire_compteurs(['notes_ajoutees_semaine'])['notes_ajoutees_semaine'], 2)
+
+    def test_endpoint_json(self):
+        """La série est exposée au format JSON"""
+        self.creer_classe_notee(["12"])
+        User.objects.create_user(username='lecteur', password='pass123')
+        self.client.login(username='lecteur', password='pass123')
+        response = self.client.get(reverse('activite_notes'), {'periode': 'mois'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['serie'][-1]['saisies'], 1)
+        self.assertEqual(
+            self.client.get(reverse('activite_notes'), {'periode': 'jour'}).status_code, 400
+        )
+
+
+class SaisieNotesTestCase(DonneesNotesTestCase):
+    """Tests de la saisie des notes d'une classe entière"""
+
+    def setUp(self):
+        super().setUp()
+        from django.core.cache import cache
+        cache.clear()
+        self.client.force_login(self.enseignant.user)
+
+    def creer_cours(self, effectif):
+        """Cours d'une classe de `effectif` étudiants sans note"""
+        self.compteur += 1
+        classe = Classe.objects.create(nom=f"SAISIE-{self.compteur}", niveau="L2", departement=self.departement)
+        matiere = Matiere.objects.create(nom=f"Saisie {self.compteur}", code=f"SAI{self.compteur}", credits=2)
+        cours = Cours.objects.create(
+            matiere=matiere, enseignant=self.enseignant, classe=classe,
+            semestre="S1", annee_scolaire="2023-2024"
+        )
+        etudiants = [
+            Etudiant.objects.create(
+                user=User.objects.create_user(username=f"saisie_{self.compteur}_{i}"),
+                numero_etudiant=f"SA{self.compteur}-{i}", classe=classe, date_naissance=date(2003, 1, 1)
+            )
+            for i in range(effectif)
+        ]
+        return cours, etudiants
+
+    def poster(self, cours, etudiants, valeur='12'):
+        donnees = {'type_evaluation': 'DS', 'date_evaluation': '2023-11-06', 'coefficient': '2'}
+        for etudiant in etudiants:
+            donnees[f'note_{etudiant.pk}'] = valeur
+        return self.client.post(reverse('saisie_notes', args=[cours.pk]), donnees)
+
+    def test_saisie_en_nombre_constant_de_requetes(self):
+        """Le nombre de requêtes ne dépend pas de l'effectif"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        petit, etudiants_petit = self.creer_cours(3)
+        grand, etudiants_grand = self.creer_cours(30)
+        
+        with CaptureQueriesContext(connection) as petit_contexte:
+            self.poster(petit, etudiants_petit)
+        with CaptureQueriesContext(connection) as grand_contexte:
+            response = self.poster(grand, etudiants_grand)
+        self.assertRedirects(response, f"{reverse('notes_list')}?cours={grand.pk}")
+        self.assertEqual(len(petit_contexte), len(grand_contexte))
+        
+        self.assertEqual(Note.objects.filter(cours=grand, coefficient=2).count(), 30)
+        self.assertEqual(grand.agregat_notes.nombre_notes, 30)
+        from .models import Notification
+        self.assertEqual(Notification.objects.filter(type_notification='NEW_GRADE').count(), 33)
+
+    def test_mise_a_jour_et_validation(self):
+        """Une nouvelle saisie met à jour les notes ; une cellule hors barème bloque tout"""
+        cours, etudiants = self.creer_cours(2)
+        self.poster(cours, etudiants)
+        
+        response = self.poster(cours, etudiants, valeur='21')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'comprise entre 0 et 20')
+        self.assertEqual(set(Note.objects.filter(cours=cours).values_list('note', flat=True)), {Decimal('12')})
+        
+        self.poster(cours, etudiants, valeur='15,5')
+        self.assertEqual(Note.objects.filter(cours=cours).count(), 2)
+        self.assertEqual(set(Note.objects.filter(cours=cours).values_list('note', flat=True)), {Decimal('15.5')})
+        
+        response = self.client.get(reverse('saisie_notes', args=[cours.pk]), {
+            'type_evaluation': 'DS', 'date_evaluation': '2023-11-06', 'coefficient': '2'
+        })
+        self.assertContains(response, 'value="15.50"', count=2)
+
+    def test_acces_reserve_a_l_enseignant_du_cours(self):
+        """Un étudiant ou un autre enseignant ne peut ni afficher ni enregistrer la saisie"""
+        cours, etudiants = self.creer_cours(2)
+        autre = Enseignant.objects.create(
+            user=User.objects.create_user(username='autre_prof'), departement=self.departement,
+            date_embauche=date(2021, 9, 1)
+        )
+        for utilisateur in (etudiants[0].user, autre.user):
+            self.client.force_login(utilisateur)
+            response = self.client.get(reverse('saisie_notes', args=[cours.pk]))
+            self.assertRedirects(response, reverse('notes_list'), fetch_redirect_response=False)
+            response = self.poster(cours, etudiants)
+            self.assertRedirects(response, reverse('notes_list'), fetch_redirect_response=False)
+        self.assertFalse(Note.objects.filter(cours=cours).exists())
+
+
+class ImportNotesTestCase(DonneesNotesTestCase):
+    """Tests de l'import de notes CSV / XLSX"""
+
+    def setUp(self):
+        super().setUp()
+        from django.core.cache import cache
+        cache.clear()
+        self.classe, self.matiere = self.creer_classe_notee(["10"])
+        self.etudiant = Etudiant.objects.get(classe=self.classe)
+
+    def fichier_csv(self, lignes, separateur=';'):
+        from io import BytesIO
+        entetes = ['numero_etudiant', 'code_matiere', 'type_evaluation', 'note', 'date_evaluation']
+        contenu = '\n'.join(separateur.join(ligne) for ligne in [entetes] + lignes)
+        return BytesIO(contenu.encode('utf-8'))
+
+    def test_import_csv_par_lots(self):
+        """Les lignes valides sont insérées par lots et les agrégats mis à jour"""
+        from .import_notes import importer_notes
+        numero, code = self.etudiant.numero_etudiant, self.matiere.code
+        lignes = [[numero, code, 'CC', f'{i % 20},5', '06/11/2023'] for i in range(25)]
+        etapes = []
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            rapport = importer_notes(self.fichier_csv(lignes), taille_lot=10, progression=etapes.append)
+        self.assertEqual(rapport['importees'], 25)
+        self.assertEqual(etapes, [10, 20, 25])
+        importees = Note.objects.filter(type_evaluation='CC')
+        self.assertEqual(importees.count(), 25)
+        self.assertEqual(self.classe.cours_set.get().agregat_notes.nombre_notes, 26)
+        # Historique : une création par note importée, identifiants rendus par bulk_create
+        self.assertEqual(
+            set(HistoriqueNote.objects.filter(action='C').values_list('identifiant_note', flat=True)),
+            set(importees.values_list('pk', flat=True)),
+        )
+
+    def test_erreurs_par_ligne_et_simulation(self):
+        """Une ligne invalide annule tout l'import ; la simulation n'écrit rien"""
+        from .import_notes import importer_notes
+        numero, code = self.etudiant.numero_etudiant, self.matiere.code
+        lignes = [
+            [numero, code, 'DS', '12', '2023-11-06'],
+            ['INCONNU', code, 'DS', '12', '2023-11-06'],
+            [numero, code, 'DS', '25', '2023-11-06'],
+        ]
+        rapport = importer_notes(self.fichier_csv(lignes, separateur=','))
+        self.assertEqual(rapport['nombre_erreurs'], 2)
+        self.assertEqual([numero for numero, _ in rapport['erreurs']], [3, 4])
+        self.assertEqual(Note.objects.count(), 1)
+        
+        rapport = importer_notes(self.fichier_csv(lignes[:1]), simulation=True)
+        self.assertEqual((rapport['importees'], rapport['nombre_erreurs']), (1, 0))
+        self.assertEqual(Note.objects.count(), 1)
+
+    def test_import_xlsx_par_la_vue(self):
+        """Un classeur XLSX est importé depuis la page d'import"""
+        from io import BytesIO
+        from openpyxl import Workbook
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        classeur = Workbook()
+        feuille = classeur.active
+        feuille.append(['Numero etudiant', 'Code matiere', 'Type evaluation', 'Note', 'Date evaluation'])
+        feuille.append([self.etudiant.numero_etudiant, self.matiere.code, 'Examen Final', 14.25, date(2024, 1, 15)])
+        tampon = BytesIO()
+        classeur.save(tampon)
+        
+        User.objects.create_superuser(username='admin_import', password='admin123')
+        self.client.login(username='admin_import', password='admin123')
+        response = self.client.post(reverse('import_notes'), {
+            'fichier': SimpleUploadedFile('notes.xlsx', tampon.getvalue()),
+        })
+        self.assertRedirects(response, reverse('notes_list'))
+        note = Note.objects.get(type_evaluation='EXAMEN')
+        self.assertEqual(note.note, Decimal('14.25'))
+        self.assertEqual(note.date_evaluation, date(2024, 1, 15))
+
+
+class ExportNotesTestCase(DonneesNotesTestCase):
+    """Tests de l'export CSV des notes"""
+
+    def setUp(self):
+        super().setUp()
+        self.classe, self.matiere = self.creer_classe_notee(["12.5", "8"])
+        self.autre_classe, _ = self.creer_classe_notee(["15"])
+        User.objects.create_user(username='lecteur', password='lecteur123')
+        self.client.login(username='lecteur', password='lecteur123')
+
+    def lire_export(self, **filtres):
+        import csv
+        response = self.client.get(reverse('export_notes'), filtres)
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment;', response['Content-Disposition'])
+        contenu = b''.join(response.streaming_content).decode('utf-8-sig')
+        return list(csv.reader(contenu.splitlines(), delimiter=';'))
+
+    def test_export_filtre_par_cours(self):
+        """L'export reprend les filtres de la liste et commence par les en-têtes"""
+        cours = self.classe.cours_set.get()
+        lignes = self.lire_export(cours=cours.pk)
+        self.assertEqual(lignes[0][:5], ['numero_etudiant', 'code_matiere', 'type_evaluation', 'note', 'date_evaluation'])
+        self.assertEqual(sorted(ligne[3] for ligne in lignes[1:]), ['12.50', '8.00'])
+        self.assertTrue(all(ligne[1] == self.matiere.code for ligne in lignes[1:]))
+        
+        etudiant = Etudiant.objects.get(classe=self.autre_classe)
+        lignes = self.lire_export(etudiant=etudiant.pk)
+        self.assertEqual(len(lignes), 2)
+        self.assertEqual(lignes[1][0], etudiant.numero_etudiant)
+        self.assertEqual(len(self.lire_export()), 4)
+
+    def test_export_reimportable(self):
+        """Le fichier exporté est relu par l'import de notes"""
+        from io import BytesIO
+        from .import_notes import importer_notes
+        response = self.client.get(reverse('export_notes'), {'cours': self.classe.cours_set.get().pk})
+        rapport = importer_notes(BytesIO(b''.join(response.streaming_content)), simulation=True)
+        self.assertEqual((rapport['importees'], rapport['nombre_erreurs']), (2, 0))
+
+
+class AutocompletionTestCase(DonneesNotesTestCase):
+    """Tests de l'autocomplétion des filtres de la liste des notes"""
+
+    def setUp(self):
+        super().setUp()
+        self.classe, self.matiere = self.creer_classe_notee(["12", "8", "15"])
+        etudiant = Etudiant.objects.get(numero_etudiant="ET1-0")
+        etudiant.user.first_name, etudiant.user.last_name = "Awa", "Diallo"
+        etudiant.user.save()
+        User.objects.create_user(username='lecteur', password='lecteur123')
+        self.client.login(username='lecteur', password='lecteur123')
+
+    def test_recherche_par_prefixe(self):
+        """Les étudiants et les cours sont trouvés par le début de leurs libellés"""
+        response = self.client.get(reverse('autocompletion_etudiants'), {'q': 'dia'})
+        self.assertEqual(response.json()['resultats'], [
+            {'id': Etudiant.objects.get(numero_etudiant="ET1-0").pk, 'libelle': 'Awa Diallo (ET1-0)'}
+        ])
+        response = self.client.get(reverse('autocompletion_etudiants'), {'q': 'et1-'})
+        self.assertEqual(len(response.json()['resultats']), 3)
+        self.assertEqual(self.client.get(reverse('autocompletion_etudiants'), {'q': 'llo'}).json()['resultats'], [])
+
+        cours = self.classe.cours_set.get()
+        for terme in ('mat1', 'Matière', 'CLASSE-1'):
+            response = self.client.get(reverse('autocompletion_cours'), {'q': terme})
+            self.assertEqual([r['id'] for r in response.json()['resultats']], [cours.pk])
+
+    def test_resultats_limites(self):
+        """Le nombre de résultats est borné"""
+        response = self.client.get(reverse('autocompletion_etudiants'), {'q': '', 'limite': 2})
+        self.assertEqual(len(response.json()['resultats']), 2)
+        response = self.client.get(reverse('autocompletion_etudiants'), {'limite': 'tout'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_liste_independante_des_effectifs(self):
+        """La liste des notes ne charge plus tous les étudiants et tous les cours"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        etudiant = Etudiant.objects.get(numero_etudiant="ET1-0")
+
+        def requetes():
+            with CaptureQueriesContext(connection) as contexte:
+                response = self.client.get(reverse('notes_list'), {'etudiant': etudiant.pk})
+            self.assertContains(response, 'value="Awa Diallo (ET1-0)"')
+            return len(contexte)
+
+        avant = requetes()
+        for _ in range(3):
+            self.creer_classe_notee(["10", "11", "9"])
+        self.assertEqual(requetes(), avant)
+        with CaptureQueriesContext(connection) as contexte:
+            self.client.get(reverse('notes_list'))
+        self.assertEqual(len(contexte), avant - 1)
+
+
+class BulletinsTestCase(DonneesNotesTestCase):
+    """Tests de la génération des bulletins"""
+
+    def setUp(self):
+        super().setUp()
+        from django.core.cache import cache
+        import tempfile
+        cache.clear()
+        self.classe, self.matiere = self.creer_classe_notee(["8", "16.5"])
+        Note.objects.filter(note=Decimal("16.5")).update(commentaire="Excellent travail")
+        self.racine = tempfile.mkdtemp()
+        self.addCleanup(__import__('shutil').rmtree, self.racine)
+
+    def test_donnees_bulletins(self):
+        """Moyennes, rangs, crédits et commentaires sont calculés en quelques requêtes"""
+        from .bulletins import donnees_bulletins
+        with self.assertNumQueries(8):
+            bulletins = donnees_bulletins(self.classe, 'S1', '2023-2024')
+        par_numero = {bulletin['numero_etudiant']: bulletin for bulletin in bulletins}
+        
+        premier = par_numero['ET1-1']
+        self.assertEqual((premier['moyenne'], premier['rang'], premier['mention']), (Decimal('16.50'), 1, 'Très bien'))
+        self.assertEqual((premier['credits_obtenus'], premier['credits_tentes']), (3, 3))
+        self.assertEqual(premier['lignes'][0]['commentaire'], 'Excellent travail')
+        self.assertEqual(premier['lignes'][0]['moyenne_classe'], Decimal('12.25'))
+        
+        second = par_numero['ET1-0']
+        self.assertEqual((second['rang'], second['mention'], second['credits_obtenus']), (2, 'Insuffisant', 0))
+
+    def test_generation_parallele(self):
+        """Les bulletins sont rendus par plusieurs processus et la progression est signalée"""
+        from pathlib import Path
+        from .bulletins import generer_bulletins
+        etapes = []
+        fichiers = generer_bulletins(
+            [self.classe], 'S1', '2023-2024', processus=2, taille_lot=1,
+            racine=self.racine, progression=lambda termines, prevus: etapes.append((termines, prevus)),
+        )
+        self.assertEqual(len(fichiers), 2)
+        self.assertEqual(etapes, [(1, 2), (2, 2)])
+        contenu = Path(self.racine, 'bulletins', '2023-2024', 'S1', f'{self.classe.pk}-classe-1', 'ET1-1.html').read_text(encoding='utf-8')
+        self.assertIn('16,50/20', contenu)
+        self.assertIn('Excellent travail', contenu)
+
+    def test_commande(self):
+        """La commande génère les bulletins des classes demandées"""
+        from io import StringIO
+        from django.core.management import call_command
+        sortie = StringIO()
+        with self.settings(MEDIA_ROOT=self.racine):
+            call_command('generer_bulletins', 'S1', '2023-2024', '--classe', self.classe.nom,
+                         '--processus', '1', stdout=sortie)
+        self.assertIn('2 fichier(s) écrit(s)', sortie.getvalue())
+
+    def test_commande_classes_homonymes(self):
+        """Un nom porté par plusieurs classes est refusé ; l'identifiant désigne une seule classe"""
+        from io import StringIO
+        from pathlib import Path
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        Classe.objects.create(nom=self.classe.nom, niveau='L2', departement=self.departement)
+        with self.settings(MEDIA_ROOT=self.racine):
+            with self.assertRaisesMessage(CommandError, '--classe-id'):
+                call_command('generer_bulletins', 'S1', '2023-2024', '--classe', self.classe.nom)
+            call_command('generer_bulletins', 'S1', '2023-2024', '--classe-id', str(self.classe.pk),
+                         '--processus', '1', stdout=StringIO())
+        semestre = Path(self.racine, 'bulletins', '2023-2024', 'S1')
+        self.assertEqual([dossier.name for dossier in semestre.iterdir()], [f'{self.classe.pk}-classe-1'])
+
+    def test_action_admin_en_arriere_plan(self):
+        """L'action d'administration lance la commande dans un processus détaché sans attendre"""
+        from unittest import mock
+        User.objects.create_superuser(username='admin_bulletins', password='admin123')
+        self.client.login(username='admin_bulletins', password='admin123')
+        with self.settings(MEDIA_ROOT=self.racine), mock.patch('core.bulletins.subprocess.Popen') as lancer:
+            response = self.client.post(reverse('admin:core_classe_changelist'), {
+                'action': 'generer_bulletins', '_selected_action': [self.classe.pk],
+            }, follow=True)
+        self.assertContains(response, 'lancée pour 1 classe(s)')
+        commande = lancer.call_args.args[0]
+        self.assertEqual(commande[2:], ['generer_bulletins', 'S1', '2023-2024', '--classe-id', str(self.classe.pk)])
+        self.assertTrue(lancer.call_args.kwargs['start_new_session'])
+
+
+class DeliberationsTestCase(DonneesNotesTestCase):
+    """Tests du moteur de délibération"""
+
+    def setUp(self):
+        super().setUp()
+        self.classe, matiere = self.creer_classe_notee([])
+        autre_matiere = Matiere.objects.create(nom="Algorithmique", code="ALGO", credits=3)
+        self.cours = [
+            Cours.objects.get(classe=self.classe),
+            Cours.objects.create(matiere=autre_matiere, enseignant=self.enseignant, classe=self.classe,
+                                 semestre="S1", annee_scolaire="2023-2024"),
+        ]
+        self.etudiants = {}
+        for nom, valeurs in [('A', ['12', '14']), ('B', ['8', '14']), ('C', ['6', '15']), ('D', ['12', None])]:
+            user = User.objects.create_user(username=f"delib_{nom}")
+            etudiant = Etudiant.objects.create(user=user, numero_etudiant=f"DL-{nom}", classe=self.classe,
+                                               date_naissance=date(2003, 1, 1))
+            self.etudiants[nom] = etudiant
+            for cours, valeur in zip(self.cours, valeurs):
+                if valeur is not None:
+                    Note.objects.create(etudiant=etudiant, cours=cours, type_evaluation="EXAMEN",
+                                        note=Decimal(valeur), date_evaluation=date(2024, 1, 10))
+
+    def decisions(self, **kwargs):
+        from .deliberations import deliberer
+        return {d.etudiant_id: d for d in deliberer([self.classe], 'S1', '2023-2024', **kwargs)}
+
+    def test_regles(self):
+        """Validation, compensation, note éliminatoire et semestre incomplet"""
+        decisions = self.decisions()
+        attendu = {
+            'A': ('ADMIS', Decimal('13.00'), 6),
+            'B': ('COMPENSATION', Decimal('11.00'), 6),
+            'C': ('AJOURNE', Decimal('10.50'), 3),
+            'D': ('INCOMPLET', Decimal('12.00'), 3),
+        }
+        for nom, (decision, moyenne, credits) in attendu.items():
+            resultat = decisions[self.etudiants[nom].pk]
+            self.assertEqual((resultat.decision, resultat.moyenne, resultat.credits_obtenus),
+                             (decision, moyenne, credits), nom)
+            self.assertEqual(resultat.credits_totaux, 6)
+        self.assertIn('note éliminatoire', decisions[self.etudiants['C'].pk].explication)
+        self.assertIn('ALGO Algorithmique : aucune note', decisions[self.etudiants['D'].pk].explication)
+
+    def test_enregistrement_et_nouvelle_deliberation(self):
+        """Une nouvelle délibération remplace les décisions précédentes"""
+        from .deliberations import REGLES_DEFAUT
+        self.decisions()
+        self.decisions(regles=dict(REGLES_DEFAUT, compensation=False))
+        self.assertEqual(DecisionSemestre.objects.count(), 4)
+        decision = DecisionSemestre.objects.get(etudiant=self.etudiants['B'])
+        self.assertEqual((decision.decision, decision.credits_obtenus), ('AJOURNE', 3))
+        self.assertIn('compensation désactivée', decision.explication)
+
+    def test_seuil_par_matiere(self):
+        """Le seuil de validation est propre à chaque matière"""
+        Matiere.objects.filter(code='ALGO').update(note_validation=Decimal('14.5'))
+        decision = self.decisions(enregistrer=False)[self.etudiants['A'].pk]
+        self.assertEqual(decision.decision, 'COMPENSATION')
+        self.assertFalse(DecisionSemestre.objects.exists())
+
+    def test_commande_classes_homonymes(self):
+        """La commande refuse un nom de classe ambigu et délibère la classe désignée par son identifiant"""
+        from io import StringIO
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        homonyme = Classe.objects.create(nom=self.classe.nom, niveau='L2', departement=self.departement)
+        Etudiant.objects.create(user=User.objects.create_user(username='delib_homonyme'), numero_etudiant='DL-H',
+                                classe=homonyme, date_naissance=date(2003, 1, 1))
+        with self.assertRaisesMessage(CommandError, '--classe-id'):
+            call_command('deliberer', 'S1', '2023-2024', '--classe', self.classe.nom, stdout=StringIO())
+        self.assertFalse(DecisionSemestre.objects.exists())
+        call_command('deliberer', 'S1', '2023-2024', '--classe-id', str(self.classe.pk), stdout=StringIO())
+        self.assertEqual(set(DecisionSemestre.objects.values_list('etudiant__classe', flat=True)), {self.classe.pk})
+
+
+class HistoriqueNotesTestCase(DonneesNotesTestCase):
+    """Tests de l'historique des notes"""
+
+    def setUp(self):
+        super().setUp()
+        # Les créations sont journalisées ici pour que chaque test parte d'un historique écrit
+        with self.captureOnCommitCallbacks(execute=True):
+            self.classe, self.matiere = self.creer_classe_notee(["10", "12"])
+        self.note, self.autre = Note.objects.order_by('pk')
+        self.admin = User.objects.create_superuser(username='admin_hist', password='admin123')
+
+    def test_modification_et_suppression_par_les_vues(self):
+        """Ancienne valeur, nouvelle valeur et auteur sont enregistrés ; l'entrée survit à la suppression"""
+        self.client.login(username='admin_hist', password='admin123')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('modifier_note', args=[self.note.pk]), {
+                'etudiant': self.note.etudiant_id, 'cours': self.note.cours_id, 'type_evaluation': 'DS',
+                'note': '14.5', 'coefficient': '1', 'date_evaluation': '2023-10-15', 'commentaire': '',
+            })
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('supprimer_note', args=[self.note.pk]))
+        
+        creation, modification, suppression = HistoriqueNote.objects.filter(identifiant_note=self.note.pk).order_by('id')
+        self.assertEqual((creation.action, creation.nouvelle_valeur), ('C', Decimal('10.00')))
+        self.assertEqual((modification.action, modification.ancienne_valeur, modification.nouvelle_valeur),
+                         ('M', Decimal('10.00'), Decimal('14.50')))
+        self.assertEqual(modification.auteur, self.admin)
+        self.assertEqual((suppression.action, suppression.ancienne_valeur, suppression.nouvelle_valeur),
+                         ('S', Decimal('14.50'), None))
+
+    def test_ecritures_groupees_au_commit(self):
+        """Les changements d'une transaction sont écrits par un seul bulk_create au commit"""
+        from django.db import transaction
+        with self.captureOnCommitCallbacks() as rappels:
+            with transaction.atomic():
+                for valeur in ['11', '13']:
+                    self.note.note = Decimal(valeur)
+                    self.note.save()
+                Note.objects.filter(pk=self.autre.pk).update(note=Decimal('9'))
+                self.autre.refresh_from_db()
+                self.autre.note = Decimal('8')
+                Note.objects.bulk_update([self.autre], ['note'])
+            self.assertEqual(HistoriqueNote.objects.count(), 2)
+        from .historique_notes import _Part
+        parts = [rappel for rappel in rappels if isinstance(rappel, _Part)]
+        self.assertEqual(len({part.lot for part in parts}), 1)
+        with self.assertNumQueries(1):
+            for part in parts:
+                part()
+        valeurs = list(HistoriqueNote.objects.filter(action='M').order_by('id').values_list(
+            'identifiant_note', 'ancienne_valeur', 'nouvelle_valeur'
+        ))
+        self.assertEqual(valeurs, [
+            (self.note.pk, Decimal('10'), Decimal('11')),
+            (self.note.pk, Decimal('11'), Decimal('13')),
+            (self.autre.pk, Decimal('12'), Decimal('9')),
+            (self.autre.pk, Decimal('9'), Decimal('8')),
+        ])
+
+    def test_point_de_sauvegarde_annule(self):
+        """Les changements annulés avec leur point de sauvegarde ne sont pas journalisés"""
+        from django.db import transaction
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.note.note = Decimal('11')
+                self.note.save()
+                try:
+                    with transaction.atomic():
+                        self.autre.note = Decimal('3')
+                        self.autre.save()
+                        raise ValueError
+                except ValueError:
+                    pass
+        self.assertEqual(list(HistoriqueNote.objects.filter(action='M').values_list('identifiant_note', flat=True)),
+                         [self.note.pk])
+
+    def test_import_et_historique_en_ajout_seul(self):
+        """Les notes importées sont journalisées ; une entrée ne peut être ni modifiée ni supprimée"""
+        from io import BytesIO
+        from .import_notes import importer_notes
+        etudiant = self.note.etudiant
+        contenu = f"numero_etudiant;code_matiere;type_evaluation;note;date_evaluation\n" \
+                  f"{etudiant.numero_etudiant};{self.matiere.code};CC;15;2023-11-06\n"
+        with self.captureOnCommitCallbacks(execute=True):
+            importer_notes(BytesIO(contenu.encode('utf-8')))
+        entree = HistoriqueNote.objects.get(action='C', identifiant_note=Note.objects.get(type_evaluation='CC').pk)
+        self.assertEqual(entree.nouvelle_valeur, Decimal('15'))
+        with self.assertRaises(ValueError):
+            entree.save()
+        with self.assertRaises(ValueError):
+            entree.delete()
+        with self.assertRaises(ValueError):
+            HistoriqueNote.objects.filter(pk=entree.pk).update(nouvelle_valeur=Decimal('20'))
+        with self.assertRaises(ValueError):
+            HistoriqueNote.objects.all().delete()
+        self.assertEqual(HistoriqueNote.objects.get(pk=entree.pk).nouvelle_valeur, Decimal('15'))
+
+    def test_modification_en_masse_par_paquets(self):
+        """update() traite les notes par paquets d'identifiants et journalise chacune"""
+        from unittest import mock
+        from django.db.models import F
+        from . import models
+        with mock.patch.object(models, 'TAILLE_PAQUET', 1), self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(Note.objects.update(note=F('note') + 1), 2)
+        self.assertEqual(list(HistoriqueNote.objects.filter(action='M').order_by('identifiant_note').values_list(
+            'identifiant_note', 'ancienne_valeur', 'nouvelle_valeur'
+        )), [(self.note.pk, Decimal('10'), Decimal('11')), (self.autre.pk, Decimal('12'), Decimal('13'))])
+
+
+class AnomaliesNotesTestCase(DonneesNotesTestCase):
+    """Tests de la détection des notes suspectes"""
+
+    def setUp(self):
+        super().setUp()
+        self.classe, _ = self.creer_classe_notee(["12", "13", "14", "11", "15", "2"])
+        self.cours = self.classe.cours_set.get()
+        self.aberrante = Note.objects.get(note=Decimal("2"))
+        premiere = Note.objects.get(note=Decimal("13"))
+        self.doublon = Note.objects.create(
+            etudiant=premiere.etudiant, cours=self.cours, type_evaluation="DS",
+            note=Decimal("13"), date_evaluation=premiere.date_evaluation
+        )
+        self.premiere = premiere
+
+    def test_scores_robustes(self):
+        """Le score z robuste n'est pas entraîné par la valeur aberrante"""
+        import numpy as np
+        from .anomalies_notes import scores_robustes
+        scores = scores_robustes(np.array([12, 13, 14, 11, 15, 2], dtype=float))
+        self.assertAlmostEqual(scores[-1], 0.6745 * -10.5 / 1.5)
+        self.assertTrue((np.abs(scores[:-1]) < 3.5).all())
+
+    def test_detection_et_notification(self):
+        """Valeurs aberrantes et doublons sont relevés et l'enseignant est notifié une fois"""
+        from .anomalies_notes import detecter_anomalies
+        from .models import Notification
+        rapport = detecter_anomalies()
+        self.assertEqual((rapport['ABERRANTE'], rapport['DOUBLON'], rapport['nouvelles']), (1, 1, 2))
+        self.assertEqual(
+            set(AnomalieNote.objects.values_list('note', 'type_anomalie')),
+            {(self.aberrante.pk, 'ABERRANTE'), (self.doublon.pk, 'DOUBLON')},
+        )
+        self.assertIn(str(self.premiere.pk), AnomalieNote.objects.get(type_anomalie='DOUBLON').detail)
+        notification = Notification.objects.get(utilisateur=self.enseignant.user)
+        self.assertIn('MAT1 CLASSE-1 : 2', notification.message)
+
+        # Nouvelle passe : rien de nouveau, pas de nouvelle notification
+        rapport = detecter_anomalies()
+        self.assertEqual((rapport['nouvelles'], rapport['notifications']), (0, 0))
+        self.assertEqual(Notification.objects.count(), 1)
+
+    def test_anomalies_resolues(self):
+        """Une note corrigée sort de la table ; une anomalie examinée n'est plus signalée"""
+        from .anomalies_notes import detecter_anomalies
+        detecter_anomalies()
+        AnomalieNote.objects.filter(type_anomalie='DOUBLON').update(statut='IGNOREE')
+        Note.objects.filter(pk=self.aberrante.pk).update(note=Decimal("12"))
+        rapport = detecter_anomalies()
+        self.assertEqual((rapport['nouvelles'], rapport['resolues']), (0, 1))
+        self.assertEqual(list(AnomalieNote.objects.values_list('type_anomalie', 'statut')), [('DOUBLON', 'IGNOREE')])
+
+    def test_simulation(self):
+        """En simulation, rien n'est enregistré"""
+        from io import StringIO
+        from django.core.management import call_command
+        sortie = StringIO()
+        call_command('detecter_anomalies_notes', '--simulation', stdout=sortie)
+        self.assertIn('2 nouvelle(s) anomalie(s)', sortie.getvalue())
+        self.assertFalse(AnomalieNote.objects.exists())
+
+
+class RelevesTestCase(DonneesNotesTestCase):
+    """Tests des relevés de notes en cache"""
+
+    def setUp(self):
+        super().setUp()
+        from django.core.cache import cache
+        cache.clear()
+        self.classe, _ = self.creer_classe_notee(["12", "8"])
+        self.etudiant, self.autre = Etudiant.objects.filter(classe=self.classe).order_by('numero_etudiant')
+        self.cours = self.classe.cours_set.get()
+        # Second cours (5 crédits), au second semestre
+        matiere = Matiere.objects.create(nom="Physique", code="PHY", credits=5)
+        self.cours2 = Cours.objects.create(
+            matiere=matiere, enseignant=self.enseignant, classe=self.classe,
+            semestre="S2", annee_scolaire="2023-2024"
+        )
+        Note.objects.create(
+            etudiant=self.etudiant, cours=self.cours, type_evaluation="EXAMEN", note=Decimal("18"),
+            coefficient=Decimal("3"), date_evaluation=date(2023, 12, 15), commentaire="Très bien"
+        )
+        Note.objects.create(
+            etudiant=self.etudiant, cours=self.cours2, type_evaluation="DS", note=Decimal("9"),
+            date_evaluation=date(2024, 3, 10)
+        )
+
+    def test_contenu_du_releve(self):
+        """Moyennes par cours, par semestre et générale, identiques à celles de core.moyennes"""
+        from .moyennes import moyenne_etudiant, moyennes_ponderees
+        from .releves import releve_etudiant
+        releve = releve_etudiant(self.etudiant)
+        par_cours = {ligne['cours_id']: ligne for ligne in releve['cours']}
+        self.assertEqual(
+            {pk: ligne['moyenne'] for pk, ligne in par_cours.items()},
+            moyennes_ponderees(par=('cours',), etudiant=self.etudiant),
+        )
+        self.assertEqual(par_cours[self.cours.pk]['moyenne'], Decimal("16.50"))
+        self.assertEqual(par_cours[self.cours.pk]['commentaire'], "Très bien")
+        self.assertEqual(releve['moyenne_generale'], moyenne_etudiant(self.etudiant))
+        self.assertEqual((releve['credits_obtenus'], releve['credits_tentes']), (3, 8))
+        self.assertEqual(
+            [(s['semestre'], s['moyenne']) for s in releve['semestres']],
+            [("S1", Decimal("16.50")), ("S2", Decimal("9.00"))],
+        )
+        self.assertEqual(releve['nombre_notes'], 3)
+
+    def test_cache_et_invalidation(self):
+        """Le relevé est servi par le cache et recalculé quand une note de l'étudiant change"""
+        from .releves import releve_etudiant
+        releve_etudiant(self.etudiant)
+        releve_etudiant(self.autre)
+        with self.assertNumQueries(0):
+            releve_etudiant(self.etudiant)
+
+        Note.objects.filter(etudiant=self.etudiant, cours=self.cours2).update(note=Decimal("15"))
+        self.assertEqual(releve_etudiant(self.etudiant)['semestres'][1]['moyenne'], Decimal("15.00"))
+        with self.assertNumQueries(0):
+            # Le relevé d'un autre étudiant reste en cache
+            releve_etudiant(self.autre)
+
+        Note.objects.create(
+            etudiant=self.autre, cours=self.cours2, type_evaluation="DS", note=Decimal("11"),
+            date_evaluation=date(2024, 3, 10)
+        )
+        self.assertEqual(releve_etudiant(self.autre)['nombre_notes'], 2)
+
+    def test_fiche_etudiant_independante_du_nombre_de_notes(self):
+        """La fiche étudiant est rendue depuis le relevé, sans requête par note ni par cours"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        User.objects.create_user(username='lecteur', password='lecteur123')
+        self.client.login(username='lecteur', password='lecteur123')
+        url = reverse('etudiant_detail', args=[self.etudiant.pk])
+
+        def requetes():
+            self.client.get(url)
+            with CaptureQueriesContext(connection) as contexte:
+                response = self.client.get(url)
+            self.assertContains(response, "Physique")
+            return len(contexte)
+
+        avant = requetes()
+        for i in range(5):
+            matiere = Matiere.objects.create(nom=f"Option {i}", code=f"OPT{i}", credits=2)
+            cours = Cours.objects.create(
+                matiere=matiere, enseignant=self.enseignant, classe=self.classe,
+                semestre="S1", annee_scolaire="2023-2024"
+            )
+            Note.objects.create(
+                etudiant=self.etudiant, cours=cours, type_evaluation="CC", note=Decimal("13"),
+                date_evaluation=date(2023, 11, 1)
+            )
+        self.assertEqual(requetes(), avant)
+
+
+class ConflitsHorairesTestCase(DonneesNotesTestCase):
+    """Tests du moteur de conflits de l'emploi du temps"""
+
+    def setUp(self):
+        super().setUp()
+        self.classe, _ = self.creer_classe_notee([])
+        self.autre_classe, _ = self.creer_classe_notee([])
+        self.cours = self.classe.cours_set.get()
+        self.autre_cours = self.autre_classe.cours_set.get()
+        autre_enseignant = Enseignant.objects.create(
+            user=User.objects.create_user(username="prof_autre"), departement=self.departement,
+            date_embauche=date(2021, 9, 1)
+        )
+        Cours.objects.filter(pk=self.autre_cours.pk).update(enseignant=autre_enseignant)
+        Salle.objects.bulk_create([Salle(nom="B12"), Salle(nom="C01"), Salle(nom="C02")])
+
+    def creer(self, cours, jour, debut, fin, salle):
+        return EmploiDuTemps.objects.create(
+            cours=cours, jour=jour, heure_debut=time(*debut), heure_fin=time(*fin), type_cours="CM", salle_id=salle
+        )
+
+    def test_detection(self):
+        """Chaque chevauchement de salle, d'enseignant ou de classe est signalé, une fois"""
+        from .conflits_horaires import charger_creneaux, detecter_conflits
+        a = self.creer(self.cours, "LUNDI", (8, 0), (10, 0), "B12")
+        b = self.creer(self.autre_cours, "LUNDI", (9, 0), (11, 0), "B12")
+        self.creer(self.autre_cours, "LUNDI", (11, 0), (12, 0), "B12")  # contigu : pas de conflit
+        self.creer(self.autre_cours, "MARDI", (9, 0), (11, 0), "B12")
+        c = self.creer(self.cours, "MARDI", (10, 0), (12, 0), "C01")  # autre classe, autre enseignant, autre salle
+        conflits = detecter_conflits(charger_creneaux())
+        self.assertEqual(
+            sorted((conflit.ressource, conflit.premier.ref, conflit.second.ref) for conflit in conflits),
+            [('salle', a.pk, b.pk)],
+        )
+        # Même classe et même enseignant : deux conflits pour la même paire
+        d = self.creer(self.cours, "MARDI", (11, 0), (13, 0), "C02")
+        conflits = detecter_conflits(charger_creneaux("S1", "2023-2024"))
+        self.assertEqual(
+            sorted((conflit.ressource, conflit.premier.ref, conflit.second.ref) for conflit in conflits),
+            [('classe', c.pk, d.pk), ('enseignant', c.pk, d.pk), ('salle', a.pk, b.pk)],
+        )
+        # Une autre période n'entre pas en conflit
+        self.assertEqual(charger_creneaux("S2"), [])
+
+    def test_vue_ajout(self):
+        """La vue d'ajout refuse un créneau en conflit et décrit l'occupant"""
+        self.creer(self.cours, "LUNDI", (8, 0), (10, 0), "B12")
+        User.objects.create_superuser(username='admin_edt', password='admin123')
+        self.client.login(username='admin_edt', password='admin123')
+        donnees = {
+            'cours': self.autre_cours.pk, 'jour': 'LUNDI', 'heure_debut': '09:00',
+            'heure_fin': '10:30', 'type_cours': 'TD', 'salle': 'B12',
+        }
+        response = self.client.post(reverse('ajouter_emploi_du_temps'), donnees)
+        self.assertContains(response, 'Salle B12 déjà occupée le lundi : MAT1 CLASSE-1 (08:00-10:00)')
+        self.assertEqual(EmploiDuTemps.objects.count(), 1)
+
+        response = self.client.post(reverse('ajouter_emploi_du_temps'), dict(donnees, heure_debut='10:00'))
+        self.assertRedirects(response, reverse('emploi_du_temps_list'))
+        self.assertEqual(EmploiDuTemps.objects.count(), 2)
+
+    def test_commande(self):
+        """La commande liste les conflits et échoue s'il y en a"""
+        from io import StringIO
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        sortie = StringIO()
+        call_command('verifier_emploi_du_temps', stdout=sortie)
+        self.assertIn('Aucun conflit', sortie.getvalue())
+
+        self.creer(self.cours, "JEUDI", (8, 0), (10, 0), "B12")
+        self.creer(self.autre_cours, "JEUDI", (9, 0), (10, 0), "B12")
+        with self.assertRaisesMessage(CommandError, '1 conflit(s)'):
+            call_command('verifier_emploi_du_temps', '--semestre', 'S1', stdout=sortie)
+        self.assertIn('Jeudi, salle B12 : MAT1 CLASSE-1 (08:00-10:00) / MAT2 CLASSE-2 (09:00-10:00)', sortie.getvalue())
+
+
+class PlanificationTestCase(DonneesNotesTestCase):
+    """Tests du générateur d'emploi du temps"""
+
+    def seance(self, cours_id, enseignant_id, classe_id, type_cours='CM'):
+        from .planification import Seance
+        return Seance(cours_id, enseignant_id, classe_id, type_cours, 'S1', '2023-2024', f'C{cours_id}')
+
+    def test_planifier_sans_conflit(self):
+        """Toutes les séances sont placées sans conflit, un cours au plus par jour quand c'est possible"""
+        from .conflits_horaires import detecter_conflits
+        from .planification import creneaux_planning, grille, planifier
+        seances = [
+            self.seance(classe * 10 + matiere, matiere % 2, classe, type_cours)
+            for classe in range(3) for matiere in range(2) for type_cours in ('CM', 'TD')
+        ]
+        planning = planifier(seances, grille(['LUNDI', 'MARDI'], [time(8, 0), time(9, 30), time(11, 0)]), ['a1', 'A2'])
+        self.assertEqual(planning.non_placees, [])
+        self.assertEqual(len(planning.affectations), 12)
+        self.assertEqual(detecter_conflits(creneaux_planning(planning)), [])
+        self.assertEqual({salle for _, _, salle in planning.affectations}, {'A1', 'A2'})
+        jours = {}
+        for seance, plage, _ in planning.affectations:
+            jours.setdefault(seance.cours_id, set()).add(plage.jour)
+        self.assertTrue(all(len(j) == 2 for j in jours.values()))
+
+    def test_planifier_sans_solution(self):
+        """Sans solution complète, la recherche s'arrête et rend le meilleur placement partiel"""
+        from .planification import grille, planifier
+        seances = [self.seance(i, i, 1) for i in range(3)]
+        planning = planifier(seances, grille(['LUNDI'], [time(8, 0), time(9, 30)]), ['A1', 'A2'], budget=5)
+        self.assertEqual(len(planning.affectations), 2)
+        self.assertEqual(len(planning.non_placees), 1)
+        self.assertEqual(planning.essais, 1)
+
+    def test_salles_selon_capacite(self):
+        """Chaque classe prend la plus petite salle libre assez grande"""
+        from .planification import grille, planifier
+        planning = planifier(
+            [self.seance(1, 1, 1), self.seance(2, 2, 2), self.seance(3, 3, 3)], grille(['LUNDI'], [time(8, 0)]),
+            ['A', 'B', 'C'], capacites={'A': 10, 'B': 50, 'C': 30}, effectifs={1: 25, 2: 8, 3: 40},
+        )
+        self.assertEqual({seance.classe_id: salle for seance, _, salle in planning.affectations},
+                         {1: 'C', 2: 'A', 3: 'B'})
+
+    def test_plages_qui_se_chevauchent(self):
+        """Des plages qui se chevauchent sont refusées, par la grille, le planificateur et la commande"""
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        from .planification import Plage, grille, planifier
+        with self.assertRaisesMessage(ValueError, 'se chevauchent'):
+            grille(['LUNDI'], [time(8, 0), time(9, 30)], 120)
+        plages = [Plage('LUNDI', time(8, 0), time(10, 0)), Plage('LUNDI', time(9, 30), time(11, 30))]
+        with self.assertRaisesMessage(ValueError, 'se chevauchent'):
+            planifier([self.seance(1, 1, 1), self.seance(2, 2, 1)], plages, ['A', 'B'])
+        self.assertEqual(len(grille(['LUNDI', 'MARDI'], [time(8, 0), time(10, 0)], 120)), 4)
+        with self.assertRaisesMessage(CommandError, 'se chevauchent'):
+            call_command('generer_emploi_du_temps', '--semestre', 'S1', '--annee-scolaire', '2023-2024',
+                         '--debuts', '08:00,09:30', '--duree-seance', '120', '--enregistrer')
+
+    def test_commande(self):
+        """La commande remplace les créneaux des classes planifiées et respecte les autres créneaux"""
+        from io import StringIO
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        classe, _ = self.creer_classe_notee([])
+        autre_classe, _ = self.creer_classe_notee([])
+        cours, autre_cours = classe.cours_set.get(), autre_classe.cours_set.get()
+        Salle.objects.bulk_create([Salle(nom='B12'), Salle(nom='C01')])
+        EmploiDuTemps.objects.create(
+            cours=cours, jour='MARDI', heure_debut=time(8, 0), heure_fin=time(10, 0), type_cours='CM', salle_id='B12'
+        )
+        # Même enseignant : 8 h est indisponible
+        conserve = EmploiDuTemps.objects.create(
+            cours=autre_cours, jour='LUNDI', heure_debut=time(8, 0), heure_fin=time(9, 30), type_cours='CM',
+            salle_id='C01'
+        )
+        arguments = ['--semestre', 'S1', '--annee-scolaire', '2023-2024', '--classe', classe.nom,
+                     '--jours', 'lundi', '--salle', 'B12']
+
+        sortie = StringIO()
+        with self.assertRaisesMessage(CommandError, '1 séance(s) non placée(s)'):
+            call_command('generer_emploi_du_temps', *arguments, '--debuts', '08:00,09:30', stdout=sortie)
+        self.assertIn(f'Non placée: MAT1 {classe.nom}', sortie.getvalue())
+
+        call_command('generer_emploi_du_temps', *arguments, '--debuts', '08:00,09:30,11:00', stdout=sortie)
+        self.assertIn('Simulation', sortie.getvalue())
+        self.assertEqual(EmploiDuTemps.objects.filter(cours=cours, jour='MARDI').count(), 1)
+
+        call_command('generer_emploi_du_temps', *arguments, '--debuts', '08:00,09:30,11:00', '--enregistrer',
+                     stdout=sortie)
+        self.assertEqual(
+            sorted(EmploiDuTemps.objects.filter(cours=cours).values_list('jour', 'heure_debut', 'heure_fin', 'salle')),
+            [('LUNDI', time(9, 30), time(11, 0), 'B12'), ('LUNDI', time(11, 0), time(12, 30), 'B12')],
+        )
+        self.assertTrue(EmploiDuTemps.objects.filter(pk=conserve.pk).exists())
+        call_command('verifier_emploi_du_temps', stdout=sortie)
+
+
+class ImportEmploiDuTempsTestCase(DonneesNotesTestCase):
+    """Tests de l'import de l'emploi du temps"""
+
+    ENTETES = ['code_matiere', 'classe', 'jour', 'heure_debut', 'heure_fin', 'type_cours', 'salle']
+
+    def setUp(self):
+        super().setUp()
+        self.classe, self.matiere = self.creer_classe_notee([])
+        self.autre_classe, self.autre_matiere = self.creer_classe_notee([])
+        self.cours = self.classe.cours_set.get()
+        Salle.objects.bulk_create([Salle(nom=nom) for nom in ('A1', 'A2', 'B12', 'C01')])
+        self.existant = EmploiDuTemps.objects.create(
+            cours=self.autre_classe.cours_set.get(), jour='LUNDI', heure_debut=time(8, 0),
+            heure_fin=time(10, 0), type_cours='CM', salle_id='B12'
+        )
+
+    def fichier_csv(self, lignes):
+        from io import BytesIO
+        contenu = '\n'.join(';'.join(ligne) for ligne in [self.ENTETES] + lignes)
+        return BytesIO(contenu.encode('utf-8'))
+
+    def test_import(self):
+        """Les créneaux valides sont insérés ; les heures et libellés usuels sont acceptés"""
+        from .import_emploi_du_temps import importer_emploi_du_temps
+        lignes = [
+            ['mat1', self.classe.nom.lower(), 'Mardi', '8h', '9h30', 'Cours Magistral', 'A1'],
+            ['MAT1', self.classe.nom, 'MARDI', '09:30', '11:00', 'TD', 'A1'],
+        ]
+        rapport = importer_emploi_du_temps(self.fichier_csv(lignes), simulation=True)
+        self.assertEqual((rapport['importes'], rapport['nombre_erreurs']), (2, 0))
+        self.assertFalse(EmploiDuTemps.objects.filter(cours=self.cours).exists())
+
+        rapport = importer_emploi_du_temps(self.fichier_csv(lignes))
+        self.assertEqual(rapport['importes'], 2)
+        self.assertEqual(
+            sorted(EmploiDuTemps.objects.filter(cours=self.cours).values_list('heure_debut', 'type_cours')),
+            [(time(8, 0), 'CM'), (time(9, 30), 'TD')],
+        )
+
+        # Réimport : les créneaux du fichier entrent en conflit avec eux-mêmes, sauf en remplacement
+        rapport = importer_emploi_du_temps(self.fichier_csv(lignes))
+        self.assertEqual(rapport['nombre_erreurs'], 6)
+        rapport = importer_emploi_du_temps(self.fichier_csv(lignes[:1]), remplacer=True)
+        self.assertEqual((rapport['importes'], rapport['remplaces']), (1, 2))
+        self.assertEqual(EmploiDuTemps.objects.filter(cours=self.cours).count(), 1)
+
+    def test_erreurs_et_conflits(self):
+        """Erreurs par ligne, conflits dans le fichier et avec l'existant ; rien n'est importé"""
+        from .import_emploi_du_temps import importer_emploi_du_temps
+        lignes = [
+            ['MAT1', self.classe.nom, 'LUNDI', '09:00', '10:00', 'TD', 'b12'],
+            ['MAT9', self.classe.nom, 'LUNDI', '10:00', '11:00', 'TD', 'A1'],
+            ['MAT1', self.classe.nom, 'DIMANCHE', '10:00', '11:00', 'TD', 'A1'],
+            ['MAT1', self.classe.nom, 'MARDI', '11:00', '10:00', 'TD', 'A1'],
+            ['MAT1', self.classe.nom, 'MARDI', '10:00', '12:00', 'TD', 'A1'],
+            ['MAT1', self.classe.nom, 'MARDI', '11:30', '12:30', 'TP', 'A2'],
+            ['MAT1', self.classe.nom, 'JEUDI', '08:00', '09:00', 'TD', 'Z99'],
+        ]
+        rapport = importer_emploi_du_temps(self.fichier_csv(lignes))
+        self.assertEqual(rapport['erreurs'], [
+            (2, 'Enseignant déjà en cours le lundi : MAT2 CLASSE-2 (08:00-10:00)'),
+            (2, 'Salle B12 déjà occupée le lundi : MAT2 CLASSE-2 (08:00-10:00)'),
+            (3, "Aucun cours 'MAT9' pour la classe 'CLASSE-1'"),
+            (4, "Jour inconnu : 'DIMANCHE'"),
+            (5, "L'heure de fin doit suivre l'heure de début"),
+            (7, 'Classe déjà en cours le mardi : MAT1 CLASSE-1 (10:00-12:00) (ligne 6)'),
+            (7, 'Enseignant déjà en cours le mardi : MAT1 CLASSE-1 (10:00-12:00) (ligne 6)'),
+            (8, "Salle inconnue : 'Z99'"),
+        ])
+        self.assertEqual(EmploiDuTemps.objects.count(), 1)
+
+    def test_commande_et_vue(self):
+        """La commande et la vue d'import produisent le rapport par ligne"""
+        import tempfile
+        from io import StringIO
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        lignes = [['MAT1', self.classe.nom, 'LUNDI', '09:00', '10:00', 'TD', 'B12']]
+        with tempfile.NamedTemporaryFile(suffix='.csv') as fichier:
+            fichier.write(self.fichier_csv(lignes).getvalue())
+            fichier.flush()
+            # Salle et enseignant déjà occupés
+            with self.assertRaisesMessage(CommandError, '2 erreur(s) sur 1 ligne(s)'):
+                call_command('import_emploi_du_temps', fichier.name, stdout=StringIO())
+
+        User.objects.create_superuser(username='admin_edt', password='admin123')
+        self.client.login(username='admin_edt', password='admin123')
+        lignes = [['MAT1', self.classe.nom, 'MARDI', '09:00', '10:00', 'TD', 'C01']]
+        fichier = SimpleUploadedFile('edt.csv', self.fichier_csv(lignes).getvalue())
+        response = self.client.post(reverse('import_emploi_du_temps'), {'fichier': fichier})
+        self.assertRedirects(response, reverse('emploi_du_temps_list'))
+        self.assertTrue(EmploiDuTemps.objects.filter(cours=self.cours, salle='C01').exists())
+
+
+class CalendriersTestCase(DonneesNotesTestCase):
+    """Tests des abonnements iCalendar"""
+
+    def setUp(self):
+        super().setUp()
+        from django.core.cache import cache
+        cache.clear()
+        self.classe, _ = self.creer_classe_notee([])
+        self.emploi = EmploiDuTemps.objects.create(
+            cours=self.classe.cours_set.get(), jour='MERCREDI', heure_debut=time(8, 0),
+            heure_fin=time(10, 0), type_cours='TD', salle=Salle.objects.create(nom='b12 ')
+        )
+        self.periode = '&semestre=S1&annee_scolaire=2023-2024'
+
+    def test_flux_classe(self):
+        """Un événement hebdomadaire par créneau, du premier au dernier jour du semestre"""
+        from .calendriers import url_abonnement
+        response = self.client.get(url_abonnement('classe', self.classe.pk) + self.periode)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        contenu = response.content.decode()
+        self.assertIn('X-WR-CALNAME:Classe CLASSE-1 - S1 2023-2024\r\n', contenu)
+        # Le 1er septembre 2023 est un vendredi : premier mercredi le 6
+        self.assertIn('DTSTART;TZID=Europe/Paris:20230906T080000\r\n', contenu)
+        self.assertIn('DTEND;TZID=Europe/Paris:20230906T100000\r\n', contenu)
+        self.assertIn('RRULE:FREQ=WEEKLY;UNTIL=20240131T225959Z\r\n', contenu)
+        self.assertIn('SUMMARY:Matière 1 (Travaux Dirigés)\r\n', contenu)
+        self.assertIn('TZOFFSETTO:+0100\r\n', contenu)
+        self.assertEqual(contenu.count('BEGIN:VEVENT'), 1)
+
+        # Les autres ressources et les autres semestres
+        self.assertIn('BEGIN:VEVENT', self.client.get(
+            url_abonnement('enseignant', self.enseignant.pk) + self.periode).content.decode())
+        self.assertIn('LOCATION:B12\r\n', self.client.get(url_abonnement('salle', 'B12') + self.periode).content.decode())
+        response = self.client.get(url_abonnement('classe', self.classe.pk) + '&semestre=S2&annee_scolaire=2023-2024')
+        self.assertNotIn('BEGIN:VEVENT', response.content.decode())
+
+    def test_jeton_et_erreurs(self):
+        """Un jeton invalide, une ressource inconnue ou une période invalide donnent un 404"""
+        from .calendriers import url_abonnement
+        url = url_abonnement('classe', self.classe.pk)
+        self.assertEqual(self.client.get(url[:-1] + self.periode).status_code, 404)
+        self.assertEqual(self.client.get(url.replace(f'/{self.classe.pk}.ics', '/999.ics') + self.periode).status_code, 404)
+        self.assertEqual(self.client.get(url_abonnement('classe', 999) + self.periode).status_code, 404)
+        self.assertEqual(self.client.get(url + '&semestre=S3&annee_scolaire=2023').status_code, 404)
+        self.assertEqual(self.client.get(url_abonnement('cours', 1)).status_code, 404)
+
+    def test_cache_et_etag(self):
+        """Un agenda à jour reçoit un 304 sans requête ; une modification change l'ETag"""
+        from .calendriers import url_abonnement
+        url = url_abonnement('classe', self.classe.pk) + self.periode
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).status_code, 200)
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.emploi.heure_debut = time(9, 0)
+        self.emploi.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('DTSTART;TZID=Europe/Paris:20230906T090000', response.content.decode())
+
+    def test_liens_abonnement(self):
+        """La page de l'emploi du temps propose l'abonnement aux ressources filtrées"""
+        from .calendriers import url_abonnement
+        self.client.force_login(self.enseignant.user)
+        response = self.client.get(reverse('emploi_du_temps'), {'classe': self.classe.pk, 'salle': 'b12'})
+        self.assertContains(response, url_abonnement('classe', self.classe.pk))
+        self.assertContains(response, url_abonnement('salle', 'B12'))
+
+
+class SallesTestCase(DonneesNotesTestCase):
+    """Tests de l'occupation des salles et de la recherche de salles libres"""
+
+    def setUp(self):
+        super().setUp()
+        from django.core.cache import cache
+        from .occupation_salles import _memoire
+        cache.clear()
+        _memoire.clear()
+        self.classe, _ = self.creer_classe_notee([])
+        videoprojecteur = Equipement.objects.create(nom='Vidéoprojecteur')
+        self.ordinateurs = Equipement.objects.create(nom='Ordinateurs')
+        self.petite = Salle.objects.create(nom='A1', capacite=30)
+        self.moyenne = Salle.objects.create(nom='B12', capacite=60)
+        self.grande = Salle.objects.create(nom='Amphi', capacite=200)
+        self.petite.equipements.add(videoprojecteur)
+        self.moyenne.equipements.add(videoprojecteur, self.ordinateurs)
+        EmploiDuTemps.objects.create(
+            cours=self.classe.cours_set.get(), jour='MARDI', heure_debut=time(8, 0),
+            heure_fin=time(10, 0), type_cours='TD', salle=self.moyenne
+        )
+
+    def libres(self, debut, fin, semestre='S1', **criteres):
+        from .occupation_salles import index_occupation, salles_libres
+        index = index_occupation()
+        return [index.salles[i] for i in salles_libres(
+            index, 'MARDI', time(*debut), time(*fin), semestre, '2023-2024', **criteres
+        )]
+
+    def test_masque_horaire(self):
+        """Cases de 15 minutes, arrondies vers l'extérieur"""
+        from .occupation_salles import masque_horaire
+        self.assertEqual(masque_horaire(time(8, 0), time(9, 0)), 0b1111 << 32)
+        self.assertEqual(masque_horaire(time(8, 5), time(9, 1)), 0b11111 << 32)
+        self.assertEqual(masque_horaire(time(9, 0), time(9, 0)), 0)
+
+    def test_recherche(self):
+        """Salles libres par plage, capacité et équipements, de la plus petite à la plus grande"""
+        self.assertEqual(self.libres((9, 0), (11, 0)), ['A1', 'AMPHI'])
+        # Un créneau qui finit à l'heure demandée ne l'occupe pas
+        self.assertEqual(self.libres((10, 0), (12, 0)), ['A1', 'B12', 'AMPHI'])
+        self.assertEqual(self.libres((10, 0), (12, 0), capacite=50), ['B12', 'AMPHI'])
+        self.assertEqual(self.libres((10, 0), (12, 0), equipements=['ordinateurs']), ['B12'])
+        self.assertEqual(self.libres((9, 0), (11, 0), equipements=['Ordinateurs']), [])
+        self.assertEqual(self.libres((10, 0), (12, 0), equipements=['Tableau blanc']), [])
+        self.assertEqual(self.libres((9, 0), (11, 0), semestre='S2'), ['A1', 'B12', 'AMPHI'])
+
+    def test_index_reconstruit(self):
+        """L'index est servi sans requête puis reconstruit après une modification"""
+        from .occupation_salles import index_occupation
+        index = index_occupation()
+        with self.assertNumQueries(0):
+            self.assertIs(index_occupation(), index)
+
+        EmploiDuTemps.objects.create(
+            cours=self.classe.cours_set.get(), jour='MARDI', heure_debut=time(10, 0),
+            heure_fin=time(12, 0), type_cours='CM', salle=self.petite
+        )
+        self.assertEqual(self.libres((10, 0), (12, 0)), ['B12', 'AMPHI'])
+        self.grande.equipements.add(self.ordinateurs)
+        self.assertEqual(self.libres((10, 0), (12, 0), equipements=['Ordinateurs']), ['B12', 'AMPHI'])
+
+    def test_vue(self):
+        """La recherche au format JSON et ses erreurs"""
+        self.client.force_login(self.enseignant.user)
+        url = reverse('salles_libres')
+        parametres = {
+            'jour': 'mardi', 'debut': '09:00', 'fin': '11:00', 'capacite': '20',
+            'equipements': 'Vidéoprojecteur', 'semestre': 'S1', 'annee_scolaire': '2023-2024',
+        }
+        response = self.client.get(url, parametres)
+        self.assertEqual(response.json()['salles'], [
+            {'nom': 'A1', 'capacite': 30, 'equipements': ['Vidéoprojecteur']},
+        ])
+        for invalide in ({'jour': 'DIMANCHE'}, {'fin': '08:00'}, {'capacite': 'dix'}, {'semestre': 'S3'}):
+            self.assertEqual(self.client.get(url, dict(parametres, **invalide)).status_code, 400)
+
+    def test_vue_ajout_salle_inconnue(self):
+        """La vue d'ajout refuse une salle qui n'existe pas"""
+        User.objects.create_superuser(username='admin_salles', password='admin123')
+        self.client.login(username='admin_salles', password='admin123')
+        response = self.client.post(reverse('ajouter_emploi_du_temps'), {
+            'cours': self.classe.cours_set.get().pk, 'jour': 'JEUDI', 'heure_debut': '08:00',
+            'heure_fin': '10:00', 'type_cours': 'TD', 'salle': 'Z99',
+        })
+        self.assertContains(response, 'Salle inconnue : Z99')
+        self.assertEqual(EmploiDuTemps.objects.count(), 1)
+
+    def test_vue_ajout_salle_trop_petite(self):
+        """Un créneau dans une salle plus petite que la classe est enregistré avec un avertissement"""
+        classe, _ = self.creer_classe_notee(["10", "12", "14"])
+        Salle.objects.filter(pk=self.petite.pk).update(capacite=2)
+        User.objects.create_superuser(username='admin_salles', password='admin123')
+        self.client.login(username='admin_salles', password='admin123')
+        response = self.client.post(reverse('ajouter_emploi_du_temps'), {
+            'cours': classe.cours_set.get().pk, 'jour': 'JEUDI', 'heure_debut': '08:00',
+            'heure_fin': '10:00', 'type_cours': 'TD', 'salle': 'A1',
+        }, follow=True)
+        self.assertContains(response, 'plus petite que la classe')
+        self.assertTrue(EmploiDuTemps.objects.filter(salle_id='A1', jour='JEUDI').exists())
+
+    def test_admin_nom_normalise_et_fige(self):
+        """Le nom est validé en majuscules et ne peut plus changer une fois la salle utilisée"""
+        from django.core.exceptions import ValidationError
+        User.objects.create_superuser(username='admin_salles', password='admin123')
+        self.client.login(username='admin_salles', password='admin123')
+        response = self.client.post(reverse('admin:core_salle_add'), {'nom': ' b12 ', 'capacite': '10'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'existe déjà')
+        self.assertEqual(Salle.objects.filter(nom__iexact='b12').count(), 1)
+
+        # B12 a un créneau : le nom est en lecture seule
+        url = reverse('admin:core_salle_change', args=[self.moyenne.pk])
+        response = self.client.post(url, {'nom': 'B13', 'capacite': '70'})
+        self.assertEqual(response.status_code, 302)
+        self.moyenne.refresh_from_db()
+        self.assertEqual((self.moyenne.nom, self.moyenne.capacite), ('B12', 70))
+        self.moyenne.nom = 'B13'
+        with self.assertRaises(ValidationError):
+            self.moyenne.full_clean()
+
+        self.client.post(reverse('admin:core_salle_change', args=[self.petite.pk]), {'nom': 'a2', 'capacite': '30'})
+        self.petite.refresh_from_db()
+        self.assertEqual(self.petite.nom, 'A2')
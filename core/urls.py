@@ -17,6 +17,9 @@ urlpatterns = [
     path('etudiants/<int:pk>/modifier/', views.modifier_etudiant, name='modifier_etudiant'),
     path('etudiants/<int:pk>/supprimer/', views.supprimer_etudiant, name='supprimer_etudiant'),
     
+    # Classes
+    path('classes/<int:pk>/classement/', views.classement_classe, name='classement_classe'),
+    
     # Enseignants
     path('enseignants/', views.enseignants_list, name='enseignants_list'),
     path('enseignants/ajouter/', views.ajouter_enseignant, name='ajouter_enseignant'),
@@ -28,18 +31,27 @@ urlpatterns = [
     path('cours/ajouter/', views.ajouter_cours, name='ajouter_cours'),
     path('cours/<int:pk>/modifier/', views.modifier_cours, name='modifier_cours'),
     path('cours/<int:pk>/supprimer/', views.supprimer_cours, name='supprimer_cours'),
+    path('cours/<int:pk>/saisie-notes/', views.saisie_notes, name='saisie_notes'),
     
     # Notes
     path('notes/', views.notes_list, name='notes_list'),
     path('notes/ajouter/', views.ajouter_note, name='ajouter_note'),
+    path('notes/importer/', views.import_notes, name='import_notes'),
+    path('notes/exporter/', views.export_notes, name='export_notes'),
+    path('notes/autocompletion/etudiants/', views.autocompletion_etudiants, name='autocompletion_etudiants'),
+    path('notes/autocompletion/cours/', views.autocompletion_cours, name='autocompletion_cours'),
     path('notes/<int:pk>/modifier/', views.modifier_note, name='modifier_note'),
     path('notes/<int:pk>/supprimer/', views.supprimer_note, name='supprimer_note'),
     
     # Emploi du temps (vue calendrier)
     path('emploi-du-temps/', views.emploi_du_temps, name='emploi_du_temps'),
+    path('calendrier/<str:ressource>/<str:valeur>.ics', views.calendrier_ics, name='calendrier_ics'),
     
     # Statistiques
     path('statistiques/', views.statistiques, name='statistiques'),
+    path('statistiques/distributions/', views.distributions_notes, name='distributions_notes'),
+    path('statistiques/donnees/', views.donnees_statistiques, name='donnees_statistiques'),
+    path('statistiques/activite-notes/', views.activite_notes, name='activite_notes'),
     
     # Nouvelles fonctionnalités
     # Gestion des utilisateurs (admin uniquement)
@@ -70,6 +82,8 @@ urlpatterns = [
     # Emploi du temps (gestion complète)
     path('emploi-du-temps/gestion/', views.emploi_du_temps_list, name='emploi_du_temps_list'),
     path('emploi-du-temps/ajouter/', views.ajouter_emploi_du_temps, name='ajouter_emploi_du_temps'),
+    path('emploi-du-temps/importer/', views.import_emploi_du_temps, name='import_emploi_du_temps'),
+    path('emploi-du-temps/salles-libres/', views.salles_libres, name='salles_libres'),
     path('emploi-du-temps/<int:pk>/modifier/', views.modifier_emploi_du_temps, name='modifier_emploi_du_temps'),
     path('emploi-du-temps/<int:pk>/supprimer/', views.supprimer_emploi_du_temps, name='supprimer_emploi_du_temps'),
 ]
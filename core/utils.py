@@ -6,7 +6,12 @@ import string
 from django.core.mail import send_mail
 from django.conf import settings
 from django.contrib.auth.models import User
-from .models import Notification, ProfilUtilisateur, HistoriqueConnexion
+from datetime import datetime, time
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import Classe, Notification, ProfilUtilisateur, HistoriqueConnexion, ActiviteConnexionJour
 
 
 def generer_mot_de_passe(longueur=8):
@@ -45,6 +50,20 @@ def envoyer_notification(utilisateur, type_notif, titre, message, url_action=Non
     return notification
 
 
+def envoyer_notifications(destinataires, type_notif, titre, url_action=None):
+    """Crée en une requête une notification par (utilisateur, message)"""
+    return Notification.objects.bulk_create([
+        Notification(
+            utilisateur=utilisateur,
+            type_notification=type_notif,
+            titre=titre,
+            message=message,
+            url_action=url_action
+        )
+        for utilisateur, message in destinataires
+    ])
+
+
 def envoyer_email_bienvenue(user, mot_de_passe_temporaire):
     """Envoie un email de bienvenue avec les identifiants"""
     sujet = "Bienvenue sur EduManager - Vos identifiants de connexion"
@@ -97,21 +116,72 @@ def enregistrer_connexion(user, request, succes=True):
     ip = get_client_ip(request)
     user_agent = request.META.get('HTTP_USER_AGENT', '')
     
+    maintenant = timezone.now()
+    jour = timezone.localdate(maintenant)
+    premiere_du_jour = succes and not HistoriqueConnexion.objects.filter(
+        utilisateur=user,
+        succes=True,
+        date_connexion__gte=timezone.make_aware(datetime.combine(jour, time.min))
+    ).exists()
+    
     HistoriqueConnexion.objects.create(
+        date_connexion=maintenant,
         utilisateur=user,
         adresse_ip=ip,
         user_agent=user_agent,
         succes=succes
     )
+    mettre_a_jour_activite(jour, succes, premiere_du_jour)
     
     if succes:
-        # Mettre à jour le profil
-        profil = creer_profil_utilisateur(user)
+        # Mettre à jour le profil ; un compte créé sans profil (createsuperuser)
+        # n'a pas de mot de passe temporaire
+        profil, _ = ProfilUtilisateur.objects.get_or_create(
+            user=user,
+            defaults={'mot_de_passe_temporaire': False, 'compte_active': True}
+        )
         profil.derniere_connexion_ip = ip
         profil.nombre_connexions += 1
         profil.save()
 
 
+def mettre_a_jour_activite(jour, succes=True, nouvel_utilisateur=False):
+    """Incrémente l'activité de connexion du jour"""
+    ActiviteConnexionJour.objects.get_or_create(jour=jour)
+    if succes:
+        variations = {'connexions_reussies': F('connexions_reussies') + 1}
+        if nouvel_utilisateur:
+            variations['utilisateurs_distincts'] = F('utilisateurs_distincts') + 1
+    else:
+        variations = {'connexions_echouees': F('connexions_echouees') + 1}
+    ActiviteConnexionJour.objects.filter(jour=jour).update(**variations)
+
+
+def reconstruire_activite_connexions():
+    """Reconstruit l'activité de connexion par jour à partir de l'historique"""
+    lignes = HistoriqueConnexion.objects.annotate(
+        jour=TruncDate('date_connexion', tzinfo=timezone.get_current_timezone())
+    ).values('jour').annotate(
+        reussies=Count('id', filter=Q(succes=True)),
+        echouees=Count('id', filter=Q(succes=False)),
+        utilisateurs=Count('utilisateur', filter=Q(succes=True), distinct=True),
+    ).order_by('jour')
+    
+    activite = [
+        ActiviteConnexionJour(
+            jour=ligne['jour'],
+            connexions_reussies=ligne['reussies'],
+            connexions_echouees=ligne['echouees'],
+            utilisateurs_distincts=ligne['utilisateurs'],
+        )
+        for ligne in lignes
+    ]
+    with transaction.atomic():
+        ActiviteConnexionJour.objects.all().delete()
+        ActiviteConnexionJour.objects.bulk_create(activite)
+    return len(activite)
+
+
 def get_client_ip(request):
     """Récupère l'IP du client"""
     x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
@@ -188,3 +258,23 @@ def peut_envoyer_message(expediteur, destinataire):
             ).exists()
     
     return False
+
+
+def selectionner_classes(classes, noms=None, identifiants=None):
+    """
+    Restreint un QuerySet de classes à celles désignées par leur nom ou leur
+    identifiant (options --classe / --classe-id des commandes). Le nom d'une
+    classe n'étant pas unique, un nom porté par plusieurs classes lève
+    ValueError : la classe doit alors être désignée par son identifiant.
+    """
+    if not noms and not identifiants:
+        return classes
+    homonymes = sorted(
+        Classe.objects.filter(nom__in=noms or []).values('nom').annotate(n=Count('id')).filter(n__gt=1)
+        .values_list('nom', flat=True)
+    )
+    if homonymes:
+        raise ValueError(
+            f"Plusieurs classes portent le nom {', '.join(homonymes)} : utiliser --classe-id."
+        )
+    return classes.filter(Q(nom__in=noms or []) | Q(pk__in=identifiants or []))
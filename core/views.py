@@ -1,20 +1,26 @@
+import csv
+import re
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.core.paginator import Paginator
-from django.db.models import Q, Count, Avg
-from django.http import JsonResponse
-from django.views.decorators.http import require_POST
+from django.db.models import Q, Count
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.views.decorators.http import require_POST, condition
+from django.views.decorators.cache import cache_control
 from django.contrib.auth.models import User
+from django.utils import timezone
+from django.utils.dateparse import parse_time
 from .models import (
     Etudiant, Enseignant, Classe, Cours, Note, 
     EmploiDuTemps, Matiere, Departement, Message, 
-    Notification, ProfilUtilisateur, ParametresSysteme
+    Notification, ParametresSysteme, Salle
 )
 from .forms import (
     LoginForm, EtudiantForm, EnseignantForm, CoursForm, 
-    NoteForm, EmploiDuTempsForm, MessageForm, 
+    NoteForm, EmploiDuTempsForm, MessageForm, SaisieNotesForm, ImportNotesForm, ImportEmploiDuTempsForm,
     ChangerMotDePasseForm, CreerUtilisateurForm
 )
 from .utils import (
@@ -22,6 +28,21 @@ from .utils import (
     envoyer_email_bienvenue, creer_profil_utilisateur, enregistrer_connexion,
     compter_messages_non_lus, compter_notifications_non_lues, get_user_type
 )
+from .statistiques import calculer_statistiques, series_graphiques
+from .compteurs import compteurs_tableau_de_bord, horodatage_versions, valeur_en_cache
+from .distributions import calculer_distributions
+from .classements import rangs_etudiant, tableau_classement
+from .historique_notes import historique_notes
+from .releves import releve_etudiant
+from .conflits_horaires import creneau_propose, decrire_conflit, normaliser_salle, verifier_creneaux
+from . import calendriers
+from .occupation_salles import index_occupation, salles_libres as rechercher_salles_libres
+from .effectifs import effectifs_classes
+from .activite_notes import PERIODES, serie_activite
+from .saisie_notes import lire_grille, notes_evaluation, enregistrer_saisie
+from .import_notes import ErreurImport, format_fichier, importer_notes
+from .import_emploi_du_temps import importer_emploi_du_temps
+from .autocompletion import rechercher_etudiants, rechercher_cours, libelle_etudiant, libelle_cours
 
 
 def login_view(request):
@@ -36,8 +57,12 @@ def login_view(request):
             user = authenticate(request, username=username, password=password)
             if user:
                 login(request, user)
+                enregistrer_connexion(user, request)
                 return redirect('dashboard')
             else:
+                utilisateur = User.objects.filter(username=username).first()
+                if utilisateur:
+                    enregistrer_connexion(utilisateur, request, succes=False)
                 messages.error(request, 'Nom d\'utilisateur ou mot de passe incorrect.')
     else:
         form = LoginForm()
@@ -52,114 +77,7 @@ def logout_view(request):
 
 @login_required
 def dashboard(request):
-    from django.utils import timezone
-    from datetime import datetime, timedelta
-    from django.db.models import Avg
-    
-    context = {}
-    
-    # Statistiques générales (toujours disponibles)
-    context['total_etudiants'] = Etudiant.objects.count()
-    context['total_enseignants'] = Enseignant.objects.count()
-    context['total_cours'] = Cours.objects.count()
-    context['total_classes'] = Classe.objects.count()
-    
-    # Statistiques d'activité avec gestion d'erreurs
-    today = timezone.now().date()
-    week_ago = today - timedelta(days=7)
-    
-    # Connexions récentes (avec gestion d'erreur si le modèle n'existe pas)
-    try:
-        context['connexions_aujourd_hui'] = HistoriqueConnexion.objects.filter(
-            date_connexion__date=today, succes=True
-        ).count()
-        context['connexions_semaine'] = HistoriqueConnexion.objects.filter(
-            date_connexion__date__gte=week_ago, succes=True
-        ).count()
-        context['utilisateurs_actifs'] = HistoriqueConnexion.objects.filter(
-            date_connexion__date__gte=week_ago, succes=True
-        ).values('utilisateur').distinct().count()
-    except:
-        context['connexions_aujourd_hui'] = 0
-        context['connexions_semaine'] = 0
-        context['utilisateurs_actifs'] = 0
-    
-    # Notes récentes
-    try:
-        context['notes_ajoutees_semaine'] = Note.objects.filter(
-            date_creation__date__gte=week_ago
-        ).count()
-    except:
-        context['notes_ajoutees_semaine'] = 0
-    
-    # Messages récents
-    try:
-        context['messages_semaine'] = Message.objects.filter(
-            date_envoi__date__gte=week_ago
-        ).count()
-    except:
-        context['messages_semaine'] = 0
-    
-    # Mots de passe temporaires
-    try:
-        context['mots_de_passe_temporaires'] = ProfilUtilisateur.objects.filter(
-            mot_de_passe_temporaire=True
-        ).count()
-    except:
-        context['mots_de_passe_temporaires'] = 0
-    
-    # Données spécifiques selon le type d'utilisateur
-    try:
-        etudiant = Etudiant.objects.get(user=request.user)
-        context['user_type'] = 'etudiant'
-        context['etudiant'] = etudiant
-        context['mes_cours'] = Cours.objects.filter(classe=etudiant.classe)
-        context['mes_notes'] = Note.objects.filter(etudiant=etudiant).order_by('-date_evaluation')[:5]
-        
-        # Emploi du temps avec gestion d'erreur
-        try:
-            context['emploi_du_temps'] = EmploiDuTemps.objects.filter(
-                cours__classe=etudiant.classe
-            ).order_by('jour', 'heure_debut')
-        except:
-            context['emploi_du_temps'] = []
-        
-        # Moyenne générale de l'étudiant
-        notes_etudiant = Note.objects.filter(etudiant=etudiant)
-        if notes_etudiant.exists():
-            context['moyenne_generale'] = notes_etudiant.aggregate(Avg('valeur'))['valeur__avg']
-        
-    except Etudiant.DoesNotExist:
-        try:
-            enseignant = Enseignant.objects.get(user=request.user)
-            context['user_type'] = 'enseignant'
-            context['enseignant'] = enseignant
-            context['mes_cours'] = Cours.objects.filter(enseignant=enseignant)
-            
-            # Emploi du temps avec gestion d'erreur
-            try:
-                context['emploi_du_temps'] = EmploiDuTemps.objects.filter(
-                    cours__enseignant=enseignant
-                ).order_by('jour', 'heure_debut')
-            except:
-                context['emploi_du_temps'] = []
-            
-            # Statistiques pour l'enseignant
-            context['mes_etudiants'] = Note.objects.filter(
-                cours__enseignant=enseignant
-            ).values('etudiant').distinct().count()
-            
-        except Enseignant.DoesNotExist:
-            context['user_type'] = 'admin'
-            
-            # Statistiques supplémentaires pour l'admin
-            try:
-                context['notifications_non_lues'] = Notification.objects.filter(lue=False).count()
-                context['messages_non_lus'] = Message.objects.filter(lu=False).count()
-            except:
-                context['notifications_non_lues'] = 0
-                context['messages_non_lus'] = 0
-    
+    context = compteurs_tableau_de_bord(request.user)
     return render(request, 'core/dashboard.html', context)
 
 
@@ -197,14 +115,43 @@ def etudiants_list(request):
 
 @login_required
 def etudiant_detail(request, pk):
-    etudiant = get_object_or_404(Etudiant, pk=pk)
-    notes = Note.objects.filter(etudiant=etudiant).order_by('-date_evaluation')
-    cours = Cours.objects.filter(classe=etudiant.classe)
+    etudiant = get_object_or_404(Etudiant.objects.select_related('user', 'classe'), pk=pk)
+    
+    # Relevé en cache : notes, moyennes pondérées par cours et moyenne générale
+    releve = releve_etudiant(etudiant)
+    rangs = rangs_etudiant(etudiant)
+    cours = [
+        dict(ligne, rang=rangs['par_cours'].get(ligne['cours_id'])) for ligne in releve['cours']
+    ]
     
     return render(request, 'core/etudiant_detail.html', {
         'etudiant': etudiant,
-        'notes': notes,
-        'cours': cours
+        'releve': releve,
+        'notes': releve['notes'],
+        'cours': cours,
+        'moyenne_generale': releve['moyenne_generale'],
+        'rang_classe': rangs['general'],
+        'decisions': etudiant.decisions.all()
+    })
+
+
+@login_required
+def classement_classe(request, pk):
+    """Classement des étudiants d'une classe par moyenne générale pondérée"""
+    classe = get_object_or_404(Classe, pk=pk)
+    semestre = request.GET.get('semestre') or None
+    annee_scolaire = request.GET.get('annee_scolaire') or None
+    
+    annees = Cours.objects.filter(classe=classe).values_list(
+        'annee_scolaire', flat=True
+    ).distinct().order_by('-annee_scolaire')
+    
+    return render(request, 'core/classement_classe.html', {
+        'classe': classe,
+        'classement': tableau_classement(classe, semestre, annee_scolaire),
+        'semestre': semestre,
+        'annee_scolaire': annee_scolaire,
+        'annees': annees
     })
 
 
@@ -244,42 +191,119 @@ def cours_list(request):
     page = request.GET.get('page')
     cours = paginator.get_page(page)
     
+    # Effectifs dérivés des inscriptions (classe du cours), en cache
+    effectifs = effectifs_classes()
+    for course in cours:
+        course.effectif = effectifs.get(course.classe_id, 0)
+    
     return render(request, 'core/cours_list.html', {
         'cours': cours,
         'search': search
     })
 
 
-@login_required
-def notes_list(request):
-    notes = Note.objects.select_related('etudiant', 'cours').all()
-    
-    # Filtrage par étudiant
+def _filtrer_notes(request, notes):
+    """Applique les filtres étudiant et cours de la liste des notes"""
     etudiant_id = request.GET.get('etudiant')
     if etudiant_id:
         notes = notes.filter(etudiant_id=etudiant_id)
     
-    # Filtrage par cours
     cours_id = request.GET.get('cours')
     if cours_id:
         notes = notes.filter(cours_id=cours_id)
     
+    return notes, etudiant_id, cours_id
+
+
+@login_required
+def notes_list(request):
+    notes, etudiant_id, cours_id = _filtrer_notes(
+        request, Note.objects.select_related(
+            'etudiant__user', 'cours__matiere', 'cours__classe', 'cours__enseignant__user'
+        ).order_by('-date_evaluation', '-pk')
+    )
+    
     paginator = Paginator(notes, 20)
     page = request.GET.get('page')
     notes = paginator.get_page(page)
     
-    etudiants = Etudiant.objects.all()
-    cours = Cours.objects.all()
+    # Libellés des filtres actifs ; les autres choix sont chargés par autocomplétion
+    etudiant = Etudiant.objects.select_related('user').filter(pk=etudiant_id).first() if etudiant_id else None
+    course = Cours.objects.select_related('matiere', 'classe').filter(pk=cours_id).first() if cours_id else None
     
     return render(request, 'core/notes_list.html', {
         'notes': notes,
-        'etudiants': etudiants,
-        'cours': cours,
+        'etudiant_libelle': libelle_etudiant(etudiant) if etudiant else '',
+        'cours_libelle': libelle_cours(course) if course else '',
         'etudiant_id': etudiant_id,
         'cours_id': cours_id
     })
 
 
+def _autocompletion(request, recherche):
+    limite = request.GET.get('limite', '')
+    if limite and not limite.isdigit():
+        return JsonResponse({'success': False, 'error': 'Limite invalide'}, status=400)
+    return JsonResponse({'resultats': recherche(request.GET.get('q', ''), int(limite or 0))})
+
+
+@login_required
+def autocompletion_etudiants(request):
+    """Étudiants correspondant au texte saisi, au format JSON"""
+    return _autocompletion(request, rechercher_etudiants)
+
+
+@login_required
+def autocompletion_cours(request):
+    """Cours correspondant au texte saisi, au format JSON"""
+    return _autocompletion(request, rechercher_cours)
+
+
+class _Tampon:
+    """Pseudo-fichier qui renvoie chaque ligne écrite par csv.writer"""
+    
+    def write(self, valeur):
+        return valeur
+
+
+# Colonnes de l'export ; les cinq premières sont celles attendues par l'import
+COLONNES_EXPORT_NOTES = [
+    ('numero_etudiant', 'etudiant__numero_etudiant'),
+    ('code_matiere', 'cours__matiere__code'),
+    ('type_evaluation', 'type_evaluation'),
+    ('note', 'note'),
+    ('date_evaluation', 'date_evaluation'),
+    ('coefficient', 'coefficient'),
+    ('commentaire', 'commentaire'),
+    ('semestre', 'cours__semestre'),
+    ('annee_scolaire', 'cours__annee_scolaire'),
+    ('nom', 'etudiant__user__last_name'),
+    ('prenom', 'etudiant__user__first_name'),
+    ('classe', 'etudiant__classe__nom'),
+    ('matiere', 'cours__matiere__nom'),
+]
+
+
+@login_required
+def export_notes(request):
+    """Export CSV des notes filtrées, diffusé ligne par ligne"""
+    notes, _, _ = _filtrer_notes(request, Note.objects.all())
+    lignes = notes.order_by('pk').values_list(
+        *[champ for _, champ in COLONNES_EXPORT_NOTES]
+    ).iterator(chunk_size=2000)
+    
+    def contenu():
+        ecrivain = csv.writer(_Tampon(), delimiter=';')
+        # BOM pour que les tableurs détectent l'UTF-8
+        yield '\ufeff' + ecrivain.writerow([nom for nom, _ in COLONNES_EXPORT_NOTES])
+        for ligne in lignes:
+            yield ecrivain.writerow(ligne)
+    
+    response = StreamingHttpResponse(contenu(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="notes_{timezone.localdate():%Y%m%d}.csv"'
+    return response
+
+
 @login_required
 def emploi_du_temps(request):
     emplois = EmploiDuTemps.objects.select_related('cours').all()
@@ -294,6 +318,20 @@ def emploi_du_temps(request):
     if enseignant_id:
         emplois = emplois.filter(cours__enseignant_id=enseignant_id)
     
+    # Filtrage par salle
+    salle = request.GET.get('salle', '').strip()
+    if salle:
+        emplois = emplois.filter(salle_id=normaliser_salle(salle))
+    
+    # Abonnements iCalendar aux emplois du temps filtrés
+    abonnements = [
+        (libelle, request.build_absolute_uri(calendriers.url_abonnement(ressource, valeur)))
+        for ressource, valeur, libelle in [
+            ('classe', classe_id, 'Classe'), ('enseignant', enseignant_id, 'Enseignant'), ('salle', salle, 'Salle'),
+        ]
+        if valeur and (ressource == 'salle' or valeur.isdigit())
+    ]
+    
     # Organisation par jour
     emploi_par_jour = {}
     for emploi in emplois:
@@ -309,41 +347,207 @@ def emploi_du_temps(request):
         'classes': classes,
         'enseignants': enseignants,
         'classe_id': classe_id,
-        'enseignant_id': enseignant_id
+        'enseignant_id': enseignant_id,
+        'salle': salle,
+        'abonnements': abonnements,
     })
 
 
+def _periode_calendrier(request):
+    """(semestre, année scolaire) demandés, le semestre en cours par défaut ; None si invalides"""
+    semestre = request.GET.get('semestre')
+    annee_scolaire = request.GET.get('annee_scolaire')
+    if not semestre and not annee_scolaire:
+        return calendriers.semestre_courant()
+    if semestre not in calendriers.PERIODES_SEMESTRES or not re.fullmatch(r'\d{4}-\d{4}', annee_scolaire or ''):
+        return None
+    return semestre, annee_scolaire
+
+
+def _version_calendrier(request, ressource, valeur):
+    """ETag et Last-Modified d'un flux (lus une fois par requête), None sans jeton valide"""
+    if not hasattr(request, '_version_calendrier'):
+        periode = _periode_calendrier(request)
+        request._version_calendrier = (None, None)
+        if periode and calendriers.verifier_jeton(ressource, valeur, request.GET.get('jeton')):
+            request._version_calendrier = horodatage_versions(calendriers.DEPENDANCES, request.path, *periode)
+    return request._version_calendrier
+
+
+def _etag_calendrier(request, *args, **kwargs):
+    return _version_calendrier(request, *args, **kwargs)[0]
+
+
+def _derniere_modification_calendrier(request, *args, **kwargs):
+    return _version_calendrier(request, *args, **kwargs)[1]
+
+
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_etag_calendrier, last_modified_func=_derniere_modification_calendrier)
+def calendrier_ics(request, ressource, valeur):
+    """
+    Flux iCalendar de l'emploi du temps d'une classe, d'un enseignant ou
+    d'une salle. Les agendas s'y abonnent sans session : l'accès est
+    contrôlé par le jeton de l'adresse.
+    """
+    etag, derniere_modification = _version_calendrier(request, ressource, valeur)
+    if etag is None:
+        raise Http404
+    contenu = calendriers.calendrier_en_cache(ressource, valeur, *_periode_calendrier(request), derniere_modification)
+    if contenu is None:
+        raise Http404
+    response = HttpResponse(contenu, content_type='text/calendar; charset=utf-8')
+    response['Content-Disposition'] = f'inline; filename="emploi-du-temps-{ressource}-{valeur}.ics"'
+    return response
+
+
 @login_required
-def statistiques(request):
-    # Statistiques par classe
-    stats_classes = []
-    for classe in Classe.objects.all():
-        etudiants_count = Etudiant.objects.filter(classe=classe).count()
-        moyenne_generale = Note.objects.filter(
-            etudiant__classe=classe
-        ).aggregate(Avg('note'))['note__avg']
-        
-        stats_classes.append({
-            'classe': classe,
-            'etudiants_count': etudiants_count,
-            'moyenne_generale': round(moyenne_generale or 0, 2)
-        })
-    
-    # Statistiques par matière
-    stats_matieres = []
-    for matiere in Matiere.objects.all():
-        moyenne_matiere = Note.objects.filter(
-            cours__matiere=matiere
-        ).aggregate(Avg('note'))['note__avg']
-        
-        stats_matieres.append({
-            'matiere': matiere,
-            'moyenne': round(moyenne_matiere or 0, 2)
-        })
+def salles_libres(request):
+    """
+    Salles libres sur une plage horaire d'un jour, au format JSON : capacité
+    minimale et équipements (séparés par des virgules) facultatifs, semestre
+    en cours par défaut.
+    """
+    jour = request.GET.get('jour', '').upper()
+    if jour not in dict(EmploiDuTemps.JOURS_SEMAINE):
+        return JsonResponse({'success': False, 'error': 'Jour inconnu'}, status=400)
+    debut, fin = parse_time(request.GET.get('debut', '')), parse_time(request.GET.get('fin', ''))
+    if debut is None or fin is None or debut >= fin:
+        return JsonResponse({'success': False, 'error': 'Heures invalides'}, status=400)
+    capacite = request.GET.get('capacite', '')
+    if capacite and not capacite.isdigit():
+        return JsonResponse({'success': False, 'error': 'Capacité invalide'}, status=400)
+    periode = _periode_calendrier(request)
+    if periode is None:
+        return JsonResponse({'success': False, 'error': 'Période invalide'}, status=400)
+    equipements = [e for e in request.GET.get('equipements', '').split(',') if e.strip()]
+    
+    index = index_occupation()
+    rangs = rechercher_salles_libres(index, jour, debut, fin, *periode, capacite=int(capacite or 0),
+                                     equipements=equipements)
+    return JsonResponse({
+        'jour': jour,
+        'debut': debut.strftime('%H:%M'),
+        'fin': fin.strftime('%H:%M'),
+        'semestre': periode[0],
+        'annee_scolaire': periode[1],
+        'salles': [
+            {'nom': index.salles[i], 'capacite': index.capacites[i], 'equipements': list(index.noms_equipements[i])}
+            for i in rangs
+        ],
+    })
+
+
+# Modèles dont dépendent les données des graphiques de statistiques
+DEPENDANCES_STATISTIQUES = (Note, Cours, Matiere, Classe, Etudiant)
+
+
+def _distributions():
+    """Distributions des notes, calculées une fois par version des notes"""
+    return valeur_en_cache('distributions_notes', DEPENDANCES_STATISTIQUES, calculer_distributions)
+
+
+def _tableaux_statistiques():
+    """Tableaux de la page de statistiques (agrégats, distributions, classements)"""
+    context = calculer_statistiques()
+    distributions = _distributions()
+    for stat in context['stats_classes']:
+        stat['distribution'] = distributions['par_classe'].get(stat['classe'].pk)
+    for stat in context['stats_matieres']:
+        stat['distribution'] = distributions['par_matiere'].get(stat['matiere'].pk)
     
-    return render(request, 'core/statistiques.html', {
-        'stats_classes': stats_classes,
-        'stats_matieres': stats_matieres
+    context['stats_types'] = [
+        {'type': libelle, 'distribution': distributions['par_type'][code]}
+        for code, libelle in Note.TYPES_EVALUATION if code in distributions['par_type']
+    ]
+    return context
+
+
+@login_required
+def statistiques(request):
+    """Page de statistiques, servie depuis le cache tant que les notes ne changent pas"""
+    # Les noms des étudiants classés viennent de User
+    context = valeur_en_cache('page_statistiques', (*DEPENDANCES_STATISTIQUES, User), _tableaux_statistiques)
+    return render(request, 'core/statistiques.html', context)
+
+
+def _version_statistiques(request):
+    """ETag et Last-Modified des données de statistiques (lus une fois par requête)"""
+    if not hasattr(request, '_version_statistiques'):
+        # La date du jour borne les séries d'activité
+        request._version_statistiques = horodatage_versions(
+            DEPENDANCES_STATISTIQUES, request.path, request.GET.urlencode(), timezone.localdate()
+        )
+    return request._version_statistiques
+
+
+def _etag_statistiques(request, *args, **kwargs):
+    return _version_statistiques(request)[0]
+
+
+def _derniere_modification_statistiques(request, *args, **kwargs):
+    return _version_statistiques(request)[1]
+
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_etag_statistiques, last_modified_func=_derniere_modification_statistiques)
+def donnees_statistiques(request):
+    """Séries des graphiques de statistiques au format JSON (requêtes conditionnelles)"""
+    semestre = request.GET.get('semestre') or None
+    annee_scolaire = request.GET.get('annee_scolaire') or None
+    return JsonResponse(valeur_en_cache(
+        'series_statistiques',
+        DEPENDANCES_STATISTIQUES,
+        lambda: series_graphiques(semestre, annee_scolaire),
+        semestre or '', annee_scolaire or '',
+    ))
+
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_etag_statistiques, last_modified_func=_derniere_modification_statistiques)
+def activite_notes(request):
+    """Notes saisies et modifiées par semaine ou par mois sur un an, au format JSON"""
+    periode = request.GET.get('periode', 'semaine')
+    if periode not in PERIODES:
+        return JsonResponse({'success': False, 'error': 'Période inconnue'}, status=400)
+    departement_id = request.GET.get('departement') or None
+    classe_id = request.GET.get('classe') or None
+    if not all(v is None or v.isdigit() for v in (departement_id, classe_id)):
+        return JsonResponse({'success': False, 'error': 'Filtre invalide'}, status=400)
+    
+    return JsonResponse({
+        'periode': periode,
+        'serie': serie_activite(periode, departement=departement_id, classe=classe_id),
+    })
+
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_etag_statistiques, last_modified_func=_derniere_modification_statistiques)
+def distributions_notes(request):
+    """Distributions des notes (médianes, quartiles, histogrammes) au format JSON"""
+    distributions = _distributions()
+    classes = Classe.objects.in_bulk(list(distributions['par_classe']))
+    matieres = Matiere.objects.in_bulk(list(distributions['par_matiere']))
+    types = dict(Note.TYPES_EVALUATION)
+    
+    return JsonResponse({
+        'tranches': distributions['tranches'],
+        'globale': distributions['globale'],
+        'par_classe': [
+            {'id': pk, 'nom': classes[pk].nom, **stats}
+            for pk, stats in distributions['par_classe'].items() if pk in classes
+        ],
+        'par_matiere': [
+            {'id': pk, 'code': matieres[pk].code, 'nom': matieres[pk].nom, **stats}
+            for pk, stats in distributions['par_matiere'].items() if pk in matieres
+        ],
+        'par_type': [
+            {'code': code, 'libelle': types[code], **stats}
+            for code, stats in distributions['par_type'].items()
+        ],
     })
 
 
@@ -880,6 +1084,97 @@ def ajouter_note(request):
     return render(request, 'core/ajouter_note.html', {'form': form})
 
 
+@login_required
+def saisie_notes(request, pk):
+    """Saisie des notes d'une évaluation pour tous les étudiants de la classe d'un cours"""
+    cours = get_object_or_404(Cours.objects.select_related('matiere', 'classe'), pk=pk)
+    if not (request.user.is_superuser or (hasattr(request.user, 'enseignant') and request.user.enseignant == cours.enseignant)):
+        messages.error(request, 'Accès non autorisé.')
+        return redirect('notes_list')
+    etudiants = list(
+        Etudiant.objects.filter(classe=cours.classe).select_related('user')
+        .order_by('user__last_name', 'user__first_name')
+    )
+    donnees = request.POST if request.method == 'POST' else request.GET
+    form = SaisieNotesForm(donnees or None, initial={'date_evaluation': timezone.localdate()})
+    
+    existantes, erreurs = {}, {}
+    if form.is_valid():
+        evaluation = (cours, form.cleaned_data['type_evaluation'], form.cleaned_data['date_evaluation'])
+        if request.method == 'POST':
+            valeurs, erreurs = lire_grille(request.POST, etudiants)
+            if not erreurs:
+                creees, modifiees = enregistrer_saisie(
+                    cours, etudiants, *evaluation[1:], form.cleaned_data['coefficient'], valeurs
+                )
+                messages.success(
+                    request, f'{creees} note(s) ajoutée(s) et {modifiees} modifiée(s) pour {cours.matiere.nom}!'
+                )
+                return redirect(f"{reverse('notes_list')}?cours={cours.pk}")
+            messages.error(request, 'Certaines notes sont invalides, rien n\'a été enregistré.')
+        else:
+            existantes = notes_evaluation(*evaluation)
+    
+    lignes = []
+    for etudiant in etudiants:
+        note = existantes.get(etudiant.pk)
+        lignes.append({
+            'etudiant': etudiant,
+            'note': request.POST.get(f'note_{etudiant.pk}', note.note if note else ''),
+            'commentaire': request.POST.get(f'commentaire_{etudiant.pk}', note.commentaire if note else ''),
+            'erreur': erreurs.get(etudiant.pk),
+        })
+    
+    return render(request, 'core/saisie_notes.html', {
+        'cours': cours,
+        'form': form,
+        'lignes': lignes
+    })
+
+
+@login_required
+def import_notes(request):
+    """Importer des notes depuis un fichier CSV ou XLSX (administrateurs et enseignants)"""
+    type_utilisateur = get_user_type(request.user)
+    if type_utilisateur not in ('admin', 'enseignant'):
+        messages.error(request, 'Accès non autorisé.')
+        return redirect('notes_list')
+    
+    rapport = None
+    if request.method == 'POST':
+        form = ImportNotesForm(request.POST, request.FILES)
+        if form.is_valid():
+            fichier = form.cleaned_data['fichier']
+            try:
+                rapport = importer_notes(
+                    fichier,
+                    format_fichier(fichier.name),
+                    simulation=form.cleaned_data['simulation'],
+                    # Un enseignant n'importe que dans ses propres cours
+                    enseignant=request.user.enseignant if type_utilisateur == 'enseignant' else None,
+                )
+            except ErreurImport as e:
+                messages.error(request, str(e))
+            else:
+                if rapport['nombre_erreurs']:
+                    messages.error(
+                        request,
+                        f"{rapport['nombre_erreurs']} ligne(s) invalide(s) sur {rapport['lignes']}, aucune note importée."
+                    )
+                elif rapport['simulation']:
+                    messages.info(request, f"Simulation réussie : {rapport['importees']} note(s) prête(s) à être importée(s).")
+                else:
+                    messages.success(request, f"{rapport['importees']} note(s) importée(s)!")
+                    return redirect('notes_list')
+    else:
+        form = ImportNotesForm()
+    
+    return render(request, 'core/import_notes.html', {
+        'form': form,
+        'rapport': rapport
+    })
+
+
 @login_required
 def modifier_note(request, pk):
     """Modifier une note"""
@@ -896,7 +1191,8 @@ def modifier_note(request, pk):
     
     return render(request, 'core/modifier_note.html', {
         'form': form,
-        'note': note
+        'note': note,
+        'historique': historique_notes(note.etudiant_id, note.cours_id).filter(identifiant_note=note.pk)
     })
 
 
@@ -1167,12 +1463,37 @@ def emploi_du_temps_list(request):
         'emplois': emplois,
         'classes': Classe.objects.all(),
         'enseignants': Enseignant.objects.all(),
-        'jours': EmploiDuTemps.JOURS_CHOICES,
+        'jours': EmploiDuTemps.JOURS_SEMAINE,
     }
     
     return render(request, 'core/emploi_du_temps_list.html', context)
 
 
+def _conflits_creneau(request, cours, jour, heure_debut, heure_fin, salle, remplace=None):
+    """
+    Descriptions des conflits d'un créneau proposé (salle normalisée), ou
+    None (avec un message d'erreur) si les heures ou la salle sont invalides.
+    """
+    debut, fin = parse_time(heure_debut or ''), parse_time(heure_fin or '')
+    if debut is None or fin is None or debut >= fin:
+        messages.error(request, 'Heures invalides : l\'heure de fin doit suivre l\'heure de début.')
+        return None
+    capacite = Salle.objects.filter(nom=salle).values_list('capacite', flat=True).first()
+    if capacite is None:
+        messages.error(request, f'Salle inconnue : {salle or "-"}')
+        return None
+    effectif = effectifs_classes().get(cours.classe_id, 0)
+    if capacite and effectif > capacite:
+        messages.warning(request, f'La salle {salle} ({capacite} places) est plus petite que la classe '
+                                  f'{cours.classe.nom} ({effectif} étudiants).')
+    ref = remplace or 'nouveau'
+    creneau = creneau_propose(cours, jour, debut, fin, salle, ref=ref)
+    return [
+        decrire_conflit(conflit, point_de_vue=ref)
+        for conflit in verifier_creneaux([creneau], remplaces=[remplace] if remplace else [])
+    ]
+
+
 @login_required
 def ajouter_emploi_du_temps(request):
     """Ajouter un emploi du temps (admin/enseignant uniquement)"""
@@ -1187,29 +1508,23 @@ def ajouter_emploi_du_temps(request):
             heure_debut = request.POST.get('heure_debut')
             heure_fin = request.POST.get('heure_fin')
             type_cours = request.POST.get('type_cours')
-            salle = request.POST.get('salle')
+            salle = normaliser_salle(request.POST.get('salle'))
             
-            cours = get_object_or_404(Cours, id=cours_id)
+            cours = get_object_or_404(Cours.objects.select_related('matiere', 'classe'), id=cours_id)
             
-            # Vérifier les conflits d'horaires
-            conflits = EmploiDuTemps.objects.filter(
-                jour=jour,
-                heure_debut__lt=heure_fin,
-                heure_fin__gt=heure_debut
-            ).filter(
-                Q(salle=salle) | Q(cours__enseignant=cours.enseignant) | Q(cours__classe=cours.classe)
-            )
+            # Vérifier les conflits d'horaires (salle, enseignant, classe) sur la même période
+            conflits = _conflits_creneau(request, cours, jour, heure_debut, heure_fin, salle)
             
-            if conflits.exists():
-                messages.error(request, 'Conflit d\'horaire détecté (salle, enseignant ou classe déjà occupé).')
-            else:
+            if conflits:
+                messages.error(request, 'Conflit d\'horaire détecté : ' + ' ; '.join(conflits))
+            elif conflits is not None:
                 EmploiDuTemps.objects.create(
                     cours=cours,
                     jour=jour,
                     heure_debut=heure_debut,
                     heure_fin=heure_fin,
                     type_cours=type_cours,
-                    salle=salle
+                    salle_id=salle
                 )
                 messages.success(request, 'Emploi du temps ajouté avec succès!')
                 return redirect('emploi_du_temps_list')
@@ -1219,13 +1534,58 @@ def ajouter_emploi_du_temps(request):
     
     context = {
         'cours_list': Cours.objects.all(),
-        'jours': EmploiDuTemps.JOURS_CHOICES,
-        'types_cours': EmploiDuTemps.TYPE_COURS_CHOICES,
+        'jours': EmploiDuTemps.JOURS_SEMAINE,
+        'types_cours': EmploiDuTemps.TYPES_COURS,
+        'salles': Salle.objects.all(),
     }
     
     return render(request, 'core/ajouter_emploi_du_temps.html', context)
 
 
+@login_required
+def import_emploi_du_temps(request):
+    """Importer des créneaux depuis un fichier CSV ou XLSX (administrateurs et enseignants)"""
+    type_utilisateur = get_user_type(request.user)
+    if type_utilisateur not in ('admin', 'enseignant'):
+        messages.error(request, 'Accès non autorisé.')
+        return redirect('emploi_du_temps_list')
+    
+    rapport = None
+    if request.method == 'POST':
+        form = ImportEmploiDuTempsForm(request.POST, request.FILES)
+        if form.is_valid():
+            fichier = form.cleaned_data['fichier']
+            try:
+                rapport = importer_emploi_du_temps(
+                    fichier,
+                    format_fichier(fichier.name),
+                    simulation=form.cleaned_data['simulation'],
+                    remplacer=form.cleaned_data['remplacer'],
+                    # Un enseignant n'importe que les créneaux de ses propres cours
+                    enseignant=request.user.enseignant if type_utilisateur == 'enseignant' else None,
+                )
+            except ErreurImport as e:
+                messages.error(request, str(e))
+            else:
+                if rapport['nombre_erreurs']:
+                    messages.error(
+                        request,
+                        f"{rapport['nombre_erreurs']} erreur(s) sur {rapport['lignes']} ligne(s), aucun créneau importé."
+                    )
+                elif rapport['simulation']:
+                    messages.info(request, f"Simulation réussie : {rapport['importes']} créneau(x) prêt(s) à être importé(s).")
+                else:
+                    messages.success(request, f"{rapport['importes']} créneau(x) importé(s)!")
+                    return redirect('emploi_du_temps_list')
+    else:
+        form = ImportEmploiDuTempsForm()
+    
+    return render(request, 'core/import_emploi_du_temps.html', {
+        'form': form,
+        'rapport': rapport
+    })
+
+
 @login_required
 def modifier_emploi_du_temps(request, pk):
     """Modifier un emploi du temps"""
@@ -1242,28 +1602,22 @@ def modifier_emploi_du_temps(request, pk):
             heure_debut = request.POST.get('heure_debut')
             heure_fin = request.POST.get('heure_fin')
             type_cours = request.POST.get('type_cours')
-            salle = request.POST.get('salle')
+            salle = normaliser_salle(request.POST.get('salle'))
             
-            cours = get_object_or_404(Cours, id=cours_id)
+            cours = get_object_or_404(Cours.objects.select_related('matiere', 'classe'), id=cours_id)
             
             # Vérifier les conflits (exclure l'emploi actuel)
-            conflits = EmploiDuTemps.objects.filter(
-                jour=jour,
-                heure_debut__lt=heure_fin,
-                heure_fin__gt=heure_debut
-            ).filter(
-                Q(salle=salle) | Q(cours__enseignant=cours.enseignant) | Q(cours__classe=cours.classe)
-            ).exclude(pk=pk)
+            conflits = _conflits_creneau(request, cours, jour, heure_debut, heure_fin, salle, remplace=pk)
             
-            if conflits.exists():
-                messages.error(request, 'Conflit d\'horaire détecté.')
-            else:
+            if conflits:
+                messages.error(request, 'Conflit d\'horaire détecté : ' + ' ; '.join(conflits))
+            elif conflits is not None:
                 emploi.cours = cours
                 emploi.jour = jour
                 emploi.heure_debut = heure_debut
                 emploi.heure_fin = heure_fin
                 emploi.type_cours = type_cours
-                emploi.salle = salle
+                emploi.salle_id = salle
                 emploi.save()
                 
                 messages.success(request, 'Emploi du temps modifié avec succès!')
@@ -1275,8 +1629,9 @@ def modifier_emploi_du_temps(request, pk):
     context = {
         'emploi': emploi,
         'cours_list': Cours.objects.all(),
-        'jours': EmploiDuTemps.JOURS_CHOICES,
-        'types_cours': EmploiDuTemps.TYPE_COURS_CHOICES,
+        'jours': EmploiDuTemps.JOURS_SEMAINE,
+        'types_cours': EmploiDuTemps.TYPES_COURS,
+        'salles': Salle.objects.all(),
     }
     
     return render(request, 'core/modifier_emploi_du_temps.html', context)